@@ -2,191 +2,2389 @@
 # NIM   : 2509116088
 # Kelas : Sistem Informasi (C)
 
+import csv
+import hashlib
+import heapq
+import hmac
 import json
+import mmap
 import os
+import queue
+import random
 import re
+import secrets
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from prettytable import PrettyTable
-import pwinput
+from functools import lru_cache, wraps
+from operator import attrgetter
+from itertools import chain, islice
+# prettytable dan pwinput hanya di-import saat tabel/prompt password pertama
+# kali dipakai (lihat make_table, ask_password) agar start tetap cepat
 
 # Mengambil data ke directory
 DATA_DIR = "data"
 USERS_FILE = os.path.join(DATA_DIR, "pengguna.json")
 PRODUCTS_FILE = os.path.join(DATA_DIR, "produk.json")
 TRANSACTIONS_FILE = os.path.join(DATA_DIR, "data_transaksi.json")
+COUNTERS_FILE = os.path.join(DATA_DIR, "counter.json")
+ROLLUP_FILE = os.path.join(DATA_DIR, "laporan.json")
+SCHEMA_FILE = os.path.join(DATA_DIR, "skema.json")
+# voucher aktif (snapshot + journal .jsonl); voucher terpakai/kadaluarsa dipindah ke arsip
+VOUCHERS_FILE = os.path.join(DATA_DIR, "voucher.json")
+VOUCHER_ARCHIVE_FILE = os.path.join(DATA_DIR, "voucher_arsip.jsonl")
+VOUCHER_COMPACT_RATIO = 10  # compact jika journal >= 1/10 ukuran snapshot
+# index referensi pembayaran Gopay/Bank (append-only, satu baris per transaksi)
+PAYMENT_REFS_FILE = os.path.join(DATA_DIR, "referensi_bayar.jsonl")
+
+# Mode journal: transaksi baru ditambahkan sebagai satu baris JSON ke file .jsonl
+# (append-only) sehingga biaya simpan per pembelian tidak bergantung pada
+# banyaknya riwayat. Journal digabung kembali ke snapshot saat compact.
+JOURNAL_MODE = True
+JOURNAL_COMPACT_RATIO = 10  # saat keluar, compact jika journal >= 1/10 ukuran snapshot
 
 LOCK_DURATION_SECS = 30  # Durasi Kunci akun jika salah password
 VIP_DISCOUNT_PERCENT = 10  # diskon untuk member VIP 
 SUBSCRIPTION_DAYS = 30
+VOUCHER_VALID_DAYS = None  # masa berlaku voucher hasil pembelian (None = tanpa batas)
+PROFILE_VOUCHERS = 5  # voucher yang ditampilkan di profil, sisanya hanya dihitung
+VIP_SWEEP_SECS = 60  # interval sweep VIP kadaluarsa di server
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# # Utilitas: load/save file ke JSON
+
+def journal_path(path):
+    return os.path.splitext(path)[0] + ".jsonl"
+
+
+def load_json(path):
+    data = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                data = []
+    # replay journal (jika ada) di atas snapshot
+    jpath = journal_path(path)
+    if os.path.exists(jpath):
+        seen = {r.get('id') for r in data if isinstance(r, dict)}
+        with open(jpath, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    # baris terakhir yang terpotong (crash saat menulis) diabaikan
+                    continue
+                # record yang sudah masuk snapshot (compact terputus) tidak diulang
+                if rec.get('id') in seen:
+                    continue
+                seen.add(rec.get('id'))
+                data.append(rec)
+    return data
+
+
+_JSON_SKIP = re.compile(r'[\s,]*')
+
+def iter_json_array(path, chunk_size=1 << 16):
+    # baca array JSON satu elemen demi satu elemen tanpa memuat seluruh file
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ''
+        pos = 0
+        eof = False
+        started = False
+        while True:
+            pos = _JSON_SKIP.match(buf, pos).end()
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = not buf
+                continue
+            if not started:
+                if buf[pos] != '[':
+                    return
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    return
+                # elemen terpotong di batas chunk: tambah data lalu coba lagi
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield obj
+            pos = end
+
+
+def iter_json_records(path):
+    # seperti load_json (snapshot + journal) tetapi streaming. Record journal yang
+    # sudah ada di snapshot dilewati; yang diingat hanya ID dari journal.
+    jpath = journal_path(path)
+    journal_ids = set()
+    if os.path.exists(jpath):
+        with open(jpath, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    journal_ids.add(json.loads(line).get('id'))
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+    seen = set()
+    for rec in iter_json_array(path):
+        if rec.get('id') in journal_ids:
+            seen.add(rec.get('id'))
+        yield rec
+    if journal_ids:
+        with open(jpath, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if rec.get('id') in seen:
+                    continue
+                seen.add(rec.get('id'))
+                yield rec
+
+
+def load_json_latest(path):
+    # seperti load_json, tetapi baris journal menggantikan record dengan id yang
+    # sama (untuk record yang bisa berubah, mis. voucher yang dipakai)
+    records = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                data = []
+        for rec in data:
+            records[rec.get('id')] = rec
+    jpath = journal_path(path)
+    if os.path.exists(jpath):
+        with open(jpath, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[rec.get('id')] = rec
+    return list(records.values())
+
+
+def fsync_dir(path):
+    # entri direktori hasil os.replace ikut di-fsync (tidak didukung di Windows)
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def save_json(path, data):
+    # tulis ke file sementara lalu os.replace, agar pembaca tidak melihat file setengah jadi
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=record_to_json)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+    # snapshot penuh (sudah durable) memuat isi journal, journal lama dibuang
+    jpath = journal_path(path)
+    if os.path.exists(jpath):
+        os.remove(jpath)
+
+
+def append_journal(path, record):
+    append_journal_many(path, [record])
+
+
+def append_journal_many(path, records):
+    append_jsonl(journal_path(path), records)
+
+
+def append_jsonl(path, records):
+    # satu record = satu baris JSON, di-fsync sekali agar tahan crash
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(''.join(JSON_ENCODER.encode(r) + "\n" for r in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def compact_journal(path, force=False):
+    # gabungkan journal ke snapshot lalu hapus journal. Tanpa force, hanya jika
+    # journal sudah cukup besar dibanding snapshot (lihat compact_vouchers)
+    jpath = journal_path(path)
+    if not os.path.exists(jpath):
+        return False
+    if not force:
+        snapshot_size = os.path.getsize(path) if os.path.exists(path) else 0
+        if os.path.getsize(jpath) * JOURNAL_COMPACT_RATIO < snapshot_size:
+            return False
+    save_json(path, load_json(path))
+    return True
+
+
+def compact_vouchers(now_text=None, force=False):
+    # voucher terpakai/kadaluarsa dipindah ke arsip (append-only) dan snapshot
+    # ditulis ulang berisi voucher aktif saja. Tanpa force, hanya jika journal
+    # sudah cukup besar dibanding snapshot (biaya tulis ulang terbagi rata).
+    jpath = journal_path(VOUCHERS_FILE)
+    if not os.path.exists(jpath):
+        return 0
+    if not force:
+        snapshot_size = os.path.getsize(VOUCHERS_FILE) if os.path.exists(VOUCHERS_FILE) else 0
+        if os.path.getsize(jpath) * VOUCHER_COMPACT_RATIO < snapshot_size:
+            return 0
+    now_text = now_text or datetime.now().strftime(TIME_FORMAT)
+    active, done = [], []
+    for rec in load_json_latest(VOUCHERS_FILE):
+        v = Voucher.from_dict(rec)
+        (active if v.usable(now_text) else done).append(v)
+    if done:
+        # arsip ditulis dulu: jika terputus sebelum snapshot diganti, voucher
+        # hanya tercatat dua kali di arsip, tidak hilang
+        append_jsonl(VOUCHER_ARCHIVE_FILE, done)
+    save_json(VOUCHERS_FILE, active)
+    return len(done)
+
+
+def ensure_data_dir():
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+    for path in [USERS_FILE, PRODUCTS_FILE, TRANSACTIONS_FILE, VOUCHERS_FILE]:
+        if not os.path.exists(path):
+            save_json(path, [])
+
+
+def format_id(prefix, num):
+    # minimal 4 digit, otomatis melebar setelah 9999 (X-10000, ...)
+    return f"{prefix}-{num:04d}"
+
+
+def parse_id_number(id_str):
+    try:
+        return int(str(id_str).split('-', 1)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def next_id(prefix, existing_ids):
+    num = 1
+    while True:
+        candidate = format_id(prefix, num)
+        if candidate not in existing_ids:
+            return candidate
+        num += 1
+
+
+def load_json_dict(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+
+def save_json_dict(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_counters():
+    return load_json_dict(COUNTERS_FILE)
+
+
+def save_counters(counters):
+    save_json_dict(COUNTERS_FILE, counters)
+
+# Model data
+# User, Product, Transaction dan Voucher memakai __slots__: lebih hemat memori
+# dan akses atribut lebih cepat daripada dict. Record tetap bisa dipakai seperti
+# dict (record['x'], record.get('x'), 'x' in record) sehingga kode lama tetap jalan.
+# Key di luar FIELDS (mis. key dari versi data lain) disimpan di `extra` dan ikut
+# ditulis kembali apa adanya.
+_MISSING = object()
+
+class Record:
+    __slots__ = ('extra',)
+    FIELDS = ()
+    DEFAULTS = {}  # nilai bawaan; callable (mis. list) dipanggil per record
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls._field_set = frozenset(cls.FIELDS)
+        cls._get_fields = attrgetter(*cls.FIELDS)
+
+    def __init__(self, **values):
+        pop = values.pop
+        for name in self.FIELDS:
+            value = pop(name, _MISSING)
+            setattr(self, name, self._default(name) if value is _MISSING else value)
+        self.extra = values or None
+
+    @classmethod
+    def _default(cls, name):
+        value = cls.DEFAULTS.get(name)
+        return value() if callable(value) else value
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        obj = cls.__new__(cls)
+        get = data.get
+        for name in cls.FIELDS:
+            value = get(name, _MISSING)
+            setattr(obj, name, cls._default(name) if value is _MISSING else value)
+        obj.extra = None
+        if not cls._field_set.issuperset(data):
+            obj.extra = {k: v for k, v in data.items() if k not in cls._field_set}
+        return obj
+
+    def to_dict(self):
+        data = dict(zip(self.FIELDS, self._get_fields(self)))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    # akses gaya dict
+    def __getitem__(self, key):
+        if key in self._field_set:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self._field_set or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key)
+        return self.extra.get(key, default) if self.extra else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self):
+        return list(self.FIELDS) + list(self.extra or ())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.FIELDS) + len(self.extra or ())
+
+    def __bool__(self):
+        # record selalu dianggap ada (jangan jatuh ke __len__)
+        return True
+
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+
+    def clear(self):
+        for name in self.FIELDS:
+            setattr(self, name, self._default(name))
+        self.extra = None
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Voucher(Record):
+    # owner = username pemilik; expires_at None = tanpa batas waktu
+    __slots__ = ('id', 'owner', 'percent', 'used', 'expires_at')
+    FIELDS = __slots__
+    DEFAULTS = {'percent': 0, 'used': False}
+
+    def usable(self, now_text):
+        return not self.used and (not self.expires_at or self.expires_at > now_text)
+
+
+class User(Record):
+    # status gagal login/kunci tidak lagi di sini, lihat LoginLimiter
+    __slots__ = ('id', 'username', 'password', 'role', 'balance', 'vip_expiry',
+                 'pending_subscription_days')
+    FIELDS = __slots__
+    DEFAULTS = {'role': 'member', 'balance': 0, 'pending_subscription_days': 0}
+
+
+class Product(Record):
+    __slots__ = ('id', 'name', 'price', 'stock', 'type')
+    FIELDS = __slots__
+    DEFAULTS = {'price': 0, 'stock': 0, 'type': 'topup'}
+
+
+class Transaction(Record):
+    # payment_ref: referensi Gopay/Bank (None untuk Saldo), unik per metode
+    __slots__ = ('id', 'user_id', 'product_id', 'qty', 'unit_price', 'subtotal',
+                 'voucher_applied', 'total', 'method', 'uid_game', 'created_at', 'payment_ref')
+    FIELDS = __slots__
+    DEFAULTS = {'qty': 1}
+
+
+def record_to_json(obj):
+    # dipakai sebagai default= pada json.dump
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# satu encoder dipakai ulang (json.dumps dengan default= membuat encoder baru tiap panggilan)
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, default=record_to_json)
+
+def load_active_vouchers(records, now_text=None):
+    # hanya voucher yang masih bisa dipakai yang disimpan di memori
+    now_text = now_text or datetime.now().strftime(TIME_FORMAT)
+    vouchers = []
+    for rec in records:
+        v = Voucher.from_dict(rec)
+        if v.usable(now_text):
+            vouchers.append(v)
+    return vouchers
+
+# Backend penyimpanan: JSON (bawaan) atau SQLite.
+# Store memanggil backend.commit(...) dengan record yang berubah saja.
+# Beberapa proses Lunite.py boleh memakai folder data yang sama: setiap
+# perubahan dijalankan di bawah lock antar-proses (lihat Store.locked).
+STORAGE_BACKEND = os.environ.get("LUNITE_STORAGE", "json")
+SQLITE_FILE = os.path.join(DATA_DIR, "lunite.db")
+# synchronous FULL (bawaan): commit sudah di-fsync sebelum kembali, tahan mati listrik.
+# LUNITE_SQLITE_SYNC=NORMAL lebih cepat, tetapi commit terakhir bisa hilang jika
+# OS/listrik mati (tetap aman terhadap crash proses)
+SQLITE_SYNCHRONOUS = "NORMAL" if os.environ.get("LUNITE_SQLITE_SYNC", "").upper() == "NORMAL" else "FULL"
+LOCK_FILE = os.path.join(DATA_DIR, ".lock")
+
+
+def _lock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class JsonBackend:
+    def __init__(self):
+        self._lock_f = None
+        self._version = None
+        # posisi journal transaksi yang sudah terbaca, lihat new_transactions
+        self._tail = None
+
+    def load(self):
+        # transaksi tidak ikut dimuat di sini, lihat load_transactions
+        data = {
+            'users': [User.from_dict(u) for u in load_json(USERS_FILE)],
+            'products': [Product.from_dict(p) for p in load_json(PRODUCTS_FILE)],
+            'vouchers': load_active_vouchers(load_json_latest(VOUCHERS_FILE)),
+            'counters': load_counters(),
+            'rollup': load_json_dict(ROLLUP_FILE),
+            'archive': open_archive(),
+            'schema': load_json_dict(SCHEMA_FILE).get('version', 0)
+        }
+        self._version = self._current_version()
+        self._tail = self._journal_position()
+        return data
+
+    def load_transactions(self):
+        return [Transaction.from_dict(t) for t in load_json(TRANSACTIONS_FILE)]
+
+    def iter_transactions(self):
+        return iter_json_records(TRANSACTIONS_FILE)
+
+    def user_transactions(self, user_id, until=None, filters=None):
+        # (nomor urut, transaksi) milik user, terbaru dulu, nomor <= until. File dibaca
+        # maju dan hanya HISTORY_CHUNK record terakhir yang diingat; chunk berikutnya
+        # membaca ulang file sampai sebelum chunk ini, jadi memori tetap kecil
+        while True:
+            chunk = deque(maxlen=HISTORY_CHUNK)
+            for seq, rec in enumerate(iter_json_records(TRANSACTIONS_FILE), 1):
+                if until is not None and seq > until:
+                    break
+                if rec.get('user_id') == user_id and transaction_matches(rec, **(filters or {})):
+                    chunk.append((seq, rec))
+            for seq, rec in reversed(chunk):
+                yield seq, Transaction.from_dict(rec)
+            if len(chunk) < HISTORY_CHUNK:
+                return
+            until = chunk[0][0] - 1
+
+    def load_payment_refs(self):
+        # key referensi -> id transaksi. Transaksi di journal yang belum sempat
+        # tercatat di index (crash di antara dua tulisan) ikut dibaca.
+        refs = {}
+        for path in (PAYMENT_REFS_FILE, journal_path(TRANSACTIONS_FILE)):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if 'key' in rec:
+                        refs[rec['key']] = rec.get('id')
+                    elif rec.get('payment_ref'):
+                        refs[payment_ref_key(rec.get('method'), rec['payment_ref'])] = rec.get('id')
+        return refs
+
+    def drop_transactions(self, store, ids):
+        # transaksi yang sudah masuk arsip dibuang dari snapshot (journal ikut digabung)
+        save_json(TRANSACTIONS_FILE, store.transactions)
+        self._version = self._current_version()
+        self._tail = self._journal_position()
+
+    def _journal_position(self):
+        # (snapshot transaksi, inode journal, ukuran journal)
+        try:
+            st = os.stat(TRANSACTIONS_FILE)
+            snapshot = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            snapshot = None
+        try:
+            st = os.stat(journal_path(TRANSACTIONS_FILE))
+        except FileNotFoundError:
+            return snapshot, None, 0
+        return snapshot, st.st_ino, st.st_size
+
+    def new_transactions(self):
+        # transaksi yang ditulis proses lain sejak load/commit terakhir, dibaca dari
+        # ekor journal. None jika snapshot diganti (compact, arsip) atau journal
+        # diganti/menyusut: pemanggil memuat ulang seluruh riwayat
+        old = self._tail
+        snapshot, inode, size = self._journal_position()
+        if old is None or old[0] != snapshot or (old[1] is not None and old[1] != inode) \
+                or size < old[2]:
+            return None
+        if inode is None:
+            return []
+        start = old[2] if old[1] is not None else 0
+        with open(journal_path(TRANSACTIONS_FILE), "rb") as f:
+            f.seek(start)
+            data = f.read()
+        # baris terakhir yang belum lengkap dibaca lagi lain kali
+        data = data[:data.rfind(b"\n") + 1]
+        self._tail = (snapshot, inode, start + len(data))
+        records = []
+        for line in data.splitlines():
+            try:
+                records.append(Transaction.from_dict(json.loads(line)))
+            except json.JSONDecodeError:
+                continue
+        return records
+
+    def _current_version(self):
+        # versi = (mtime, ukuran, inode) tiap file data; berubah jika ada proses lain yang
+        # menulis. Inode ikut dicek: save_json mengganti file lewat os.replace, sehingga
+        # tulisan dengan ukuran sama di tick mtime yang sama tetap terdeteksi
+        version = []
+        for path in (USERS_FILE, PRODUCTS_FILE, TRANSACTIONS_FILE,
+                     journal_path(TRANSACTIONS_FILE), COUNTERS_FILE, ROLLUP_FILE,
+                     ARCHIVE_META_FILE, SCHEMA_FILE, VOUCHERS_FILE, journal_path(VOUCHERS_FILE)):
+            try:
+                st = os.stat(path)
+                version.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                version.append(None)
+        return version
+
+    def changed(self):
+        return self._version != self._current_version()
+
+    def lock(self):
+        self._lock_f = open(LOCK_FILE, "a+")
+        _lock_file(self._lock_f)
+
+    def unlock(self, ok=True):
+        _unlock_file(self._lock_f)
+        self._lock_f.close()
+        self._lock_f = None
+
+    def commit(self, store, users=(), products=(), transactions=(),
+               removed_products=(), counters=None, rollup=None, schema=None, vouchers=()):
+        # file JSON ditulis terpisah, tidak atomik antar file
+        if vouchers:
+            # voucher baru/berubah ditambahkan ke journal (baris terakhir per id berlaku)
+            append_journal_many(VOUCHERS_FILE, vouchers)
+        if users:
+            save_json(USERS_FILE, store.users)
+        if products or removed_products:
+            save_json(PRODUCTS_FILE, store.products)
+        if transactions:
+            if JOURNAL_MODE:
+                append_journal_many(TRANSACTIONS_FILE, transactions)
+            else:
+                save_json(TRANSACTIONS_FILE, store.transactions)
+            refs = [{'key': payment_ref_key(t.method, t.payment_ref), 'id': t.id}
+                    for t in transactions if t.payment_ref]
+            if refs:
+                # ditulis setelah transaksinya; celah crash ditutup oleh load_payment_refs
+                append_jsonl(PAYMENT_REFS_FILE, refs)
+        if counters is not None:
+            save_counters(counters)
+        if rollup is not None:
+            save_json_dict(ROLLUP_FILE, rollup)
+        if schema is not None:
+            # ditulis terakhir: migrasi dianggap selesai setelah datanya tersimpan
+            save_json_dict(SCHEMA_FILE, {'version': schema})
+        # tulisan sendiri tidak perlu memicu reload
+        self._version = self._current_version()
+        self._tail = self._journal_position()
+
+    def close(self, compact=True):
+        if not compact:
+            return
+        self.lock()
+        try:
+            compact_journal(TRANSACTIONS_FILE)
+            compact_vouchers()
+        finally:
+            self.unlock()
+
+
+# Kolom tetap per tabel; key lain disimpan di kolom extra
+USER_COLUMNS = ['id', 'username', 'password', 'role', 'balance', 'vip_expiry',
+                'pending_subscription_days']
+PRODUCT_COLUMNS = ['id', 'name', 'price', 'stock', 'type']
+TRANSACTION_COLUMNS = ['id', 'user_id', 'product_id', 'qty', 'unit_price', 'subtotal',
+                       'voucher_applied', 'total', 'method', 'uid_game', 'created_at', 'payment_ref']
+VOUCHER_COLUMNS = ['id', 'owner', 'percent', 'used', 'expires_at']
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    id TEXT UNIQUE,
+    password TEXT,
+    role TEXT,
+    balance INTEGER,
+    vip_expiry TEXT,
+    pending_subscription_days INTEGER,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    price INTEGER,
+    stock INTEGER,
+    type TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    product_id TEXT,
+    qty INTEGER,
+    unit_price INTEGER,
+    subtotal INTEGER,
+    voucher_applied TEXT,
+    total INTEGER,
+    method TEXT,
+    uid_game TEXT,
+    created_at TEXT,
+    payment_ref TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions(user_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions(created_at);
+CREATE TABLE IF NOT EXISTS vouchers (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    percent INTEGER,
+    used INTEGER,
+    expires_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_vouchers_owner ON vouchers(owner);
+CREATE TABLE IF NOT EXISTS voucher_archive (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    percent INTEGER,
+    used INTEGER,
+    expires_at TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS counters (
+    prefix TEXT PRIMARY KEY,
+    value INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _row_values(record, columns, skip=()):
+    extra = {k: v for k, v in record.items() if k not in columns and k not in skip}
+    return [record.get(c) for c in columns] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+
+def _row_record(row, columns):
+    record = dict(zip(columns, row))
+    if row[len(columns)]:
+        record.update(json.loads(row[len(columns)]))
+    return record
+
+
+def _upsert_sql(table, columns, key):
+    cols = columns + ['extra']
+    updates = ', '.join(f"{c}=excluded.{c}" for c in cols if c != key)
+    return (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {updates}")
+
+
+class SqliteBackend:
+    def __init__(self, path=None, synchronous=None):
+        import sqlite3
+        self.conn = sqlite3.connect(path or SQLITE_FILE, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous or SQLITE_SYNCHRONOUS}")
+        self.conn.executescript(SQLITE_SCHEMA)
+        # database lama: tabel vouchers belum punya kolom expires_at
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(vouchers)")}
+        if 'expires_at' not in columns:
+            self.conn.execute("ALTER TABLE vouchers ADD COLUMN expires_at TEXT")
+        # ... dan transactions belum punya payment_ref
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")}
+        if 'payment_ref' not in columns:
+            self.conn.execute("ALTER TABLE transactions ADD COLUMN payment_ref TEXT")
+        # pengaman terakhir: referensi yang sama tidak bisa tersimpan dua kali
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_payment_ref "
+                          "ON transactions(method, payment_ref) WHERE payment_ref IS NOT NULL")
+        self._version = None
+        # rowid transaksi terakhir yang sudah terbaca, lihat new_transactions
+        self._last_rowid = 0
+
+    def _data_version(self):
+        # berubah hanya jika koneksi lain melakukan commit
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self):
+        return self._version != self._data_version()
+
+    def lock(self):
+        # BEGIN IMMEDIATE mengambil write lock database sampai commit/rollback
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def unlock(self, ok=True):
+        if self.conn.in_transaction:
+            if ok:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+
+    def load(self):
+        users = [User.from_dict(_row_record(row, USER_COLUMNS)) for row in self.conn.execute(
+            f"SELECT {', '.join(USER_COLUMNS)}, extra FROM users ORDER BY rowid")]
+        # hanya voucher aktif; yang terpakai/kadaluarsa tetap di tabel sampai diarsip
+        vouchers = []
+        for row in self.conn.execute(
+                f"SELECT {', '.join(VOUCHER_COLUMNS)}, extra FROM vouchers "
+                "WHERE used = 0 AND (expires_at IS NULL OR expires_at > ?) ORDER BY rowid",
+                (datetime.now().strftime(TIME_FORMAT),)):
+            v = Voucher.from_dict(_row_record(row, VOUCHER_COLUMNS))
+            v.used = bool(v.used)
+            vouchers.append(v)
+        products = [Product.from_dict(_row_record(row, PRODUCT_COLUMNS)) for row in self.conn.execute(
+            f"SELECT {', '.join(PRODUCT_COLUMNS)}, extra FROM products ORDER BY rowid")]
+        counters = dict(self.conn.execute("SELECT prefix, value FROM counters"))
+        meta = dict(self.conn.execute("SELECT key, value FROM meta WHERE key IN ('rollup', 'schema')"))
+        self._version = self._data_version()
+        self._last_rowid = self._max_rowid()
+        return {
+            'users': users,
+            'products': products,
+            'vouchers': vouchers,
+            'counters': counters,
+            'rollup': json.loads(meta['rollup']) if 'rollup' in meta else {},
+            'archive': open_archive(),
+            'schema': int(meta.get('schema', 0))
+        }
+
+    def load_transactions(self):
+        return [Transaction.from_dict(_row_record(row, TRANSACTION_COLUMNS)) for row in self.conn.execute(
+            f"SELECT {', '.join(TRANSACTION_COLUMNS)}, extra FROM transactions ORDER BY rowid")]
+
+    def iter_transactions(self):
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {', '.join(TRANSACTION_COLUMNS)}, extra FROM transactions ORDER BY rowid")
+        for row in cur:
+            yield _row_record(row, TRANSACTION_COLUMNS)
+
+    def user_transactions(self, user_id, until=None, filters=None):
+        # (rowid, transaksi) milik user, terbaru dulu, rowid <= until: keyset per
+        # HISTORY_CHUNK baris lewat idx_transactions_user, filter ikut di SQL
+        filters = filters or {}
+        where, params = ["user_id = ?"], [user_id]
+        if filters.get('product_id'):
+            where.append("product_id = ?")
+            params.append(filters['product_id'])
+        if filters.get('method'):
+            where.append("lower(method) = lower(?)")
+            params.append(filters['method'])
+        if filters.get('date_from'):
+            where.append("created_at >= ?")
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            where.append("created_at <= ?")
+            params.append(filters['date_to'])
+        sql = (f"SELECT rowid, {', '.join(TRANSACTION_COLUMNS)}, extra FROM transactions "
+               f"WHERE {' AND '.join(where)} AND rowid <= ? ORDER BY rowid DESC LIMIT ?")
+        if until is None:
+            until = 2 ** 63 - 1  # rowid terbesar SQLite
+        while True:
+            rows = self.conn.execute(sql, params + [until, HISTORY_CHUNK]).fetchall()
+            for row in rows:
+                yield row[0], Transaction.from_dict(_row_record(row[1:], TRANSACTION_COLUMNS))
+            if len(rows) < HISTORY_CHUNK:
+                return
+            until = rows[-1][0] - 1
+
+    def _max_rowid(self):
+        return self.conn.execute("SELECT max(rowid) FROM transactions").fetchone()[0] or 0
+
+    def new_transactions(self):
+        # transaksi yang di-commit koneksi lain sejak load/commit terakhir (rowid
+        # lebih besar). Penghapusan (arsip) dideteksi Store lewat jumlah baris arsip
+        rows = self.conn.execute(
+            f"SELECT rowid, {', '.join(TRANSACTION_COLUMNS)}, extra FROM transactions "
+            "WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)).fetchall()
+        if rows:
+            self._last_rowid = rows[-1][0]
+        return [Transaction.from_dict(_row_record(row[1:], TRANSACTION_COLUMNS)) for row in rows]
+
+    def load_payment_refs(self):
+        return {payment_ref_key(method, ref): tid for method, ref, tid in self.conn.execute(
+            "SELECT method, payment_ref, id FROM transactions WHERE payment_ref IS NOT NULL")}
+
+    def drop_transactions(self, store, ids):
+        with self.conn:
+            self.conn.executemany("DELETE FROM transactions WHERE id = ?", [(i,) for i in ids])
+        self._last_rowid = self._max_rowid()
+
+    def commit(self, store, users=(), products=(), transactions=(),
+               removed_products=(), counters=None, rollup=None, schema=None, vouchers=()):
+        # semua perubahan (saldo, stok, transaksi, voucher, counter, laporan) dalam satu transaksi
+        with self.conn:
+            self._write(users, products, transactions, removed_products, counters, rollup, schema,
+                        vouchers)
+        if transactions:
+            self._last_rowid = self._max_rowid()
+
+    def _write(self, users=(), products=(), transactions=(), removed_products=(), counters=None,
+               rollup=None, schema=None, vouchers=()):
+        c = self.conn
+        if users:
+            c.executemany(_upsert_sql('users', USER_COLUMNS, 'username'),
+                          [_row_values(u, USER_COLUMNS) for u in users])
+        if vouchers:
+            c.executemany(_upsert_sql('vouchers', VOUCHER_COLUMNS, 'id'),
+                          [_row_values(v, VOUCHER_COLUMNS) for v in vouchers])
+        if products:
+            c.executemany(_upsert_sql('products', PRODUCT_COLUMNS, 'id'),
+                          [_row_values(p, PRODUCT_COLUMNS) for p in products])
+        if removed_products:
+            c.executemany("DELETE FROM products WHERE id = ?",
+                          [(p.get('id'),) for p in removed_products])
+        if transactions:
+            c.executemany(_upsert_sql('transactions', TRANSACTION_COLUMNS, 'id'),
+                          [_row_values(t, TRANSACTION_COLUMNS) for t in transactions])
+        if counters is not None:
+            c.executemany("INSERT INTO counters (prefix, value) VALUES (?, ?) "
+                          "ON CONFLICT(prefix) DO UPDATE SET value=excluded.value",
+                          list(counters.items()))
+        if rollup is not None:
+            c.execute("INSERT INTO meta (key, value) VALUES ('rollup', ?) "
+                      "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                      (json.dumps(rollup, ensure_ascii=False),))
+        if schema is not None:
+            c.execute("INSERT INTO meta (key, value) VALUES ('schema', ?) "
+                      "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (str(schema),))
+
+    def close(self, compact=True):
+        if compact:
+            self.archive_vouchers()
+        self.conn.close()
+
+    def archive_vouchers(self, now_text=None):
+        # voucher terpakai/kadaluarsa dipindah ke voucher_archive
+        now_text = now_text or datetime.now().strftime(TIME_FORMAT)
+        done = "used != 0 OR (expires_at IS NOT NULL AND expires_at <= ?)"
+        cols = ', '.join(VOUCHER_COLUMNS + ['extra'])
+        with self.conn:
+            self.conn.execute(f"INSERT OR REPLACE INTO voucher_archive ({cols}) "
+                              f"SELECT {cols} FROM vouchers WHERE {done}", (now_text,))
+            moved = self.conn.execute(f"DELETE FROM vouchers WHERE {done}", (now_text,)).rowcount
+        return moved
+
+
+def migrate_json_to_sqlite(path=None):
+    # migrasi sekali jalan dari data/*.json ke database SQLite
+    json_backend = JsonBackend()
+    data = json_backend.load()
+    transactions = json_backend.load_transactions()
+    # semua voucher (termasuk yang sudah terpakai) ikut disalin
+    vouchers = [Voucher.from_dict(v) for v in load_json_latest(VOUCHERS_FILE)]
+    if data['archive']:
+        # arsip kolom dipakai bersama kedua backend, tidak ikut disalin
+        data['archive'].close()
+    backend = SqliteBackend(path)
+    with backend.conn:
+        backend._write(data['users'], data['products'], transactions,
+                       counters=data['counters'], rollup=data['rollup'] or None,
+                       schema=data['schema'] or None, vouchers=vouchers)
+    backend.close(compact=False)
+    return len(data['users']), len(data['products']), len(transactions)
+
+
+# Arsip transaksi lama dalam format kolom
+# Transaksi sebelum tanggal cutoff dipindah dari penyimpanan biasa ke data/arsip/:
+# satu file biner per kolom (angka native, dibaca lewat mmap tanpa di-load) dan
+# meta.json berisi jumlah baris serta tabel string product_id/method/payment_ref.
+# ID (T-/U-/V-), UID game dan waktu disimpan sebagai angka. Record yang tidak bisa
+# dikembalikan persis ke bentuk aslinya (key tambahan, UID diawali 0, dst.)
+# tetap di penyimpanan biasa.
+ARCHIVE_DIR = os.path.join(DATA_DIR, "arsip")
+ARCHIVE_META_FILE = os.path.join(ARCHIVE_DIR, "meta.json")
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_COLUMNS = [('id', 'q'), ('user_id', 'i'), ('product_id', 'H'), ('method', 'B'),
+                   ('qty', 'i'), ('unit_price', 'q'), ('subtotal', 'q'), ('total', 'q'),
+                   ('voucher_applied', 'q'), ('uid_game', 'q'), ('created_at', 'q'),
+                   ('payment_ref', 'I')]
+ARCHIVE_EPOCH = datetime(1970, 1, 1)
+ARCHIVE_TIME_REGEX = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+ARCHIVE_USER_CACHE = 1024
+
+
+def _archive_id(value, prefix):
+    # 'U-0012' -> 12, None -> 0; None jika format tidak bisa dibentuk ulang persis
+    if value is None:
+        return 0
+    num = parse_id_number(value)
+    return num if num > 0 and format_id(prefix, num) == value else None
+
+
+def _archive_time(seconds):
+    return (ARCHIVE_EPOCH + timedelta(seconds=seconds)).strftime(TIME_FORMAT)
+
+
+def _intern(table, lookup, value, limit):
+    if not isinstance(value, str):
+        return None
+    code = lookup.get(value)
+    if code is None:
+        if len(table) > limit:
+            return None
+        code = lookup[value] = len(table)
+        table.append(value)
+    return code
+
+
+def _encode_archive_row(trx, strings, lookups):
+    # tuple nilai kolom sesuai ARCHIVE_COLUMNS, atau None jika tidak bisa diarsip persis
+    if len(trx) != len(TRANSACTION_COLUMNS) or any(k not in trx for k in TRANSACTION_COLUMNS):
+        return None
+    tid = _archive_id(trx['id'], 'T')
+    uid = _archive_id(trx['user_id'], 'U')
+    vid = _archive_id(trx['voucher_applied'], 'V')
+    if not tid or uid is None or uid >= 2 ** 31 or vid is None:
+        return None
+    uid_game = trx['uid_game']
+    if not isinstance(uid_game, str) or not uid_game.isdigit() or str(int(uid_game)) != uid_game \
+            or int(uid_game) >= 2 ** 63:
+        return None
+    amounts = (trx['unit_price'], trx['subtotal'], trx['total'])
+    if type(trx['qty']) is not int or not -2 ** 31 <= trx['qty'] < 2 ** 31 \
+            or any(type(a) is not int or not -2 ** 63 <= a < 2 ** 63 for a in amounts):
+        return None
+    if not isinstance(trx['created_at'], str) or not ARCHIVE_TIME_REGEX.match(trx['created_at']):
+        return None
+    try:
+        created = (datetime.fromisoformat(trx['created_at']) - ARCHIVE_EPOCH) // timedelta(seconds=1)
+    except ValueError:
+        return None
+    if created < 0:
+        return None
+    product = _intern(strings['product_id'], lookups['product_id'], trx['product_id'], 0xFFFF)
+    method = _intern(strings['method'], lookups['method'], trx['method'], 0xFF)
+    if product is None or method is None:
+        return None
+    # kolom payment_ref: 0 = tanpa referensi, n = strings['payment_ref'][n - 1]
+    ref = 0
+    if trx['payment_ref'] is not None:
+        ref = _intern(strings['payment_ref'], lookups['payment_ref'], trx['payment_ref'], 0xFFFFFFFD)
+        if ref is None:
+            return None
+        ref += 1
+    return (tid, uid, product, method, trx['qty'], trx['unit_price'], trx['subtotal'],
+            trx['total'], vid, int(uid_game), created, ref)
+
+
+class TransactionArchive:
+    def __init__(self, path=None):
+        self.path = path or ARCHIVE_DIR
+        meta = load_json_dict(os.path.join(self.path, "meta.json"))
+        self.count = meta.get('count', 0)
+        self.max_id = meta.get('max_id', 0)
+        self.cutoff = meta.get('cutoff')
+        self.strings = meta.get('strings') or {}
+        for name in ('product_id', 'method', 'payment_ref'):
+            self.strings.setdefault(name, [])
+        self._maps = []
+        self.columns = {name: self._map(name, code) for name, code in ARCHIVE_COLUMNS}
+        self._user_positions = OrderedDict()
+
+    def _map(self, name, code):
+        size = self.count * array(code).itemsize
+        if not size:
+            return memoryview(b'').cast(code)
+        path = os.path.join(self.path, name + ".bin")
+        if not os.path.exists(path):
+            # kolom yang ditambahkan setelah arsip dibuat: baris lama bernilai 0
+            return memoryview(bytes(size)).cast(code)
+        with open(path, "rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(m)
+        # file boleh lebih panjang dari count (tulisan yang terputus), sisanya diabaikan
+        return memoryview(m)[:size].cast(code)
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        for m in self._maps:
+            m.close()
+        self._maps = []
+
+    def __len__(self):
+        return self.count
+
+    def row(self, i):
+        c = self.columns
+        uid = c['user_id'][i]
+        vid = c['voucher_applied'][i]
+        ref = c['payment_ref'][i]
+        return Transaction(
+            id=format_id('T', c['id'][i]),
+            user_id=format_id('U', uid) if uid else None,
+            product_id=self.strings['product_id'][c['product_id'][i]],
+            qty=c['qty'][i],
+            unit_price=c['unit_price'][i],
+            subtotal=c['subtotal'][i],
+            voucher_applied=format_id('V', vid) if vid else None,
+            total=c['total'][i],
+            method=self.strings['method'][c['method'][i]],
+            uid_game=str(c['uid_game'][i]),
+            created_at=_archive_time(c['created_at'][i]),
+            payment_ref=self.strings['payment_ref'][ref - 1] if ref else None
+        )
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.count))
+
+    def positions_of_user(self, user_id):
+        num = _archive_id(user_id, 'U')
+        if num is None:
+            return []
+        positions = self._user_positions.get(num)
+        if positions is None:
+            column = self.columns['user_id']
+            try:
+                import numpy as np
+                positions = np.flatnonzero(np.frombuffer(column, dtype=np.int32) == num).tolist()
+            except ImportError:
+                positions = [i for i, u in enumerate(column) if u == num]
+            self._user_positions[num] = positions
+            if len(self._user_positions) > ARCHIVE_USER_CACHE:
+                self._user_positions.popitem(last=False)
+        else:
+            self._user_positions.move_to_end(num)
+        return positions
+
+    def payment_refs(self):
+        # key referensi -> id transaksi untuk baris arsip Gopay/Bank
+        c = self.columns
+        column = c['payment_ref']
+        try:
+            import numpy as np
+            positions = np.flatnonzero(np.frombuffer(column, dtype=np.uint32)).tolist()
+        except ImportError:
+            positions = [i for i, ref in enumerate(column) if ref]
+        refs = self.strings['payment_ref']
+        methods = self.strings['method']
+        return {payment_ref_key(methods[c['method'][i]], refs[column[i] - 1]): format_id('T', c['id'][i])
+                for i in positions}
+
+    def find_ids(self, ids):
+        # ID mana saja (dari himpunan kecil `ids`) yang sudah ada di arsip
+        wanted = {_archive_id(i, 'T'): i for i in ids}
+        return {wanted[n] for n in self.columns['id'] if n in wanted}
+
+
+class _ArchiveRows:
+    # urutan baris arsip (semua atau posisi tertentu) yang di-decode saat diakses
+    def __init__(self, archive, positions=None):
+        self.archive = archive
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.archive) if self.positions is None else len(self.positions)
+
+    def __getitem__(self, i):
+        return self.archive.row(i if self.positions is None else self.positions[i])
+
+
+class _ChainedRows:
+    # arsip (lebih lama) disusul transaksi aktif, diakses dengan satu nomor posisi
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    def __len__(self):
+        return len(self.first) + len(self.second)
+
+    def __getitem__(self, i):
+        n = len(self.first)
+        return self.first[i] if i < n else self.second[i - n]
+
+
+def open_archive(path=None):
+    path = path or ARCHIVE_DIR
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    return TransactionArchive(path)
+
+
+def write_archive(archive, rows, cutoff):
+    # tambahkan baris ke file kolom, lalu meta.json (jumlah baris) ditulis paling akhir
+    os.makedirs(archive.path, exist_ok=True)
+    for col, (name, code) in enumerate(ARCHIVE_COLUMNS):
+        path = os.path.join(archive.path, name + ".bin")
+        with open(path, "ab") as f:
+            # buang sisa tulisan terputus sebelum menambah
+            f.truncate(archive.count * array(code).itemsize)
+            array(code, [r[col] for r in rows]).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+    save_json_dict(os.path.join(archive.path, "meta.json"), {
+        'count': archive.count + len(rows),
+        'max_id': max([archive.max_id] + [r[0] for r in rows]),
+        'cutoff': max(cutoff, archive.cutoff or cutoff),
+        'strings': archive.strings
+    })
+
+
+def _archived_duplicates(transactions, archive):
+    # transaksi aktif yang sudah ada di arsip (proses arsip terhenti sebelum
+    # penyimpanan biasa ditulis ulang); hanya record lebih tua dari cutoff yang dicek
+    if not archive or not archive.cutoff:
+        return set()
+    old = [t.get('id') for t in transactions if (t.get('created_at') or '') < archive.cutoff]
+    return archive.find_ids(old) if old else set()
+
+
+def archive_transactions(store, cutoff):
+    # cutoff 'YYYY-MM-DD': transaksi sebelum tanggal ini dipindah ke arsip
+    with store.locked():
+        archive = store.archive if store.archive is not None else TransactionArchive()
+        strings = {k: list(v) for k, v in archive.strings.items()}
+        lookups = {k: {s: i for i, s in enumerate(v)} for k, v in strings.items()}
+        keep, rows, moved = [], [], []
+        for t in store.transactions:
+            row = None
+            if (t.get('created_at') or '') < cutoff:
+                row = _encode_archive_row(t, strings, lookups)
+            if row is None:
+                keep.append(t)
+            else:
+                rows.append(row)
+                moved.append(t.get('id'))
+        dropped = moved + list(store.archived_duplicates)
+        if not dropped:
+            return 0
+        archive.close()
+        archive.strings = strings
+        if rows:
+            write_archive(archive, rows, cutoff)
+        store.transactions[:] = keep
+        store.archived_duplicates = set()
+        store.reindex()
+        store.archive = open_archive(archive.path)
+        store.backend.drop_transactions(store, dropped)
+    return len(rows)
+
+
+# Versi skema data
+# Perubahan bentuk data dijalankan sekali sebagai langkah migrasi, lalu versinya
+# disimpan (data/skema.json atau tabel meta di SQLite). Start berikutnya tidak
+# perlu memeriksa atau menulis ulang data. Untuk perubahan baru: tambahkan langkah
+# ke MIGRATIONS dan naikkan SCHEMA_VERSION.
+SCHEMA_VERSION = 5
+
+
+def _migrate_user_defaults(store):
+    # v1: field bawaan user (role, balance, ...) sudah diisi saat load;
+    # tulis sekali ke penyimpanan (dulu di-setdefault dan disimpan di setiap start)
+    return {'users': store.users}
+
+
+def _migrate_counters_rollup(store):
+    # v2: counter ID dan laporan penjualan dibangun dari data lama (satu-satunya
+    # langkah yang perlu memuat seluruh riwayat transaksi)
+    for prefix in ('U', 'P', 'T', 'V'):
+        if prefix not in store.counters:
+            store.init_counter(prefix)
+    store.rollup = build_rollup(chain(store.archive or (), store.transactions))
+    store._rollup_dirty = True
+    return {}
+
+
+def _migrate_vouchers(store):
+    # v3: voucher pindah dari list di tiap user ke penyimpanan voucher sendiri
+    users, vouchers = [], []
+    now_text = datetime.now().strftime(TIME_FORMAT)
+    for u in store.users:
+        embedded = u.extra.pop('vouchers', None) if u.extra else None
+        if embedded is None:
+            continue
+        users.append(u)
+        for rec in embedded:
+            v = Voucher.from_dict(rec)
+            v.owner = u.username
+            vouchers.append(v)
+            if v.usable(now_text) and not store.voucher(v.id):
+                store.add_voucher(v)
+    if vouchers:
+        # counter V mungkin dibuat sebelum voucher lama ini terlihat
+        top = max(parse_id_number(v.id) for v in vouchers)
+        if store.counters.get('V', 0) < top:
+            store.counters['V'] = top
+            store._counters_dirty = True
+    return {'users': users, 'vouchers': vouchers}
+
+
+def _migrate_login_state(store):
+    # v4: failed_attempts/locked_until keluar dari record user; kunci yang masih
+    # aktif dipindah ke LoginLimiter
+    users = []
+    for u in store.users:
+        if not u.extra or not ('failed_attempts' in u.extra or 'locked_until' in u.extra):
+            continue
+        u.extra.pop('failed_attempts', None)
+        locked_until = u.extra.pop('locked_until', None)
+        users.append(u)
+        if locked_until:
+            try:
+                until = timestamp_epoch(locked_until)
+            except ValueError:
+                continue
+            if until > time.time():
+                store.limiter.lock_until(u.username, until)
+    store.limiter.save()
+    return {'users': users}
+
+
+def _migrate_user_ids(store):
+    # v5: akun lama tanpa ID (admin bawaan) mendapat ID U- baru, dan key lama
+    # 'saldo' dibuang (jika tidak nol, ditambahkan ke balance)
+    users = []
+    for u in store.users:
+        saldo = u.extra.pop('saldo', None) if u.extra else None
+        if u.id and saldo is None:
+            continue
+        if saldo:
+            try:
+                u.balance = (u.balance or 0) + int(saldo)
+            except (TypeError, ValueError):
+                pass
+        if not u.id:
+            u.id = store.alloc_id('U')
+            store.users_by_id[u.id] = u
+        users.append(u)
+    return {'users': users}
+
+
+MIGRATIONS = [
+    (1, _migrate_user_defaults),
+    (2, _migrate_counters_rollup),
+    (3, _migrate_vouchers),
+    (4, _migrate_login_state),
+    (5, _migrate_user_ids),
+]
+
+
+def migrate_schema(store):
+    if store.schema_version >= SCHEMA_VERSION:
+        return False
+    with store.locked():
+        # proses lain mungkin sudah menjalankan migrasi (locked() me-refresh data)
+        if store.schema_version >= SCHEMA_VERSION:
+            return False
+        changes = {'users': {}, 'vouchers': {}}
+        for version, step in MIGRATIONS:
+            if store.schema_version < version:
+                for key, records in step(store).items():
+                    changes[key].update((id(r), r) for r in records)
+                store.schema_version = version
+        store._schema_dirty = True
+        store.commit(users=list(changes['users'].values()),
+                     vouchers=list(changes['vouchers'].values()))
+    return True
+
+
+def open_store(backend_name=None):
+    backend_name = backend_name or STORAGE_BACKEND
+    if backend_name == 'sqlite':
+        backend = SqliteBackend()
+    elif backend_name == 'json':
+        backend = JsonBackend()
+    else:
+        raise ValueError(f"Backend penyimpanan tidak dikenal: {backend_name}")
+    backend.lock()
+    try:
+        data = backend.load()
+    finally:
+        backend.unlock()
+    store = Store(data['users'], data['products'], None, data['counters'],
+                  backend, data['rollup'], data['archive'], data['schema'], data['vouchers'])
+    store.limiter = LoginLimiter(LOGIN_LIMIT_FILE).load()
+    migrate_schema(store)
+    return store
+
+def _merge_records(old_records, new_records, key):
+    old_by_key = {r.get(key): r for r in old_records}
+    merged = []
+    for rec in new_records:
+        old = old_by_key.get(rec.get(key))
+        if old is not None:
+            old.clear()
+            old.update(rec)
+            rec = old
+        merged.append(rec)
+    return merged
+
+# Store: membungkus list data yang sudah di-load dan menjaga index dict
+# agar pencarian user/produk/transaksi/voucher tidak perlu scan linear.
+class Store:
+    def __init__(self, users, products, transactions, counters=None, backend=None, rollup=None,
+                 archive=None, schema_version=SCHEMA_VERSION, vouchers=None):
+        self.users = users
+        self.products = products
+        # voucher aktif saja (belum dipakai, belum kadaluarsa), lihat load_active_vouchers
+        self.vouchers_by_id = {v.id: v for v in vouchers or ()}
+        # naik setiap kali produk berubah (tambah/ubah/hapus/stok), lihat Catalog
+        self.catalog_version = 0
+        self.catalog = Catalog(self)
+        # percobaan login gagal & kunci akun, hanya di memori (lihat LoginLimiter)
+        self.limiter = LoginLimiter()
+        self.backend = backend
+        # counter ID per prefix (U, P, T, V), ikut disimpan saat commit
+        self.counters = counters if counters is not None else {}
+        self._counters_dirty = False
+        # shard: nomor ID baru selalu = id_offset (mod id_stride), sehingga ID
+        # transaksi/voucher dari shard berbeda tidak bentrok (lihat shard.py)
+        self.id_stride = 1
+        self.id_offset = 0
+        # rollup laporan penjualan, diperbarui setiap transaksi di-commit
+        self.rollup = rollup
+        self._rollup_dirty = False
+        # transaksi lama dalam format kolom (lihat TransactionArchive), bisa None
+        self.archive = archive
+        self.archived_duplicates = set()
+        # versi skema data di penyimpanan (lihat migrate_schema)
+        self.schema_version = schema_version
+        self._schema_dirty = False
+        # transactions=None: riwayat baru dimuat dari backend saat pertama kali
+        # dibutuhkan (lihat Store.transactions). Transaksi baru sebelum itu cukup
+        # diingat sampai tersimpan.
+        self._transactions = None
+        self._unsaved_transactions = []
+        self.transactions_by_user = {}
+        # index referensi pembayaran -> id transaksi, dimuat saat pertama dicek
+        self._payment_refs = None
+        # pesanan Gopay/Bank yang menunggu konfirmasi gateway
+        self.payments = PendingPayments(self)
+        if transactions is not None:
+            self._set_transactions(transactions)
+        if not self.rollup:
+            if transactions is not None:
+                # data lama tanpa laporan.json: bangun sekali dari riwayat
+                self.rollup = build_rollup(chain(archive or (), transactions))
+                self._rollup_dirty = bool(self.rollup['count'])
+            else:
+                self.rollup = new_rollup()
+        self._lock_depth = 0
+        # perubahan yang ditahan selama Store.batch()
+        self._pending = None
+        self.reindex()
+
+    @property
+    def transactions(self):
+        if self._transactions is None:
+            transactions = self.backend.load_transactions() if self.backend is not None else []
+            if self._unsaved_transactions:
+                known = {t.get('id') for t in transactions}
+                transactions.extend(t for t in self._unsaved_transactions if t.get('id') not in known)
+                self._unsaved_transactions = []
+            self._set_transactions(transactions)
+        return self._transactions
+
+    def _set_transactions(self, transactions):
+        self.archived_duplicates = _archived_duplicates(transactions, self.archive)
+        if self.archived_duplicates:
+            transactions = [t for t in transactions if t.get('id') not in self.archived_duplicates]
+        if self._transactions is None:
+            self._transactions = transactions
+        else:
+            # list lama diperbarui di tempat (mis. dipegang oleh pemanggil)
+            self._transactions[:] = transactions
+        self._index_transactions()
+
+    def _index_transactions(self):
+        self.transactions_by_user = {}
+        for t in self._transactions:
+            self.transactions_by_user.setdefault(t.get('user_id'), []).append(t)
+
+    def reindex(self, transactions=True):
+        self.users_by_username = {}
+        self.users_by_id = {}
+        self.products_by_id = {}
+        self.catalog_version += 1
+        self.vouchers_by_owner = {}
+        # VIP: username -> (vip_expiry string, epoch) dan min-heap (epoch, username)
+        self.vip_expiry_ts = {}
+        self.vip_heap = []
+        for u in self.users:
+            self._index_user(u, push_vip=False)
+        self.vip_heap = [(ts, name) for name, (_, ts) in self.vip_expiry_ts.items()]
+        heapq.heapify(self.vip_heap)
+        for p in self.products:
+            self.products_by_id[p.get('id')] = p
+        for v in self.vouchers_by_id.values():
+            self.vouchers_by_owner.setdefault(v.owner, []).append(v)
+        if transactions and self._transactions is not None:
+            self._index_transactions()
+
+    def _index_user(self, user, push_vip=True):
+        self.users_by_username[user.username] = user
+        # akun admin bawaan tidak punya id sebelum migrasi v5
+        if user.id:
+            self.users_by_id[user.id] = user
+        if user.vip_expiry or user.username in self.vip_expiry_ts:
+            self.track_vip(user, push_vip)
+
+    # VIP kadaluarsa: expiry di-parse sekali ke epoch lalu disimpan di heap,
+    # sehingga sweep hanya menyentuh user yang memang sudah lewat masa VIP-nya
+    def track_vip(self, user, push=True):
+        name = user.get('username')
+        expiry = user.get('vip_expiry')
+        if not expiry:
+            self.vip_expiry_ts.pop(name, None)
+            return
+        cached = self.vip_expiry_ts.get(name)
+        if cached and cached[0] == expiry:
+            return
+        try:
+            ts = timestamp_epoch(expiry)
+        except ValueError:
+            ts = 0  # format rusak: dianggap sudah kadaluarsa
+        self.vip_expiry_ts[name] = (expiry, ts)
+        if push:
+            heapq.heappush(self.vip_heap, (ts, name))
+
+    def sweep_vip(self, now=None):
+        # O(kadaluarsa * log n). Entri heap yang sudah usang dilewati.
+        now = time.time() if now is None else now
+        changed = []
+        while self.vip_heap and self.vip_heap[0][0] <= now:
+            ts, name = heapq.heappop(self.vip_heap)
+            cached = self.vip_expiry_ts.get(name)
+            user = self.users_by_username.get(name)
+            if not cached or cached[1] != ts or not user:
+                continue
+            if user.get('vip_expiry') != cached[0]:
+                # expiry diubah tanpa track_vip: parse ulang dan masukkan lagi
+                self.vip_expiry_ts.pop(name, None)
+                self.track_vip(user)
+                continue
+            expire_vip(user)
+            self.vip_expiry_ts.pop(name, None)
+            self.track_vip(user)
+            changed.append(user)
+        return changed
+
+    # ID monoton per prefix: O(1), tanpa probe ke daftar ID yang sudah ada
+    def alloc_id(self, prefix):
+        if prefix not in self.counters:
+            self.init_counter(prefix)
+        n = self.counters[prefix] + 1
+        n += (self.id_offset - n) % self.id_stride
+        self.counters[prefix] = n
+        self._counters_dirty = True
+        return format_id(prefix, n)
+
+    def init_counter(self, prefix):
+        self.counters[prefix] = max(
+            (parse_id_number(i) for i in self._existing_ids(prefix)), default=0)
+        self._counters_dirty = True
+
+    def _existing_ids(self, prefix):
+        # dipakai hanya saat counter belum ada (data lama)
+        if prefix == 'U':
+            return self.users_by_id
+        if prefix == 'P':
+            return self.products_by_id
+        if prefix == 'T':
+            archived = [format_id('T', self.archive.max_id)] if self.archive else []
+            return chain(archived, (t.get('id') for t in self.transactions))
+        if prefix == 'V':
+            return self.vouchers_by_id
+        return ()
+
+    # Lock antar-proses untuk satu aksi yang mengubah data. Jika proses lain
+    # sudah menulis sejak data terakhir di-load, data di-refresh dulu.
+    @contextmanager
+    def locked(self):
+        if self.backend is None or self._lock_depth:
+            # lock sudah dipegang (mis. di dalam batch)
+            yield self
+            return
+        self.backend.lock()
+        self._lock_depth = 1
+        ok = False
+        try:
+            if self.backend.changed():
+                self.refresh()
+            yield self
+            ok = True
+        finally:
+            self._lock_depth = 0
+            self.backend.unlock(ok)
+
+    # Semua commit di dalam batch digabung menjadi satu persist di akhir,
+    # dengan lock dipegang sepanjang batch.
+    @contextmanager
+    def batch(self):
+        with self.locked():
+            self._pending = ({}, {}, [], {}, {})
+            try:
+                yield self
+            except BaseException:
+                # perubahan di memori dibuang, kembali ke isi penyimpanan
+                self._pending = None
+                if self.backend is not None:
+                    self.refresh(full=True)
+                raise
+            users, products, transactions, removed, vouchers = self._pending
+            self._pending = None
+            self.commit(list(users.values()), list(products.values()),
+                        transactions, list(removed.values()), list(vouchers.values()))
+
+    def refresh(self, full=False):
+        # dict lama diperbarui di tempat agar referensi (mis. current_user) tetap valid.
+        # Riwayat & index referensi cukup ditambah transaksi baru dari proses lain;
+        # dimuat ulang penuh jika penyimpanan transaksi diganti (compact, arsip,
+        # migrasi) atau perubahan di memori harus dibuang (full=True)
+        new = None if full else self.backend.new_transactions()
+        archived = len(self.archive) if self.archive else 0
+        data = self.backend.load()
+        self.users[:] = _merge_records(self.users, data['users'], 'username')
+        self.products[:] = _merge_records(self.products, data['products'], 'id')
+        self.vouchers_by_id = {v.id: v for v in data['vouchers']}
+        if self.archive:
+            self.archive.close()
+        self.archive = data['archive']
+        if new is None or len(self.archive or ()) != archived or data['schema'] != self.schema_version:
+            if self._transactions is not None:
+                self._set_transactions(self.backend.load_transactions())
+            self._payment_refs = None
+        else:
+            self._add_new_transactions(new)
+        # riwayat belum dimuat: transaksi sendiri sudah tersimpan, nanti dibaca dari sana
+        self._unsaved_transactions = []
+        self.counters.clear()
+        self.counters.update(data['counters'])
+        self._counters_dirty = False
+        self.rollup = data['rollup'] or new_rollup()
+        self._rollup_dirty = False
+        self.schema_version = data['schema']
+        self._schema_dirty = False
+        # riwayat sudah diindex oleh _set_transactions / _add_new_transactions
+        self.reindex(transactions=False)
+
+    def _add_new_transactions(self, transactions):
+        for t in transactions:
+            if t.payment_ref and self._payment_refs is not None:
+                self._payment_refs[payment_ref_key(t.method, t.payment_ref)] = t.id
+            if self._transactions is None:
+                continue
+            # riwayat yang dimuat setelah load terakhir bisa sudah berisi transaksi ini
+            own = self.transactions_by_user.setdefault(t.user_id, [])
+            if all(x.id != t.id for x in own):
+                self._transactions.append(t)
+                own.append(t)
+
+    # simpan record yang berubah lewat backend (satu commit per aksi)
+    def commit(self, users=(), products=(), transactions=(), removed_products=(), vouchers=()):
+        if products or removed_products:
+            self.catalog_version += 1
+        if self._pending is not None:
+            pending_users, pending_products, pending_trx, pending_removed, pending_vouchers = self._pending
+            for u in users:
+                pending_users[id(u)] = u
+            for p in products:
+                pending_products[id(p)] = p
+            pending_trx.extend(transactions)
+            for p in removed_products:
+                pending_removed[id(p)] = p
+            for v in vouchers:
+                pending_vouchers[id(v)] = v
+            return
+        for trx in transactions:
+            apply_to_rollup(self.rollup, trx)
+        if self.backend is None:
+            return
+        counters = self.counters if self._counters_dirty else None
+        rollup = self.rollup if (transactions or self._rollup_dirty) else None
+        schema = self.schema_version if self._schema_dirty else None
+        self.backend.commit(self, users, products, transactions, removed_products, counters, rollup,
+                            schema, vouchers)
+        self._counters_dirty = False
+        self._rollup_dirty = False
+        self._schema_dirty = False
+        if transactions and self._unsaved_transactions:
+            saved = {id(t) for t in transactions}
+            self._unsaved_transactions = [t for t in self._unsaved_transactions if id(t) not in saved]
+
+    def close(self, compact=True):
+        # compact=True: journal digabung jika sudah cukup besar (JOURNAL_COMPACT_RATIO);
+        # compact=False: journal dibiarkan (digabung nanti lewat 'compact')
+        self.limiter.save()
+        if self.backend is not None:
+            self.backend.close(compact)
+
+    # user
+    def user_by_username(self, username):
+        return self.users_by_username.get(username)
+
+    def user_by_id(self, uid):
+        return self.users_by_id.get(uid)
+
+    def add_user(self, user):
+        self.users.append(user)
+        self._index_user(user)
+
+    # produk
+    def product(self, pid):
+        return self.products_by_id.get(pid)
+
+    def add_product(self, product):
+        self.products.append(product)
+        self.products_by_id[product.get('id')] = product
+        self.catalog_version += 1
+
+    def remove_product(self, product):
+        self.products.remove(product)
+        self.products_by_id.pop(product.get('id'), None)
+        self.catalog_version += 1
+
+    # transaksi
+    def add_transaction(self, trx):
+        if trx.payment_ref and self._payment_refs is not None:
+            self._payment_refs[payment_ref_key(trx.method, trx.payment_ref)] = trx.id
+        if self._transactions is None:
+            self._unsaved_transactions.append(trx)
+            return
+        self._transactions.append(trx)
+        self.transactions_by_user.setdefault(trx.get('user_id'), []).append(trx)
+
+    def payment_ref_owner(self, method, ref):
+        # id transaksi yang sudah memakai referensi ini, atau None
+        if self._payment_refs is None:
+            if self.backend is not None:
+                self._payment_refs = self.backend.load_payment_refs()
+            else:
+                self._payment_refs = {payment_ref_key(t.method, t.payment_ref): t.id
+                                      for t in self.transactions if t.payment_ref}
+            # transaksi Gopay/Bank yang sudah diarsip tetap mengunci referensinya
+            if self.archive is not None:
+                self._payment_refs.update(self.archive.payment_refs())
+            # transaksi yang belum tersimpan (riwayat belum dimuat / di dalam batch)
+            pending = self._pending[2] if self._pending is not None else ()
+            for t in chain(self._unsaved_transactions, pending):
+                if t.payment_ref:
+                    self._payment_refs[payment_ref_key(t.method, t.payment_ref)] = t.id
+        return self._payment_refs.get(payment_ref_key(method, ref))
+
+    def transactions_of(self, user_id):
+        if self._transactions is None:
+            self.transactions  # muat riwayat (dan index per user) dulu
+        return self.transactions_by_user.get(user_id, [])
+
+    def transaction_rows(self, user_id=None):
+        # semua transaksi (atau milik satu user) urut waktu, termasuk arsip
+        hot = self.transactions_of(user_id) if user_id else self.transactions
+        if not self.archive:
+            return hot
+        positions = self.archive.positions_of_user(user_id) if user_id else None
+        return _ChainedRows(_ArchiveRows(self.archive, positions), hot)
+
+    def user_history(self, user_id, start=None, filters=None):
+        # (cursor, transaksi) milik user, terbaru dulu, dibaca langsung dari backend
+        # tanpa memuat seluruh riwayat. Cursor < len(arsip): posisi di arsip user;
+        # selebihnya len(arsip) + nomor urut backend (rowid SQLite / urutan file JSON)
+        filters = filters or {}
+        archive = self.archive
+        base = len(archive) if archive else 0
+        positions = archive.positions_of_user(user_id) if archive else []
+        if start is None or start >= base:
+            archived = None
+            until = None if start is None else start - base
+            for seq, t in self.backend.user_transactions(user_id, until, filters):
+                # transaksi yang juga sudah ada di arsip (lihat _archived_duplicates)
+                if archive and archive.cutoff and (t.created_at or '') < archive.cutoff:
+                    if archived is None:
+                        ids = archive.columns['id']
+                        archived = {ids[p] for p in positions}
+                    if _archive_id(t.id, 'T') in archived:
+                        continue
+                yield base + seq, t
+            start = None
+        last = len(positions) - 1
+        for i in range(last if start is None else min(start, last), -1, -1):
+            t = archive.row(positions[i])
+            if transaction_matches(t, **filters):
+                yield i, t
+
+    # voucher: index per ID dan per pemilik, hanya voucher aktif
+    def voucher(self, vid):
+        return self.vouchers_by_id.get(vid)
+
+    def usable_voucher(self, vid, username):
+        # voucher milik username yang masih bisa dipakai, atau None
+        v = self.vouchers_by_id.get(vid)
+        if v and v.owner == username and v.usable(datetime.now().strftime(TIME_FORMAT)):
+            return v
+        return None
+
+    def vouchers_of(self, username, now_text=None):
+        # voucher yang masih bisa dipakai; yang sudah kadaluarsa ikut dilewati
+        now_text = now_text or datetime.now().strftime(TIME_FORMAT)
+        return [v for v in self.vouchers_by_owner.get(username, ()) if v.usable(now_text)]
+
+    def add_voucher(self, voucher):
+        self.vouchers_by_id[voucher.id] = voucher
+        self.vouchers_by_owner.setdefault(voucher.owner, []).append(voucher)
+
+    def use_voucher(self, voucher):
+        # voucher terpakai keluar dari index (tetap disimpan lewat commit lalu diarsip)
+        voucher.used = True
+        self.vouchers_by_id.pop(voucher.id, None)
+        owned = self.vouchers_by_owner.get(voucher.owner)
+        if owned:
+            self.vouchers_by_owner[voucher.owner] = [v for v in owned if v is not voucher]
+
+# Hash password (scrypt dari hashlib, dengan salt)
+# Format: scrypt$<log2 N>$<r>$<p>$<salt hex>$<hash hex>
+# Record lama yang masih plain text di-upgrade otomatis saat login berhasil.
+PASSWORD_HASH_COST = int(os.environ.get("LUNITE_HASH_COST", 14))  # N = 2**cost
+PASSWORD_HASH_R = 8
+PASSWORD_HASH_P = 1
+VERIFY_CACHE_SIZE = 10000
+
+# cache verifikasi yang berhasil: hash tersimpan -> HMAC password dengan kunci
+# acak per proses, sehingga login berulang tidak menjalankan scrypt lagi
+_verify_cache = OrderedDict()
+_verify_cache_key = secrets.token_bytes(32)
+
+
+def _scrypt(password, salt, cost, r, p):
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=2 ** cost, r=r, p=p,
+                          maxmem=256 * r * (2 ** cost) + 1024 * 1024, dklen=32)
+
+
+def hash_password(password, cost=None):
+    cost = cost or PASSWORD_HASH_COST
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, cost, PASSWORD_HASH_R, PASSWORD_HASH_P)
+    return f"scrypt${cost}${PASSWORD_HASH_R}${PASSWORD_HASH_P}${salt.hex()}${digest.hex()}"
+
+
+def is_password_hash(stored):
+    return isinstance(stored, str) and stored.startswith("scrypt$")
+
+
+def verify_password(password, stored):
+    if not is_password_hash(stored):
+        # record lama (plain text)
+        return hmac.compare_digest(password.encode('utf-8'), str(stored or '').encode('utf-8'))
+    try:
+        _, cost, r, p, salt, digest = stored.split('$')
+        expected = bytes.fromhex(digest)
+        actual = _scrypt(password, bytes.fromhex(salt), int(cost), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def cached_verify(password, stored):
+    # True jika kombinasi ini pernah terverifikasi, None jika belum ada di cache
+    mac = _verify_cache.get(stored)
+    if mac is None:
+        return None
+    if hmac.compare_digest(mac, hmac.new(_verify_cache_key, password.encode('utf-8'), 'sha256').digest()):
+        _verify_cache.move_to_end(stored)
+        return True
+    return None
+
+
+def remember_verified(password, stored):
+    _verify_cache[stored] = hmac.new(_verify_cache_key, password.encode('utf-8'), 'sha256').digest()
+    _verify_cache.move_to_end(stored)
+    if len(_verify_cache) > VERIFY_CACHE_SIZE:
+        _verify_cache.popitem(last=False)
+
+
+def password_needs_upgrade(stored):
+    if not is_password_hash(stored):
+        return True
+    return stored.split('$')[1] != str(PASSWORD_HASH_COST)
+
+
+def check_password(password, stored):
+    # Hasil: (cocok, hash baru atau None). Hash baru diisi jika record masih
+    # plain text atau cost-nya berbeda dari PASSWORD_HASH_COST.
+    # Fungsi ini aman dijalankan di process pool (tidak menyentuh Store).
+    ok = cached_verify(password, stored) or verify_password(password, stored)
+    if not ok:
+        return False, None
+    new_hash = hash_password(password) if password_needs_upgrade(stored) else None
+    return True, new_hash
+
+# Setting agar Username hanya berupa huruf
+USERNAME_REGEX = re.compile(r"^[A-Za-z]{3,16}$")
+
+def validate_username(username):
+    if not USERNAME_REGEX.match(username):
+        return False, "Username harus 3-16 huruf alphabet tanpa angka atau simbol."
+    return True, ""
+
+
+def validate_password(password):
+    if len(password) < 6 or len(password) > 16:
+        return False, "Password harus antara 6 sampai 16 karakter."
+    # hitung simbol unik 
+    symbols = set(ch for ch in password if not ch.isalnum())
+    if len(symbols) > 3:
+        return False, "Password tidak boleh memiliki lebih dari 3 simbol unik."
+    return True, ""
+
+
+def validate_uid(uid):
+    if not uid.isdigit():
+        return False, "UID harus berupa angka."
+    if len(uid) < 8:
+        return False, "UID harus minimal 8 digit."
+    return True, ""
+
+# Pengaturan untuk Voucher
+
+def compute_voucher_percent(amount):
+    # jika >= 100000, 2% per 100k
+    if amount < 100000:
+        return 0
+    times = amount // 100000
+    return int(times * 2)
+
+# Mesin harga/checkout (tanpa print/input)
+# Dipakai menu interaktif, order massal, dan quote_batch untuk banyak data sekaligus.
+
+def voucher_expiry(days, now=None):
+    if not days:
+        return None
+    return ((now or datetime.now()) + timedelta(days=days)).strftime(TIME_FORMAT)
+
+
+def issue_campaign(store, percent, role=None, days=None):
+    # kampanye: satu voucher untuk setiap user (atau hanya role tertentu),
+    # disimpan sekaligus dalam satu commit
+    with store.locked():
+        expires_at = voucher_expiry(days)
+        issued = []
+        for u in store.users:
+            if role and u.role != role:
+                continue
+            if u.role == 'admin':
+                continue
+            v = Voucher(id=store.alloc_id('V'), owner=u.username, percent=percent, used=False,
+                        expires_at=expires_at)
+            store.add_voucher(v)
+            issued.append(v)
+        store.commit(vouchers=issued)
+    return len(issued)
+
+
+def vip_price(price):
+    return int(price * (100 - VIP_DISCOUNT_PERCENT) / 100)
+
+
+def unit_price_for(role, price):
+    # harga berdasarkan role akun
+    if role == 'vip':
+        return vip_price(price)
+    return price
+
+
+def voucher_discount(amount, percent):
+    return int(amount * percent / 100)
+
+
+def quote(user, product, voucher=None, qty=1):
+    unit_price = unit_price_for(user.role, product.price)
+    subtotal = unit_price * qty
+    discount = voucher_discount(subtotal, voucher.percent) if voucher else 0
+    return {
+        'product_id': product.id,
+        'qty': qty,
+        'unit_price': unit_price,
+        'subtotal': subtotal,
+        'voucher_id': voucher.id if voucher else None,
+        'voucher_percent': voucher.percent if voucher else 0,
+        'discount': discount,
+        'total': subtotal - discount
+    }
+
+
+def quote_cart(user, lines, voucher=None):
+    # lines: [(produk, qty)]. Voucher dipakai sekali untuk subtotal keranjang;
+    # potongannya dibagi ke tiap baris sebanding subtotal (sisa pembulatan ke
+    # baris terakhir), sehingga keranjang satu baris sama persis dengan quote().
+    quotes = [quote(user, product, None, qty) for product, qty in lines]
+    subtotal = sum(q['subtotal'] for q in quotes)
+    discount = voucher_discount(subtotal, voucher.percent) if voucher else 0
+    left = discount
+    for i, q in enumerate(quotes):
+        if i == len(quotes) - 1:
+            share = left
+        else:
+            share = discount * q['subtotal'] // subtotal if subtotal else 0
+        left -= share
+        q['voucher_id'] = voucher.id if voucher else None
+        q['voucher_percent'] = voucher.percent if voucher else 0
+        q['discount'] = share
+        q['total'] = q['subtotal'] - share
+    return {
+        'lines': quotes,
+        'subtotal': subtotal,
+        'voucher_id': voucher.id if voucher else None,
+        'voucher_percent': voucher.percent if voucher else 0,
+        'discount': discount,
+        'total': subtotal - discount
+    }
+
+
+def quote_batch(roles, prices, voucher_percents, qty=1):
+    # Versi vektor dari quote() dengan NumPy (opsional). Pembulatan sama persis
+    # dengan int(...) di jalur skalar: operasi float64 yang sama lalu dipotong
+    # ke arah nol. Berlaku selama harga * 100 < 2**53.
+    # Hasil: (unit_price, subtotal, discount, total)
+    try:
+        import numpy as np
+    except ImportError:
+        unit = [unit_price_for(r, p) for r, p in zip(roles, prices)]
+        subtotal = [u * qty for u in unit]
+        discount = [voucher_discount(s, pct) for s, pct in zip(subtotal, voucher_percents)]
+        total = [s - d for s, d in zip(subtotal, discount)]
+        return unit, subtotal, discount, total
+    prices = np.asarray(prices, dtype=np.int64)
+    is_vip = np.asarray(roles) == 'vip'
+    unit = np.where(is_vip, (prices * (100 - VIP_DISCOUNT_PERCENT) / 100).astype(np.int64), prices)
+    subtotal = unit * qty
+    discount = (subtotal * np.asarray(voucher_percents, dtype=np.int64) / 100).astype(np.int64)
+    return unit, subtotal, discount, subtotal - discount
+
+
+def extend_subscription(user, now=None):
+    # aktifkan atau perpanjang VIP setelah pembelian Subscription
+    now = now or datetime.now()
+    vip_expiry_str = user.get('vip_expiry')
+    if vip_expiry_str:
+        try:
+            vip_expiry_dt = datetime.strptime(vip_expiry_str, "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            vip_expiry_dt = None
+    else:
+        vip_expiry_dt = None
+
+    if not vip_expiry_dt or now > vip_expiry_dt:
+        new_exp = now + timedelta(days=SUBSCRIPTION_DAYS)
+        user['vip_expiry'] = new_exp.strftime("%Y-%m-%d %H:%M:%S")
+        user['role'] = 'vip'
+        return f"Subscription aktif. Anda menjadi VIP sampai {user['vip_expiry']}"
+    # jika subscription masih aktif akan dilanjutkan ke periode berikutnya
+    new_exp = vip_expiry_dt + timedelta(days=SUBSCRIPTION_DAYS)
+    user['vip_expiry'] = new_exp.strftime("%Y-%m-%d %H:%M:%S")
+    # role tetap vip
+    user['role'] = 'vip'
+    return f"Subscription ditambahkan. VIP sekarang berlaku sampai {user['vip_expiry']}"
+
+# Laporan penjualan
+# Rollup diperbarui per transaksi saat commit (lihat Store.commit) sehingga
+# laporan tidak perlu membaca ulang seluruh riwayat transaksi.
+# Bucket per jam hanya disimpan untuk beberapa hari terakhir; per hari disimpan semua.
+ROLLUP_HOURLY_DAYS = 31
 
-# # Utilitas: load/save file ke JSON
+def new_rollup():
+    return {'count': 0, 'revenue': 0, 'units': 0, 'daily': {}, 'hourly': {},
+            'products': {}, 'methods': {}, 'vouchers': {'used': 0, 'discount': 0}}
 
-def load_json(path):
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
 
+def _add_bucket(buckets, key, total, qty):
+    b = buckets.get(key)
+    if b is None:
+        b = buckets[key] = {'count': 0, 'revenue': 0, 'units': 0}
+    b['count'] += 1
+    b['revenue'] += total
+    b['units'] += qty
+    return b
 
-def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
 
+def apply_to_rollup(rollup, trx):
+    total = trx.get('total') or 0
+    qty = trx.get('qty') or 0
+    created = trx.get('created_at') or '-'
+    rollup['count'] += 1
+    rollup['revenue'] += total
+    rollup['units'] += qty
+    _add_bucket(rollup['daily'], created[:10], total, qty)
+    hourly = rollup['hourly']
+    is_new_hour = created[:13] not in hourly
+    _add_bucket(hourly, created[:13], total, qty)
+    if is_new_hour and len(hourly) > ROLLUP_HOURLY_DAYS * 24:
+        # buang jam tertua (jarang terjadi: hanya saat jam baru dimulai)
+        for key in sorted(hourly)[:len(hourly) - ROLLUP_HOURLY_DAYS * 24]:
+            del hourly[key]
+    p = rollup['products'].setdefault(trx.get('product_id') or '-', {'units': 0, 'revenue': 0})
+    p['units'] += qty
+    p['revenue'] += total
+    m = rollup['methods'].setdefault(trx.get('method') or '-', {'count': 0, 'revenue': 0})
+    m['count'] += 1
+    m['revenue'] += total
+    # voucher keranjang dicatat di baris pertama saja, tetapi potongannya
+    # tersebar ke semua baris
+    if trx.get('voucher_applied'):
+        rollup['vouchers']['used'] += 1
+    rollup['vouchers']['discount'] += (trx.get('subtotal') or total) - total
 
-def ensure_data_dir():
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-    for path in [USERS_FILE, PRODUCTS_FILE, TRANSACTIONS_FILE]:
-        if not os.path.exists(path):
-            save_json(path, [])
 
+def build_rollup(transactions):
+    # transactions boleh berupa generator (rebuild streaming)
+    rollup = new_rollup()
+    for trx in transactions:
+        apply_to_rollup(rollup, trx)
+    return rollup
 
-def next_id(prefix, existing_ids):
-    num = 1
-    while True:
-        candidate = f"{prefix}-{num:04d}"
-        if candidate not in existing_ids:
-            return candidate
-        num += 1
 
-def find_user_by_username(users, username):
-    return next((u for u in users if u.get("username") == username), None)
+def sales_report(rollup, days=7, top=10):
+    # ringkasan siap tampil; ukurannya tergantung jumlah hari/produk, bukan transaksi
+    daily = rollup.get('daily', {})
+    recent_days = sorted(daily)[-days:]
+    last_day = recent_days[-1] if recent_days else None
+    hourly = rollup.get('hourly', {})
+    products = sorted(rollup.get('products', {}).items(),
+                      key=lambda kv: kv[1]['revenue'], reverse=True)[:top]
+    return {
+        'count': rollup.get('count', 0),
+        'revenue': rollup.get('revenue', 0),
+        'units': rollup.get('units', 0),
+        'daily': [(d, daily[d]) for d in recent_days],
+        'hourly': sorted((h, b) for h, b in hourly.items() if last_day and h.startswith(last_day)),
+        'products': products,
+        'methods': sorted(rollup.get('methods', {}).items(), key=lambda kv: kv[1]['revenue'], reverse=True),
+        'vouchers': rollup.get('vouchers', {'used': 0, 'discount': 0})
+    }
 
 
-def find_user_by_id(users, uid):
-    return next((u for u in users if u.get("id") == uid), None)
+def rebuild_rollup(backend_name=None):
+    # hitung ulang laporan dari seluruh transaksi secara streaming (memori tetap kecil)
+    backend_name = backend_name or STORAGE_BACKEND
+    backend = SqliteBackend() if backend_name == 'sqlite' else JsonBackend()
+    backend.lock()
+    ok = False
+    try:
+        archive = open_archive()
+        rollup = build_rollup(chain(archive or (), backend.iter_transactions()))
+        if archive:
+            archive.close()
+        backend.commit(None, rollup=rollup)
+        ok = True
+    finally:
+        backend.unlock(ok)
+        backend.close(compact=False)
+    return rollup
 
+# Library UI di-import saat pertama kali dipakai
+def make_table(field_names):
+    from prettytable import PrettyTable
+    table = PrettyTable()
+    table.field_names = field_names
+    return table
 
-def find_product(products, pid):
-    return next((p for p in products if p.get("id") == pid), None)
 
-# Setting agar Username hanya berupa huruf
-USERNAME_REGEX = re.compile(r"^[A-Za-z]{3,16}$")
+def ask_password(prompt):
+    import pwinput
+    return pwinput.pwinput(prompt)
 
-def validate_username(username):
-    if not USERNAME_REGEX.match(username):
-        return False, "Username harus 3-16 huruf alphabet tanpa angka atau simbol."
-    return True, ""
+# Cache katalog: baris produk (harga member dan VIP sudah dihitung) dikelompokkan
+# per tipe, tabel yang sudah dirender disimpan per tipe (isinya sama untuk semua
+# role: member juga melihat kolom harga VIP). Semua dibuang
+# saat Store.catalog_version berubah, jadi tidak ada yang perlu di-invalidate manual.
+CATALOG_FIELDS = ["ID", "Nama", "Harga", "Harga(VIP)", "Tipe", "Stok"]
+CATALOG_FILTER_MIN = 50  # katalog lebih besar dari ini: tanya filter tipe dulu
 
+class Catalog:
+    def __init__(self, store):
+        self.store = store
+        self.version = None
+        self.by_type = {}
+        self.views = {}
 
-def validate_password(password):
-    if len(password) < 6 or len(password) > 16:
-        return False, "Password harus antara 6 sampai 16 karakter."
-    # hitung simbol unik 
-    symbols = set(ch for ch in password if not ch.isalnum())
-    if len(symbols) > 3:
-        return False, "Password tidak boleh memiliki lebih dari 3 simbol unik."
-    return True, ""
+    def _sync(self):
+        version = self.store.catalog_version
+        if version == self.version:
+            return
+        # versi dibaca sebelum membangun baris: jika produk berubah di tengah
+        # jalan (writer thread di server.py), cache dibangun ulang di panggilan berikutnya
+        everything = []
+        by_type = {None: everything}
+        for p in self.store.products:
+            row = (p.id, p.name, p.price, vip_price(p.price), p.type or '-', p.stock)
+            everything.append(row)
+            by_type.setdefault(row[4], []).append(row)
+        self.by_type = by_type
+        self.views = {}
+        self.version = version
 
+    def types(self):
+        self._sync()
+        return sorted(t for t in self.by_type if t is not None)
 
-def validate_uid(uid):
-    if not uid.isdigit():
-        return False, "UID harus berupa angka."
-    if len(uid) < 8:
-        return False, "UID harus minimal 8 digit."
-    return True, ""
+    def rows(self, type=None):
+        self._sync()
+        return self.by_type.get(type, [])
 
-# Pengaturan untuk Voucher
+    def items(self, type=None):
+        # baris sebagai dict untuk API (GET /products)
+        key = ('items', type)
+        self._sync()
+        if key not in self.views:
+            self.views[key] = [dict(zip(('id', 'name', 'price', 'vip_price', 'type', 'stock'), row))
+                               for row in self.rows(type)]
+        return self.views[key]
 
-def compute_voucher_percent(amount):
-    # jika >= 100000, 2% per 100k
-    if amount < 100000:
-        return 0
-    times = amount // 100000
-    return int(times * 2)
+    def table(self, type=None):
+        key = ('table', type)
+        self._sync()
+        if key not in self.views:
+            table = make_table(CATALOG_FIELDS)
+            for row in self.rows(type):
+                table.add_row(row)
+            self.views[key] = table.get_string()
+        return self.views[key]
 
-def gen_voucher_id(existing_ids):
-    return next_id('V', existing_ids)
 
 # Tampilkan tabel produk
-def show_products_table(products, role='member'):
-    table = PrettyTable()
-    table.field_names = ["ID", "Nama", "Harga", "Harga(VIP)", "Tipe", "Stok"]
-    for p in products:
-        vip_price = int(p['price'] * (100 - VIP_DISCOUNT_PERCENT) / 100)
-        table.add_row([p['id'], p['name'], p['price'], vip_price, p.get('type','-'), p.get('stock',0)])
-    print(table)
+def show_products_table(store, role='member', type=None):
+    print(store.catalog.table(type))
+
+
+def ask_product_type(store):
+    # katalog kecil ditampilkan utuh; katalog besar bisa disaring per tipe
+    if len(store.products) <= CATALOG_FILTER_MIN:
+        return None
+    types = store.catalog.types()
+    t = input(f"Filter tipe ({'/'.join(types)}, kosongkan untuk semua): ").strip().lower()
+    return t if t in types else None
 
 #Tampilkan tabel akun pengguna
-def show_user_profile(user):
-    print(f"ID: {user.get('id')}")
-    print(f"Username: {user.get('username')}")
-    print(f"Role: {user.get('role')}")
-    print(f"Saldo: Rp{user.get('balance',0)}")
-    vip_expiry = user.get('vip_expiry')
-    if vip_expiry:
-        print(f"VIP expiry: {vip_expiry}")
-    pending = user.get('pending_subscription_days',0)
-    if pending:
-        print(f"Pending subscription extension: {pending} hari")
-    vouchers = user.get('vouchers',[])
+def show_sales_report(store, days=7):
+    names = {p.get('id'): p.get('name') for p in store.products}
+    print_sales_report(sales_report(store.rollup, days), names, days)
+
+
+def print_sales_report(report, product_names, days=7):
+    # report dari sales_report; product_names: id produk -> nama
+    print(f"Total transaksi: {report['count']} | Unit terjual: {report['units']} | Pendapatan: Rp{report['revenue']}")
+    table = make_table(['Tanggal', 'Transaksi', 'Unit', 'Pendapatan'])
+    for day, b in report['daily']:
+        table.add_row([day, b['count'], b['units'], b['revenue']])
+    print(f"Pendapatan {days} hari terakhir")
+    print(table)
+    if report['hourly']:
+        table = make_table(['Jam', 'Transaksi', 'Unit', 'Pendapatan'])
+        for hour, b in report['hourly']:
+            table.add_row([hour[11:] + ':00', b['count'], b['units'], b['revenue']])
+        print(f"Per jam ({report['daily'][-1][0]})")
+        print(table)
+    table = make_table(['Produk', 'Nama', 'Unit', 'Pendapatan'])
+    for pid, b in report['products']:
+        table.add_row([pid, product_names.get(pid) or '-', b['units'], b['revenue']])
+    print('Produk terlaris')
+    print(table)
+    table = make_table(['Metode', 'Transaksi', 'Pendapatan'])
+    for method, b in report['methods']:
+        table.add_row([method, b['count'], b['revenue']])
+    print(table)
+    v = report['vouchers']
+    print(f"Voucher dipakai: {v['used']} kali, total potongan Rp{v['discount']}")
+
+
+def show_user_profile(user, store):
+    print(f"ID: {user.id}")
+    print(f"Username: {user.username}")
+    print(f"Role: {user.role}")
+    print(f"Saldo: Rp{user.balance}")
+    if user.vip_expiry:
+        print(f"VIP expiry: {user.vip_expiry}")
+    if user.pending_subscription_days:
+        print(f"Pending subscription extension: {user.pending_subscription_days} hari")
+    # hanya voucher aktif milik user ini (index per pemilik)
+    vouchers = store.vouchers_of(user.username)
     if vouchers:
-        vs = ', '.join([f"{v['id']}({v['percent']}%){' used' if v.get('used') else ''}" for v in vouchers])
+        vs = ', '.join([f"{v.id}({v.percent}%)" for v in vouchers[:PROFILE_VOUCHERS]])
+        if len(vouchers) > PROFILE_VOUCHERS:
+            vs += f" (+{len(vouchers) - PROFILE_VOUCHERS} lainnya)"
         print(f"Vouchers: {vs}")
     else:
         print("Vouchers: -")
 
 # Authentifikasi Akun
 #Buat akun
-def register(users):
+def register(store):
     print("=== Registrasi Akun Baru ===")
     username = input("Username baru: ").strip()
     ok, msg = validate_username(username)
     if not ok:
         print("Error:", msg)
         return None
-    if find_user_by_username(users, username):
+    if store.user_by_username(username):
         print("Username sudah digunakan.")
         return None
-    password = pwinput.pwinput("Password: ").strip()
+    password = ask_password("Password: ").strip()
     ok, msg = validate_password(password)
     if not ok:
         print("Error:", msg)
         return None
     
-    # Role akun baru bawaan/default
-    existing_ids = [u.get('id') for u in users if u.get('id')]
-    uid = next_id('U', existing_ids)
-    new_user = {
-        'id': uid,
-        'username': username,
-        'password': password,
-        'role': 'member',
-        'balance': 0,
-        'failed_attempts': 0,
-        'locked_until': None,
-        'vouchers': [],
-        'vip_expiry': None,
-        'pending_subscription_days': 0
-    }
-    #Simpan data akun baru
-    users.append(new_user)
-    save_json(USERS_FILE, users)
+    # hash dihitung di luar lock karena sengaja lambat
+    password_hash = hash_password(password)
+    with store.locked():
+        # cek ulang: username bisa saja baru didaftarkan proses lain
+        if store.user_by_username(username):
+            print("Username sudah digunakan.")
+            return None
+        # Role akun baru bawaan/default
+        uid = store.alloc_id('U')
+        new_user = User(id=uid, username=username, password=password_hash, role='member')
+        #Simpan data akun baru
+        store.add_user(new_user)
+        store.commit(users=[new_user])
     print(f"Akun berhasil dibuat. ID: {uid}. Silakan login kembali.")
     return new_user
 
 #Periksa status VIP Akun
+@lru_cache(maxsize=65536)
+def timestamp_epoch(text):
+    # string waktu -> epoch; hasil di-cache agar parsing tidak diulang.
+    # fromisoformat jauh lebih cepat dari strptime untuk format TIME_FORMAT.
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except (TypeError, ValueError):
+        return datetime.strptime(text, TIME_FORMAT).timestamp()
+
+
+def expire_vip(user):
+    # nonaktifkan VIP
+    user['vip_expiry'] = None
+    user['role'] = 'member'
+
+    # Jika ada perpanjangan durasi VIP
+    pending_days = user.get('pending_subscription_days',0)
+    if pending_days > 0:
+        new_exp = datetime.now() + timedelta(days=pending_days)
+        user['vip_expiry'] = new_exp.strftime(TIME_FORMAT)
+        user['role'] = 'vip'
+        user['pending_subscription_days'] = 0
+
+
 def check_and_update_vip_status(user):
     # Jika VIP kadaluarsa
     vip_expiry = user.get('vip_expiry')
     if vip_expiry:
         try:
-            exp = datetime.strptime(vip_expiry, "%Y-%m-%d %H:%M:%S")
-            if datetime.now() > exp:
-                # nonaktifkan VIP
-                user['vip_expiry'] = None
-                user['role'] = 'member'
-
-                # Jika ada perpanjangan durasi VIP
-                pending_days = user.get('pending_subscription_days',0)
-                if pending_days > 0:
-                    new_exp = datetime.now() + timedelta(days=pending_days)
-                    user['vip_expiry'] = new_exp.strftime("%Y-%m-%d %H:%M:%S")
-                    user['role'] = 'vip'
-                    user['pending_subscription_days'] = 0
+            if time.time() > timestamp_epoch(vip_expiry):
+                expire_vip(user)
                 return True  
         except Exception:
             user['vip_expiry'] = None
@@ -195,61 +2393,346 @@ def check_and_update_vip_status(user):
     return False
 
 
-def login(users):
+def sweep_expired_vips(store):
+    # turunkan (atau perpanjang dari pending) semua VIP yang sudah kadaluarsa
+    with store.locked():
+        changed = store.sweep_vip()
+        if changed:
+            store.commit(users=changed)
+    return changed
+
+
+# Pembatas percobaan login di memori
+# Percobaan gagal dicatat per username dengan sliding window: MAX_FAILED_ATTEMPTS
+# gagal dalam FAILED_WINDOW_SECS mengunci akun selama LOCK_DURATION_SECS. Per klien
+# (mis. alamat IP di server) percobaan gagal memakai token bucket. Tidak ada tulis
+# ke disk per percobaan:
+# hanya kunci yang masih aktif di-snapshot ke LOGIN_LIMIT_FILE, paling sering
+# sekali per LIMITER_SNAPSHOT_SECS dan saat Store.close, agar restart tidak
+# membuka kunci.
+MAX_FAILED_ATTEMPTS = 3
+FAILED_WINDOW_SECS = 15 * 60
+CLIENT_LOGIN_RATE = 5  # percobaan gagal per detik per klien
+CLIENT_LOGIN_BURST = 20
+LIMITER_SNAPSHOT_SECS = 5
+LOGIN_LIMIT_FILE = os.path.join(DATA_DIR, "login_limit.json")
+
+
+class LoginLimiter:
+    def __init__(self, path=None, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.failures = {}  # username -> deque waktu gagal (maks MAX_FAILED_ATTEMPTS)
+        self.locks = {}  # username -> epoch kunci berakhir
+        self.buckets = {}  # klien -> [token, waktu isi ulang terakhir]
+        self.changed = {}  # username -> kunci baru (None = dilepas) sejak save terakhir
+        self.dirty = False
+        self.last_save = 0
+        self.snapshot_writes = 0
+
+    def load(self):
+        if self.path:
+            now = self.clock()
+            self.locks = {name: until for name, until in load_json_dict(self.path).items()
+                          if until > now}
+        return self
+
+    def locked_seconds(self, username):
+        # sisa detik kunci (0 jika tidak terkunci); kunci yang sudah lewat dibuang
+        until = self.locks.get(username)
+        if until is None:
+            return 0
+        remaining = until - self.clock()
+        if remaining > 0:
+            return max(int(remaining), 1)
+        del self.locks[username]
+        self.failures.pop(username, None)
+        self.changed[username] = None
+        self.dirty = True
+        return 0
+
+    def _client_tokens(self, client, now):
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = [CLIENT_LOGIN_BURST, now]
+        bucket[0] = min(CLIENT_LOGIN_BURST, bucket[0] + (now - bucket[1]) * CLIENT_LOGIN_RATE)
+        bucket[1] = now
+        return bucket
+
+    def client_wait(self, client):
+        # detik tunggu sebelum klien boleh mencoba lagi (0 = boleh)
+        if client is None or client not in self.buckets:
+            return 0
+        tokens = self._client_tokens(client, self.clock())[0]
+        if tokens >= 1:
+            return 0
+        return max(int((1 - tokens) / CLIENT_LOGIN_RATE + 0.999), 1)
+
+    def record_failure(self, username, client=None):
+        # True jika percobaan ini membuat akun terkunci
+        now = self.clock()
+        if client is not None:
+            self._client_tokens(client, now)[0] -= 1
+        window = self.failures.get(username)
+        if window is None:
+            window = self.failures[username] = deque(maxlen=MAX_FAILED_ATTEMPTS)
+        window.append(now)
+        if len(window) < MAX_FAILED_ATTEMPTS or now - window[0] > FAILED_WINDOW_SECS:
+            return False
+        self.locks[username] = self.changed[username] = now + LOCK_DURATION_SECS
+        window.clear()
+        self.dirty = True
+        self.maybe_save()
+        return True
+
+    def record_success(self, username):
+        self.failures.pop(username, None)
+        if self.locks.pop(username, None) is not None:
+            self.changed[username] = None
+            self.dirty = True
+
+    def status(self, username):
+        # (jumlah gagal dalam window, waktu kunci berakhir atau None) untuk ditampilkan
+        window = self.failures.get(username) or ()
+        now = self.clock()
+        failed = sum(1 for t in window if now - t <= FAILED_WINDOW_SECS)
+        until = self.locks.get(username)
+        if until is None or until <= now:
+            return failed, None
+        return failed, datetime.fromtimestamp(until).strftime(TIME_FORMAT)
+
+    def lock_until(self, username, until):
+        self.locks[username] = self.changed[username] = until
+        self.dirty = True
+
+    def maybe_save(self):
+        if self.dirty and self.clock() - self.last_save >= LIMITER_SNAPSHOT_SECS:
+            self.save()
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        now = self.clock()
+        # proses lain (CLI kedua, server, node shard) menyimpan ke file yang sama:
+        # isi file dibaca ulang dan hanya perubahan proses ini yang ditimpakan.
+        # Lock terpisah dari LOCK_FILE karena save bisa dipanggil di dalam store.locked().
+        with open(self.path + ".lock", "a+") as f:
+            _lock_file(f)
+            try:
+                locks = load_json_dict(self.path)
+                for name, until in self.changed.items():
+                    if until is None:
+                        locks.pop(name, None)
+                    else:
+                        locks[name] = until
+                # hanya kunci aktif; percobaan gagal yang belum mengunci tidak disimpan
+                self.locks = {name: until for name, until in locks.items() if until > now}
+                save_json_dict(self.path, self.locks)
+            finally:
+                _unlock_file(f)
+        self.changed = {}
+        self.failures = {name: w for name, w in self.failures.items()
+                         if w and now - w[-1] <= FAILED_WINDOW_SECS}
+        self.buckets = {c: b for c, b in self.buckets.items()
+                        if b[0] + (now - b[1]) * CLIENT_LOGIN_RATE < CLIENT_LOGIN_BURST}
+        self.dirty = False
+        self.last_save = now
+        self.snapshot_writes += 1
+
+
+def authenticate(store, user, password, checked=None, client=None):
+    # Cek password. Percobaan gagal hanya dicatat di store.limiter (memori);
+    # data user ditulis hanya jika berubah (hash di-upgrade, status VIP).
+    # Hasil: (berhasil, pesan)
+    # checked: hasil check_password yang sudah dihitung di luar (mis. process pool)
+    if checked is None:
+        checked = check_password(password, user.password)
+    ok, new_hash = checked
+    if not ok:
+        messages = ["Password salah."]
+        if store.limiter.record_failure(user.username, client):
+            messages.append(f"Akun dikunci sementara selama {LOCK_DURATION_SECS} detik karena "
+                            f"{MAX_FAILED_ATTEMPTS} kali gagal login.")
+        return False, messages
+    store.limiter.record_success(user.username)
+    with store.locked():
+        changed = False
+        if new_hash:
+            user.password = new_hash
+            changed = True
+        remember_verified(password, user.password)
+        # cek status VIP ketika login
+        if check_and_update_vip_status(user):
+            store.track_vip(user)
+            changed = True
+        if changed:
+            store.commit(users=[user])
+    return True, [f"Selamat datang, {user.username}! Role: {user.role}"]
+
+
+def login(store):
     print("=== Log In ===")
     username = input("Username: ").strip()
-    user = find_user_by_username(users, username)
+    user = store.user_by_username(username)
     if not user:
         print("User tidak ditemukan.")
         return None
     # cek lock
-    if user.get('locked_until'):
-        try:
-            lu = datetime.strptime(user.get('locked_until'), "%Y-%m-%d %H:%M:%S")
-            if datetime.now() < lu:
-                rem = int((lu - datetime.now()).total_seconds())
-                print(f"Akun terkunci sementara. Coba lagi dalam {rem} detik.")
-                return None
-            else:
-                user['locked_until'] = None
-                user['failed_attempts'] = 0
-        except Exception:
-            user['locked_until'] = None
-            user['failed_attempts'] = 0
-
-    password = pwinput.pwinput("Password: ").strip()
-    if password == user.get('password'):
-        user['failed_attempts'] = 0
-        user['locked_until'] = None
-        # cek status VIP ketika login
-        changed = check_and_update_vip_status(user)
-        if changed:
-            save_json(USERS_FILE, users)
-        save_json(USERS_FILE, users)
-        print(f"Selamat datang, {user.get('username')}! Role: {user.get('role')}")
-        return user
-    else:
-        user['failed_attempts'] = user.get('failed_attempts',0) + 1
-        print("Password salah.")
-        if user['failed_attempts'] >= 3:
-            lu = datetime.now() + timedelta(seconds=LOCK_DURATION_SECS)
-            user['locked_until'] = lu.strftime("%Y-%m-%d %H:%M:%S")
-            print(f"Akun dikunci sementara selama {LOCK_DURATION_SECS} detik karena 3 kali gagal login.")
-        save_json(USERS_FILE, users)
+    rem = store.limiter.locked_seconds(username)
+    if rem:
+        print(f"Akun terkunci sementara. Coba lagi dalam {rem} detik.")
         return None
 
+    password = ask_password("Password: ").strip()
+    ok, messages = authenticate(store, user, password)
+    for message in messages:
+        print(message)
+    return user if ok else None
+
 # Pembelian
 
-def buy_lunite_flow(current_user, users, products, transactions):
+def payment_ref_key(method, ref):
+    return f"{method}:{ref}"
+
+
+def place_cart(store, current_user, items, uid_game, method, voucher_id=None, expected_total=None,
+               payment_ref=None):
+    # Checkout keranjang: items = [(product_id, qty)]. Semua baris dicek dulu
+    # (stok, voucher, harga, saldo) di bawah lock, baru kemudian dipotong dan
+    # disimpan dalam satu commit. Tiap baris menjadi satu record transaksi;
+    # voucher dan referensi Gopay/Bank dicatat di baris pertama (nomor invoice).
+    # Hasil: (daftar trx, pesan); daftar trx None jika gagal dan pesan[0] berisi alasannya.
+    messages = []
+    with store.locked():
+        if payment_ref:
+            used_by = store.payment_ref_owner(method, payment_ref)
+            if used_by:
+                return None, [f"Referensi {method} {payment_ref} sudah dipakai untuk transaksi {used_by}."]
+        # produk yang sama digabung menjadi satu baris
+        wanted = {}
+        for pid, qty in items:
+            if type(qty) is not int or qty <= 0:
+                return None, ["Jumlah tidak valid."]
+            wanted[pid] = wanted.get(pid, 0) + qty
+        if not wanted:
+            return None, ["Keranjang kosong."]
+        lines = []
+        for pid, qty in wanted.items():
+            p = store.product(pid)
+            if not p:
+                return None, ["Produk tidak ditemukan."]
+            if p.stock < qty:
+                return None, ["Stok habis." if p.stock <= 0 else f"Stok {p.name} hanya {p.stock}."]
+            lines.append((p, qty))
+
+        applied_voucher = None
+        if voucher_id:
+            applied_voucher = store.usable_voucher(voucher_id, current_user.username)
+            if not applied_voucher:
+                return None, ["Voucher sudah tidak berlaku."]
+        q = quote_cart(current_user, lines, applied_voucher)
+        total = q['total']
+        if expected_total is not None and total != expected_total:
+            return None, [f"Harga berubah menjadi Rp{total}. Silakan ulangi pembelian."]
+
+        if method == 'Saldo':
+            if current_user.balance < total:
+                return None, ["Saldo tidak cukup. Silakan top up atau pilih metode lain."]
+            current_user.balance -= total
+            messages.append("Pembayaran berhasil melalui Saldo.")
+
+        # buat transaksi per baris
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        trxs = []
+        for (p, qty), line in zip(lines, q['lines']):
+            trx = Transaction(
+                id=store.alloc_id('T'),
+                user_id=current_user.id,
+                product_id=p.id,
+                qty=qty,
+                unit_price=line['unit_price'],
+                subtotal=line['subtotal'],
+                voucher_applied=None if trxs else line['voucher_id'],
+                total=line['total'],
+                method=method,
+                uid_game=uid_game,
+                created_at=created_at,
+                payment_ref=None if trxs else payment_ref
+            )
+            store.add_transaction(trx)
+            # reservasi stok terjadi di dalam lock sehingga dua pembeli tidak bisa
+            # sama-sama mengambil unit terakhir
+            p.stock -= qty
+            trxs.append(trx)
+
+        # tandai voucher terpakai
+        vouchers = []
+        if applied_voucher:
+            store.use_voucher(applied_voucher)
+            vouchers.append(applied_voucher)
+
+        # buat voucher baru jika memenuhi (dari total keranjang)
+        new_v_pct = compute_voucher_percent(total)
+        if new_v_pct > 0:
+            new_vid = store.alloc_id('V')
+            new_v = Voucher(id=new_vid, owner=current_user.username, percent=new_v_pct, used=False,
+                            expires_at=voucher_expiry(VOUCHER_VALID_DAYS))
+            store.add_voucher(new_v)
+            vouchers.append(new_v)
+            messages.append(f"Anda mendapat voucher {new_vid} sebesar {new_v_pct}% untuk pembelian berikutnya.")
+
+        subscriptions = sum(qty for p, qty in lines if p.type == 'subscription')
+        if subscriptions:
+            for _ in range(subscriptions):
+                message = extend_subscription(current_user)
+            messages.append(message)
+            store.track_vip(current_user)
+
+        # saldo, stok, transaksi dan voucher disimpan dalam satu commit
+        store.commit(users=[current_user], products=[p for p, _ in lines], transactions=trxs,
+                     vouchers=vouchers)
+    return trxs, messages
+
+
+def place_order(store, current_user, pid, uid_game, method, voucher_id=None, expected_total=None,
+                payment_ref=None):
+    # Pembelian satu produk: keranjang berisi satu baris.
+    # Hasil: (trx, pesan); trx None jika gagal dan pesan[0] berisi alasannya.
+    trxs, messages = place_cart(store, current_user, [(pid, 1)], uid_game, method, voucher_id,
+                                expected_total, payment_ref)
+    return (trxs[0] if trxs else None), messages
+
+def ask_cart(store):
+    # isi keranjang: [(product_id, qty)]; produk yang sama digabung
+    items = {}
+    while True:
+        pid = input("Masukkan ID produk: ").strip()
+        p = store.product(pid)
+        if not p:
+            print("Produk tidak ditemukan.")
+        elif p.stock <= 0:
+            print("Stok habis.")
+        else:
+            raw = input("Jumlah (kosong = 1): ").strip()
+            try:
+                qty = int(raw) if raw else 1
+            except ValueError:
+                qty = 0
+            if qty <= 0:
+                print("Jumlah harus angka > 0")
+            elif items.get(pid, 0) + qty > p.stock:
+                print(f"Stok {p.name} hanya {p.stock}.")
+            else:
+                items[pid] = items.get(pid, 0) + qty
+        if input("Tambah produk lain? (y/n): ").strip().lower() != 'y':
+            return list(items.items())
+
+
+def buy_lunite_flow(current_user, store):
     print("=== Beli Lunite ===")
-    show_products_table(products, role=current_user.get('role'))
-    pid = input("Masukkan ID produk: ").strip()
-    p = find_product(products, pid)
-    if not p:
-        print("Produk tidak ditemukan.")
-        return
-    if p.get('stock',0) <= 0:
-        print("Stok habis.")
+    show_products_table(store, current_user.role, ask_product_type(store))
+    items = ask_cart(store)
+    if not items:
         return
     
     # Input UID
@@ -258,21 +2741,13 @@ def buy_lunite_flow(current_user, users, products, transactions):
     if not ok:
         print("UID Tidak Valid:", msg)
         return
-    qty = 1
-    # harga berdasarkan role akun
-    unit_price = p['price']
-    if current_user.get('role') == 'vip':
-        unit_price = int(unit_price * (100 - VIP_DISCOUNT_PERCENT) / 100)
-
-    subtotal = unit_price * qty
-
     # pilih voucher
-    usable_vouchers = [v for v in current_user.get('vouchers',[]) if not v.get('used')]
+    usable_vouchers = store.vouchers_of(current_user.username)
     applied_voucher = None
     if usable_vouchers:
         print("Voucher tersedia:")
         for i,v in enumerate(usable_vouchers,1):
-            print(f"{i}. {v['id']} - {v['percent']}%")
+            print(f"{i}. {v.id} - {v.percent}%")
         choose = input("Pakai voucher? (masukkan nomor / kosong = tidak): ").strip()
         if choose:
             try:
@@ -282,17 +2757,16 @@ def buy_lunite_flow(current_user, users, products, transactions):
                 applied_voucher = None
 
     # ringkasan & konfirmasi
-    total = subtotal
-    if applied_voucher:
-        disc = int(total * applied_voucher['percent'] / 100)
-        total = total - disc
+    products = [store.product(pid) for pid, _ in items]
+    q = quote_cart(current_user, [(p, qty) for p, (_, qty) in zip(products, items)], applied_voucher)
+    total = q['total']
     print("--- Ringkasan Pembelian ---")
-    print(f"Produk: {p['name']}")
+    for p, line in zip(products, q['lines']):
+        print(f"Produk: {p.name} x{line['qty']} @ Rp{line['unit_price']} = Rp{line['subtotal']}")
     print(f"UID tujuan: {uid_game}")
-    print(f"Harga satuan: Rp{unit_price}")
-    print(f"Subtotal: Rp{subtotal}")
+    print(f"Subtotal: Rp{q['subtotal']}")
     if applied_voucher:
-        print(f"Voucher {applied_voucher['id']} -> {applied_voucher['percent']}% (-Rp{disc})")
+        print(f"Voucher {applied_voucher.id} -> {applied_voucher.percent}% (-Rp{q['discount']})")
     print(f"Total bayar: Rp{total}")
 
     print("Pilih metode pembayaran:")
@@ -309,101 +2783,290 @@ def buy_lunite_flow(current_user, users, products, transactions):
         return
 
     # Konfirmasi final sebelum pembayaran
-    confirm = input(f"Konfirmasi: Bayar Rp{total} untuk {p['name']} ke UID {uid_game}? (y/n): ").strip().lower()
+    if len(items) == 1 and items[0][1] == 1:
+        what = products[0].name
+    else:
+        what = f"{sum(qty for _, qty in items)} item"
+    confirm = input(f"Konfirmasi: Bayar Rp{total} untuk {what} ke UID {uid_game}? (y/n): ").strip().lower()
     if confirm != 'y':
         print("Pembelian dibatalkan.")
         return
 
     # Proses pembayaran
     if method == 'Saldo':
-        if current_user.get('balance',0) < total:
+        if current_user.balance < total:
             print("Saldo tidak cukup. Silakan top up atau pilih metode lain.")
             return
-        current_user['balance'] -= total
-        print("Pembayaran berhasil melalui Saldo.")
+        ref = None
     else:
-        ref = input(f"Masukkan referensi {method}: ").strip()
+        ref = input(f"Masukkan referensi {method} (kosongkan untuk bayar lewat gateway): ").strip()
         if not ref:
-            print("Referensi kosong. Pembayaran batal.")
+            # gateway simulasi: pesanan selesai saat konfirmasi datang (lihat PendingPayments)
+            ref = store.payments.start({'username': current_user.username,
+                                        'items': [{'product_id': pid, 'qty': qty} for pid, qty in items],
+                                        'uid_game': uid_game, 'method': method,
+                                        'voucher': q['voucher_id'], 'expected_total': total})
+            print(f"Menunggu konfirmasi {method} (ref {ref}). Pesanan diproses otomatis setelah dibayar.")
             return
+
+    trxs, messages = place_cart(store, current_user, items, uid_game, method,
+                                q['voucher_id'], total, ref)
+    if trxs and ref:
         print(f"Pembayaran {method} diterima (simulasi), ref: {ref}")
+    for message in messages:
+        print(message)
+    if not trxs:
+        return
 
-    # buat transaksi
-    existing_tids = [t.get('id') for t in transactions if t.get('id')]
-    tid = next_id('T', existing_tids)
-    trx = {
-        'id': tid,
-        'user_id': current_user.get('id'),
-        'product_id': p['id'],
-        'qty': qty,
-        'unit_price': unit_price,
-        'subtotal': subtotal,
-        'voucher_applied': applied_voucher['id'] if applied_voucher else None,
-        'total': total,
-        'method': method,
-        'uid_game': uid_game,
-        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    transactions.append(trx)
-    p['stock'] = p.get('stock',0) - qty
+    print_invoice(store, trxs, current_user.username)
+    print("Terima kasih telah berbelanja!")
 
-    # tandai voucher terpakai
-    if applied_voucher:
-        for v in current_user.get('vouchers',[]):
-            if v['id'] == applied_voucher['id']:
-                v['used'] = True
-                break
+# Gateway pembayaran simulasi
+# charge() langsung mengembalikan referensi; konfirmasi dikirim belakangan dari
+# thread timer lewat callback(ref, paid). Seperti gateway sungguhan, konfirmasi
+# bisa gagal atau terkirim lebih dari sekali (duplicate_rate).
+GATEWAY_DELAY_SECS = 2
+PAYMENT_RESULTS_KEPT = 10000
 
-    # buat voucher baru jika memenuhi
-    new_v_pct = compute_voucher_percent(total)
-    if new_v_pct > 0:
-        existing_vids = []
-        for u in users:
-            for vv in u.get('vouchers',[]):
-                existing_vids.append(vv['id'])
-        new_vid = gen_voucher_id(existing_vids)
-        new_v = {'id': new_vid, 'percent': new_v_pct, 'used': False}
-        current_user.setdefault('vouchers', []).append(new_v)
-        print(f"Anda mendapat voucher {new_vid} sebesar {new_v_pct}% untuk pembelian berikutnya.")
-
-    if p.get('type') == 'subscription':
-        now = datetime.now()
-        vip_expiry_str = current_user.get('vip_expiry')
-        if vip_expiry_str:
-            try:
-                vip_expiry_dt = datetime.strptime(vip_expiry_str, "%Y-%m-%d %H:%M:%S")
-            except Exception:
-                vip_expiry_dt = None
-        else:
-            vip_expiry_dt = None
+class PaymentGateway:
+    def __init__(self, delay=GATEWAY_DELAY_SECS, fail_rate=0.0, duplicate_rate=0.0, seed=None):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.duplicate_rate = duplicate_rate
+        self.random = random.Random(seed)
 
-        if not vip_expiry_dt or now > vip_expiry_dt:
-            # aktifkan akun VIP setelah pembelian Subscription
-            new_exp = max(now, now) + timedelta(days=SUBSCRIPTION_DAYS)
-            current_user['vip_expiry'] = new_exp.strftime("%Y-%m-%d %H:%M:%S")
-            current_user['role'] = 'vip'
-            print(f"Subscription aktif. Anda menjadi VIP sampai {current_user['vip_expiry']}")
-        else:
-            # jika subscription masih aktif akan dilanjutkan ke periode berikutnya
-            new_exp = vip_expiry_dt + timedelta(days=SUBSCRIPTION_DAYS)
-            current_user['vip_expiry'] = new_exp.strftime("%Y-%m-%d %H:%M:%S")
-            # role tetap vip
-            current_user['role'] = 'vip'
-            print(f"Subscription ditambahkan. VIP sekarang berlaku sampai {current_user['vip_expiry']}")
+    def charge(self, method, amount, callback):
+        ref = f"{method[:2].upper()}{secrets.token_hex(8).upper()}"
+        paid = self.random.random() >= self.fail_rate
+        sends = 2 if self.random.random() < self.duplicate_rate else 1
+        for n in range(sends):
+            timer = threading.Timer(self.delay * (n + 1), callback, (ref, paid))
+            timer.daemon = True
+            timer.start()
+        return ref
+
+
+class PendingPayments:
+    # Pesanan yang menunggu konfirmasi gateway. Callback dari thread gateway hanya
+    # masuk antrean; pesanan diselesaikan oleh pemilik Store (menu CLI, writer
+    # server) lewat settle(), sehingga alur beli tidak menunggu gateway.
+    def __init__(self, store, gateway=None):
+        self.store = store
+        self.gateway = gateway or PaymentGateway()
+        self.orders = {}  # ref -> order (format process_order)
+        self.results = OrderedDict()  # ref -> (username, trxs, error)
+        self.inbox = queue.SimpleQueue()
+        # dipanggil dari thread gateway setelah konfirmasi masuk antrean
+        self.on_notify = None
+
+    def start(self, order):
+        ref = self.gateway.charge(order['method'], order.get('expected_total'), self._notify)
+        self.orders[ref] = order
+        return ref
+
+    def _notify(self, ref, paid):
+        self.inbox.put((ref, paid))
+        if self.on_notify is not None:
+            self.on_notify()
+
+    def status(self, ref):
+        # (status, username, trxs, error); status None jika ref tidak dikenal
+        if ref in self.orders:
+            return 'pending', self.orders[ref].get('username'), None, None
+        if ref in self.results:
+            username, trxs, error = self.results[ref]
+            return ('ok' if trxs else 'gagal'), username, trxs, error
+        return None, None, None, None
+
+    def settle(self):
+        # hasil: [(ref, order, trxs, error)] untuk konfirmasi yang sudah masuk
+        settled = []
+        while True:
+            try:
+                ref, paid = self.inbox.get_nowait()
+            except queue.Empty:
+                return settled
+            order = self.orders.pop(ref, None)
+            if order is None:
+                # konfirmasi ganda: pesanan sudah diselesaikan sebelumnya
+                continue
+            if paid:
+                trxs, error = process_order(self.store, dict(order, payment_ref=ref))
+            else:
+                trxs, error = None, "Pembayaran ditolak gateway."
+            self.results[ref] = (order.get('username'), trxs, error)
+            if len(self.results) > PAYMENT_RESULTS_KEPT:
+                self.results.popitem(last=False)
+            settled.append((ref, order, trxs, error))
 
-    save_json(USERS_FILE, users)
-    save_json(PRODUCTS_FILE, products)
-    save_json(TRANSACTIONS_FILE, transactions)
 
+def print_invoice(store, trxs, username):
+    # satu invoice untuk semua baris keranjang; nomornya ID transaksi pertama
     print("== Invoice ==")
-    table = PrettyTable()
-    table.field_names = ['Invoice','User','Produk','Qty','Total','Metode','UID','Tanggal']
-    table.add_row([trx['id'], current_user.get('username'), p.get('name'), trx['qty'], trx['total'], trx['method'], trx['uid_game'], trx['created_at']])
+    first = trxs[0]
+    table = make_table(['Invoice','User','Produk','Qty','Total','Metode','UID','Tanggal'])
+    for trx in trxs:
+        product = store.product(trx.product_id)
+        table.add_row([first.id, username, product.name if product else trx.product_id, trx.qty,
+                       trx.total, trx.method, trx.uid_game, trx.created_at])
     print(table)
-    print("Terima kasih telah berbelanja!")
+    if len(trxs) > 1:
+        print(f"Total invoice: Rp{sum(trx.total for trx in trxs)}")
+
+
+def show_settled_payments(store):
+    # cetak pesanan gateway yang sudah dikonfirmasi sejak menu terakhir tampil
+    for ref, order, trxs, error in store.payments.settle():
+        if not trxs:
+            print(f"Pembayaran {order['method']} ref {ref} gagal: {error}")
+            continue
+        print(f"Pembayaran {trxs[0].method} ref {ref} dikonfirmasi.")
+        print_invoice(store, trxs, order['username'])
+
+
+# Order massal (non-interaktif) untuk reseller
+# Setiap order melewati place_cart yang sama (harga VIP, voucher, stok,
+# subscription), tetapi disimpan sekali per batch, bukan per order.
+# Order berisi product_id (+ qty opsional) atau items: [{product_id, qty}].
+BATCH_SIZE = 10000
+PAYMENT_METHODS = {'1': 'Saldo', '2': 'Gopay', '3': 'Bank',
+                   'saldo': 'Saldo', 'gopay': 'Gopay', 'bank': 'Bank'}
+
+
+def read_orders(path):
+    # CSV (dengan header) atau JSONL, dibaca baris per baris
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    # satu baris rusak tidak menghentikan batch: dicatat sebagai order gagal
+                    yield InvalidOrder(f"Baris tidak valid: {e}")
+
+
+class InvalidOrder:
+    # baris input yang tidak bisa dibaca (lihat read_orders)
+    def __init__(self, error):
+        self.error = error
+
+
+def order_items(order):
+    # [(product_id, qty)] dari order; qty kosong berarti 1
+    items = order.get('items')
+    if items is None:
+        items = [{'product_id': order.get('product_id'), 'qty': order.get('qty')}]
+    cart = []
+    for item in items:
+        qty = item.get('qty')
+        cart.append((str(item.get('product_id') or '').strip(),
+                     int(qty) if qty not in (None, '') else 1))
+    return cart
+
+
+def process_order(store, order):
+    # Hasil: (trxs, error); trxs berisi satu transaksi per baris keranjang
+    username = str(order.get('username') or '').strip()
+    user = store.user_by_username(username)
+    if not user:
+        return None, "User tidak ditemukan."
+    # harga VIP mengikuti status terbaru, sama seperti saat login
+    if check_and_update_vip_status(user):
+        store.track_vip(user)
+    uid_game = str(order.get('uid_game') or '').strip()
+    ok, msg = validate_uid(uid_game)
+    if not ok:
+        return None, f"UID Tidak Valid: {msg}"
+    method = PAYMENT_METHODS.get(str(order.get('method') or '').strip().lower())
+    if not method:
+        return None, "Metode tidak valid."
+    voucher_id = str(order.get('voucher') or '').strip() or None
+    try:
+        items = order_items(order)
+    except (AttributeError, TypeError, ValueError):
+        return None, "Jumlah tidak valid."
+    expected_total = order.get('expected_total')
+    try:
+        expected_total = int(expected_total) if expected_total not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, "Total tidak valid."
+    payment_ref = None
+    if method != 'Saldo':
+        payment_ref = str(order.get('payment_ref') or '').strip() or None
+    trxs, messages = place_cart(store, user, items, uid_game, method, voucher_id, expected_total,
+                               payment_ref)
+    if not trxs:
+        return None, messages[0]
+    return trxs, None
+
+
+def _process_chunk(store, chunk):
+    results = []
+    with store.batch():
+        for line_no, order in chunk:
+            if isinstance(order, InvalidOrder):
+                trxs, error = None, order.error
+            else:
+                try:
+                    trxs, error = process_order(store, order)
+                except (AttributeError, TypeError, ValueError) as e:
+                    trxs, error = None, f"Order tidak valid: {e}"
+            result = {
+                'line': line_no,
+                'username': order.get('username') if isinstance(order, dict) else None,
+                'product_id': order.get('product_id') if isinstance(order, dict) else None,
+                'status': 'ok' if trxs else 'gagal',
+                'transaction_id': trxs[0]['id'] if trxs else None,
+                'total': sum(trx['total'] for trx in trxs) if trxs else None,
+                'error': error
+            }
+            results.append(result)
+    return results
+
+
+def process_orders(store, orders, batch_size=BATCH_SIZE):
+    # generator hasil per order, dengan satu persist per batch_size order
+    chunk = []
+    for line_no, order in enumerate(orders, 1):
+        chunk.append((line_no, order))
+        if len(chunk) >= batch_size:
+            yield from _process_chunk(store, chunk)
+            chunk = []
+    if chunk:
+        yield from _process_chunk(store, chunk)
+
+
+def run_batch(input_path, output_path, batch_size=BATCH_SIZE, backend_name=None):
+    store = open_store(backend_name)
+    ok = failed = 0
+    try:
+        with open(output_path, "w", encoding="utf-8") as out:
+            for result in process_orders(store, read_orders(input_path), batch_size):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                if result['status'] == 'ok':
+                    ok += 1
+                else:
+                    failed += 1
+    finally:
+        store.close(compact=False)
+    print(f"Batch selesai: {ok} berhasil, {failed} gagal. Hasil: {output_path}")
+    return ok, failed
 
 # Top up saldo
-def topup_balance(current_user, users):
+def add_balance(store, user, amount):
+    with store.locked():
+        user['balance'] = user.get('balance',0) + amount
+        store.commit(users=[user])
+    return user['balance']
+
+
+def topup_balance(current_user, store):
     print("=== Top Up Saldo ===")
     try:
         amt = int(input("Masukkan nominal top up: ").strip())
@@ -413,29 +3076,153 @@ def topup_balance(current_user, users):
     except ValueError:
         print("Masukkan angka yang valid")
         return
-    current_user['balance'] = current_user.get('balance',0) + amt
-    save_json(USERS_FILE, users)
+    add_balance(store, current_user, amt)
     print(f"Top up berhasil. Saldo sekarang Rp{current_user['balance']}")
 
 
-def view_transactions(current_user, transactions):
-    my = [t for t in transactions if t.get('user_id') == current_user.get('id')]
-    if not my:
-        print("Belum ada transaksi")
+# Tabel berhalaman
+# Baris diambil lazy lewat generator dan hanya satu halaman yang dibuat menjadi
+# PrettyTable, sehingga memori tidak bergantung pada panjang riwayat.
+PAGE_SIZE = 20
+# riwayat user dibaca dari backend per potongan ini (lihat Store.user_history)
+HISTORY_CHUNK = 256
+TRANSACTION_SORTS = {'1': ('created_at', True), '2': ('created_at', False),
+                     '3': ('total', True), '4': ('total', False)}
+
+def query_transactions(store, user_id=None, product_id=None, method=None,
+                       date_from=None, date_to=None, newest_first=True, start=None):
+    # generator (posisi, transaksi). Posisi dipakai sebagai cursor halaman
+    # berikutnya sehingga halaman lanjutan tidak menyaring ulang dari awal.
+    # date_from/date_to berupa 'YYYY-MM-DD' (inklusif). Riwayat satu user (terbaru
+    # dulu) dibaca langsung dari backend, tanpa memuat semua transaksi.
+    filters = {'product_id': product_id, 'method': method, 'date_from': date_from,
+               'date_to': date_to + '\uffff' if date_to else None}
+    if user_id and newest_first and store.backend is not None:
+        yield from store.user_history(user_id, start, filters)
         return
-    table = PrettyTable()
-    table.field_names = ['ID','Produk','Qty','Total','Metode','UID','Tgl']
-    for t in my:
-        table.add_row([t.get('id'), t.get('product_id'), t.get('qty'), t.get('total'), t.get('method'), t.get('uid_game'), t.get('created_at')])
-    print(table)
+    source = store.transaction_rows(user_id)
+    if newest_first:
+        last = len(source) - 1
+        positions = range(last if start is None else min(start, last), -1, -1)
+    else:
+        positions = range(0 if start is None else start, len(source))
+    for i in positions:
+        t = source[i]
+        if transaction_matches(t, **filters):
+            yield i, t
+
+
+def transaction_matches(t, product_id=None, method=None, date_from=None, date_to=None):
+    # date_to sudah termasuk seluruh hari (lihat query_transactions)
+    if product_id and t.get('product_id') != product_id:
+        return False
+    if method and (t.get('method') or '').lower() != method.lower():
+        return False
+    created = t.get('created_at') or ''
+    if date_from and created < date_from:
+        return False
+    if date_to and created > date_to:
+        return False
+    return True
+
+
+def query_users(store, role=None, start=None):
+    for i in range(start or 0, len(store.users)):
+        u = store.users[i]
+        if not role or u.get('role') == role:
+            yield i, u
+
+
+def fetch_page(rows, page_size=PAGE_SIZE):
+    # satu halaman dari generator (posisi, record) + cursor halaman berikutnya (None jika habis)
+    page = list(islice(rows, page_size + 1))
+    next_cursor = page[page_size][0] if len(page) > page_size else None
+    return [record for _, record in page[:page_size]], next_cursor
+
+
+def fetch_sorted_page(rows, key, descending, offset=0, page_size=PAGE_SIZE):
+    # urutan selain waktu: hanya offset + page_size record teratas yang disimpan (heap)
+    pick = heapq.nlargest if descending else heapq.nsmallest
+    top = pick(offset + page_size + 1, (record for _, record in rows),
+               key=lambda r: r.get(key) or 0)
+    next_cursor = offset + page_size if len(top) > offset + page_size else None
+    return top[offset:offset + page_size], next_cursor
+
+
+def page_through(fetch, field_names, to_row, empty_message="Data kosong"):
+    # fetch(cursor) -> (records, cursor berikutnya); cursor awal None
+    cursors = [None]
+    while True:
+        records, next_cursor = fetch(cursors[-1])
+        if not records and len(cursors) == 1:
+            print(empty_message)
+            return
+        table = make_table(field_names)
+        for r in records:
+            table.add_row(to_row(r))
+        print(table)
+        print(f"Halaman {len(cursors)}")
+        options = []
+        if next_cursor is not None:
+            options.append('[n] berikutnya')
+        if len(cursors) > 1:
+            options.append('[p] sebelumnya')
+        options.append('[q] kembali')
+        c = input(', '.join(options) + ': ').strip().lower()
+        if c == 'n' and next_cursor is not None:
+            cursors.append(next_cursor)
+        elif c == 'p' and len(cursors) > 1:
+            cursors.pop()
+        elif c in ('q', ''):
+            return
+
+
+def transaction_pager(store, filters, sort='1'):
+    key, descending = TRANSACTION_SORTS.get(sort, TRANSACTION_SORTS['1'])
+    if key == 'created_at':
+        # transaksi tersimpan urut waktu: cukup jalan maju/mundur dari cursor
+        return lambda cursor: fetch_page(
+            query_transactions(store, newest_first=descending, start=cursor, **filters))
+    return lambda cursor: fetch_sorted_page(
+        query_transactions(store, **filters), key, descending, cursor or 0)
+
+
+def ask_transaction_filters(store):
+    print('Filter transaksi (kosongkan untuk semua)')
+    filters = {}
+    username = input('Username: ').strip()
+    if username:
+        user = store.user_by_username(username)
+        if not user:
+            print('User tidak ditemukan')
+            return None
+        filters['user_id'] = user.get('id')
+    filters['product_id'] = input('ID produk: ').strip() or None
+    filters['method'] = input('Metode: ').strip() or None
+    filters['date_from'] = input('Dari tanggal (YYYY-MM-DD): ').strip() or None
+    filters['date_to'] = input('Sampai tanggal (YYYY-MM-DD): ').strip() or None
+    return filters
+
+
+def ask_transaction_sort():
+    print('Urutkan: 1. Terbaru  2. Terlama  3. Total terbesar  4. Total terkecil')
+    return input('Pilih (1): ').strip() or '1'
+
+
+def view_transactions(current_user, store):
+    fetch = transaction_pager(store, {'user_id': current_user.get('id')})
+    page_through(fetch, ['ID','Produk','Qty','Total','Metode','UID','Tgl'],
+                 lambda t: [t.get('id'), t.get('product_id'), t.get('qty'), t.get('total'), t.get('method'), t.get('uid_game'), t.get('created_at')],
+                 "Belum ada transaksi")
 
 # Tampilkan Menu
 #Menu user 
-def user_menu(current_user, users, products, transactions):
+def user_menu(current_user, store):
     try:
         while True:
+            show_settled_payments(store)
             print('===== MENU USER =====')
-            show_user_profile(current_user)
+            show_user_profile(current_user, store)
             #Tampilan menu jika akun adalah jenis VIP
             if current_user.get('role') == 'vip':
                 print('--- Menu VIP ---')
@@ -455,15 +3242,15 @@ def user_menu(current_user, users, products, transactions):
                 print('6. Logout')
             choice = input('Pilih: ').strip()
             if choice == '1':
-                show_products_table(products, role=current_user.get('role'))
+                show_products_table(store, current_user.get('role'), ask_product_type(store))
             elif choice == '2':
-                topup_balance(current_user, users)
+                topup_balance(current_user, store)
             elif choice == '3':
-                buy_lunite_flow(current_user, users, products, transactions)
+                buy_lunite_flow(current_user, store)
             elif choice == '4':
-                view_transactions(current_user, transactions)
+                view_transactions(current_user, store)
             elif choice == '5':
-                buy_lunite_flow(current_user, users, products, transactions)
+                buy_lunite_flow(current_user, store)
             elif choice == '6':
                 print('Logout...')
                 break
@@ -473,8 +3260,207 @@ def user_menu(current_user, users, products, transactions):
         print('Kembali ke menu utama')
         return
 
+# Metrik & profiling (opt-in). LUNITE_METRICS=1 mengukur fungsi di METRIC_FUNCTIONS
+# dan METRIC_STORE_METHODS; LUNITE_PROFILE=<file> merekam cProfile satu sesi.
+# Saat nonaktif fungsi aslinya tidak dibungkus sama sekali, jadi tanpa overhead.
+METRICS_ENABLED = os.environ.get("LUNITE_METRICS", "") not in ("", "0")
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.prom")
+PROFILE_FILE = os.environ.get("LUNITE_PROFILE") or None
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+METRIC_FUNCTIONS = ['load_json', 'load_json_latest', 'load_json_dict', 'save_json', 'save_json_dict',
+                    'append_journal_many', 'authenticate', 'process_order', 'place_cart',
+                    'add_balance']
+METRIC_STORE_METHODS = ['user_by_username', 'user_by_id', 'product', 'voucher', 'usable_voucher',
+                        'vouchers_of', 'transactions_of']
+# fungsi tulis: byte yang ditulis dicatat per file (True = append ke journal)
+METRIC_WRITERS = {'save_json': False, 'save_json_dict': False, 'append_journal_many': True}
+
+METRICS = None
+PROFILER = None
+
+
+class Metrics:
+    def __init__(self):
+        # nama -> [jumlah panggilan, total detik, hitungan per bucket latensi]
+        self.calls = {}
+        self.bytes_written = {}
+        self.originals = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, secs):
+        with self.lock:
+            stat = self.calls.get(name)
+            if stat is None:
+                stat = self.calls[name] = [0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)]
+            stat[0] += 1
+            stat[1] += secs
+            stat[2][bisect_left(LATENCY_BUCKETS, secs)] += 1
+
+    def add_bytes(self, path, n):
+        with self.lock:
+            self.bytes_written[path] = self.bytes_written.get(path, 0) + n
+
+    def _timed(self, name, fn):
+        observe = self.observe
+        clock = time.perf_counter
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, clock() - start)
+        return timed
+
+    def _timed_writer(self, name, fn, append):
+        observe = self.observe
+        add_bytes = self.add_bytes
+        clock = time.perf_counter
+
+        @wraps(fn)
+        def timed(path, *args, **kwargs):
+            target = journal_path(path) if append else path
+            before = os.path.getsize(target) if append and os.path.exists(target) else 0
+            start = clock()
+            try:
+                return fn(path, *args, **kwargs)
+            finally:
+                observe(name, clock() - start)
+                if os.path.exists(target):
+                    add_bytes(target, os.path.getsize(target) - before)
+        return timed
+
+    def install(self):
+        module = globals()
+        for name in METRIC_FUNCTIONS:
+            fn = self.originals[name] = module[name]
+            if name in METRIC_WRITERS:
+                module[name] = self._timed_writer(name, fn, METRIC_WRITERS[name])
+            else:
+                module[name] = self._timed(name, fn)
+        for name in METRIC_STORE_METHODS:
+            fn = self.originals['Store.' + name] = Store.__dict__[name]
+            setattr(Store, name, self._timed('Store.' + name, fn))
+
+    def uninstall(self):
+        module = globals()
+        for name, fn in self.originals.items():
+            if name.startswith('Store.'):
+                setattr(Store, name[6:], fn)
+            else:
+                module[name] = fn
+        self.originals = {}
+
+    def percentile(self, name, pct):
+        # batas atas bucket tempat persentil jatuh (None = di atas bucket terbesar)
+        count, _, buckets = self.calls[name]
+        need = count * pct / 100
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, buckets):
+            seen += n
+            if seen >= need:
+                return bound
+        return None
+
+    def prometheus_text(self):
+        lines = ["# HELP lunite_call_seconds Latensi fungsi yang diukur (_count = jumlah panggilan).",
+                 "# TYPE lunite_call_seconds histogram"]
+        with self.lock:
+            calls = {name: (stat[0], stat[1], list(stat[2])) for name, stat in self.calls.items()}
+            written = dict(self.bytes_written)
+        for name in sorted(calls):
+            count, total, buckets = calls[name]
+            seen = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                seen += n
+                lines.append(f'lunite_call_seconds_bucket{{fn="{name}",le="{bound}"}} {seen}')
+            lines.append(f'lunite_call_seconds_bucket{{fn="{name}",le="+Inf"}} {count}')
+            lines.append(f'lunite_call_seconds_sum{{fn="{name}"}} {total:.6f}')
+            lines.append(f'lunite_call_seconds_count{{fn="{name}"}} {count}')
+        lines.append("# HELP lunite_bytes_written_total Byte yang ditulis per file.")
+        lines.append("# TYPE lunite_bytes_written_total counter")
+        for path in sorted(written):
+            label = path.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'lunite_bytes_written_total{{file="{label}"}} {written[path]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=METRICS_FILE):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+
+def enable_metrics():
+    global METRICS
+    if METRICS is None:
+        METRICS = Metrics()
+        METRICS.install()
+    return METRICS
+
+
+def disable_metrics():
+    # kembalikan fungsi asli; metrik yang sudah terkumpul dikembalikan ke pemanggil
+    global METRICS
+    metrics, METRICS = METRICS, None
+    if metrics is not None:
+        metrics.uninstall()
+    return metrics
+
+
+def start_profile():
+    global PROFILER
+    import cProfile
+    if PROFILER is None:
+        PROFILER = cProfile.Profile()
+        PROFILER.enable()
+
+
+def stop_profile(path=None, top=15):
+    # simpan hasil cProfile (bisa dibuka dengan pstats/snakeviz) dan cetak fungsi terberat
+    global PROFILER
+    import pstats
+    profiler, PROFILER = PROFILER, None
+    if profiler is None:
+        return None
+    profiler.disable()
+    path = path or PROFILE_FILE or os.path.join(DATA_DIR, "lunite.prof")
+    profiler.dump_stats(path)
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+    return path
+
+
+def show_metrics():
+    if METRICS is None:
+        print('Metrik belum aktif (jalankan dengan LUNITE_METRICS=1).')
+        if input('Aktifkan untuk sesi ini? (y/n): ').strip().lower() == 'y':
+            enable_metrics()
+            print('Metrik aktif.')
+    else:
+        table = make_table(['Fungsi', 'Panggilan', 'Total (ms)', 'Rata-rata (ms)', 'p95 <= (ms)'])
+        for name in sorted(METRICS.calls):
+            count, total = METRICS.calls[name][:2]
+            p95 = METRICS.percentile(name, 95)
+            table.add_row([name, count, round(total * 1000, 2), round(total * 1000 / count, 3),
+                           p95 * 1000 if p95 is not None else '-'])
+        print(table)
+        table = make_table(['File', 'Byte ditulis'])
+        for path, n in sorted(METRICS.bytes_written.items()):
+            table.add_row([path, n])
+        print(table)
+        print('Metrik disimpan ke', METRICS.dump())
+    if PROFILER is None:
+        if input('Mulai rekam cProfile untuk sesi ini? (y/n): ').strip().lower() == 'y':
+            start_profile()
+            print('cProfile aktif sampai dihentikan dari menu ini atau program keluar.')
+    elif input('Hentikan rekam cProfile? (y/n): ').strip().lower() == 'y':
+        print('Profil disimpan ke', stop_profile())
+
+
 #Menu Admin
-def admin_menu(users, products, transactions):
+def admin_menu(store):
     try:
         while True:
             print('===== MENU ADMIN =====')
@@ -484,10 +3470,13 @@ def admin_menu(users, products, transactions):
             print('4. Hapus Produk')
             print('5. Lihat Pengguna')
             print('6. Lihat Transaksi')
-            print('7. Logout')
+            print('7. Laporan Penjualan')
+            print('8. Kampanye Voucher')
+            print('9. Metrik & Profiling')
+            print('10. Logout')
             c = input('Pilih: ').strip()
             if c == '1':
-                show_products_table(products)
+                show_products_table(store, 'admin', ask_product_type(store))
             elif c == '2':
                 name = input('Nama produk: ').strip()
                 try:
@@ -496,53 +3485,87 @@ def admin_menu(users, products, transactions):
                 except ValueError:
                     print('Harga/stok harus angka')
                     continue
-                existing = [p.get('id') for p in products if p.get('id')]
-                pid = next_id('P', existing)
-                products.append({'id': pid, 'name': name, 'price': price, 'stock': stock, 'type':'topup'})
-                save_json(PRODUCTS_FILE, products)
+                with store.locked():
+                    pid = store.alloc_id('P')
+                    new_p = Product(id=pid, name=name, price=price, stock=stock, type='topup')
+                    store.add_product(new_p)
+                    store.commit(products=[new_p])
                 print('Produk ditambahkan')
             elif c == '3':
-                show_products_table(products)
+                show_products_table(store, 'admin', ask_product_type(store))
                 pid = input('ID produk: ').strip()
-                p = find_product(products, pid)
+                p = store.product(pid)
                 if not p:
                     print('Tidak ditemukan')
                     continue
                 name = input(f"Nama ({p['name']}): ").strip()
                 price_s = input(f"Harga ({p['price']}): ").strip()
                 stock_s = input(f"Stok ({p['stock']}): ").strip()
-                if name: p['name'] = name
-                if price_s:
-                    try: p['price'] = int(price_s)
-                    except: pass
-                if stock_s:
-                    try: p['stock'] = int(stock_s)
-                    except: pass
-                save_json(PRODUCTS_FILE, products)
+                with store.locked():
+                    p = store.product(pid)
+                    if not p:
+                        print('Tidak ditemukan')
+                        continue
+                    if name: p['name'] = name
+                    if price_s:
+                        try: p['price'] = int(price_s)
+                        except: pass
+                    if stock_s:
+                        try: p['stock'] = int(stock_s)
+                        except: pass
+                    store.commit(products=[p])
                 print('Produk diperbarui')
             elif c == '4':
-                show_products_table(products)
+                show_products_table(store, 'admin', ask_product_type(store))
                 pid = input('ID produk: ').strip()
-                p = find_product(products, pid)
+                p = store.product(pid)
                 if not p:
                     print('Tidak ditemukan')
                     continue
-                products.remove(p)
-                save_json(PRODUCTS_FILE, products)
+                with store.locked():
+                    p = store.product(pid)
+                    if not p:
+                        print('Tidak ditemukan')
+                        continue
+                    store.remove_product(p)
+                    store.commit(removed_products=[p])
                 print('Produk dihapus')
             elif c == '5':
-                table = PrettyTable()
-                table.field_names = ['ID','Username','Role','Saldo','Failed','Locked','VIP Expiry']
-                for u in users:
-                    table.add_row([u.get('id'), u.get('username'), u.get('role'), u.get('balance'), u.get('failed_attempts'), u.get('locked_until'), u.get('vip_expiry')])
-                print(table)
+                # pastikan VIP yang sudah kadaluarsa tidak tampil sebagai VIP
+                sweep_expired_vips(store)
+                role = input('Filter role (kosongkan untuk semua): ').strip().lower() or None
+                page_through(
+                    lambda cursor: fetch_page(query_users(store, role, cursor)),
+                    ['ID','Username','Role','Saldo','Failed','Locked','VIP Expiry'],
+                    lambda u: [u.get('id'), u.get('username'), u.get('role'), u.get('balance'), *store.limiter.status(u.get('username')), u.get('vip_expiry')],
+                    "Tidak ada pengguna")
             elif c == '6':
-                table = PrettyTable()
-                table.field_names = ['ID','User','Produk','Qty','Total','Metode','UID','Tgl']
-                for t in transactions:
-                    table.add_row([t.get('id'), t.get('user_id'), t.get('product_id'), t.get('qty'), t.get('total'), t.get('method'), t.get('uid_game'), t.get('created_at')])
-                print(table)
+                filters = ask_transaction_filters(store)
+                if filters is None:
+                    continue
+                fetch = transaction_pager(store, filters, ask_transaction_sort())
+                page_through(fetch, ['ID','User','Produk','Qty','Total','Metode','UID','Tgl'],
+                             lambda t: [t.get('id'), t.get('user_id'), t.get('product_id'), t.get('qty'), t.get('total'), t.get('method'), t.get('uid_game'), t.get('created_at')],
+                             "Tidak ada transaksi")
             elif c == '7':
+                show_sales_report(store)
+            elif c == '8':
+                role = input('Untuk role (vip/member, kosongkan untuk semua): ').strip().lower() or None
+                try:
+                    percent = int(input('Persen voucher: ').strip())
+                    days_s = input('Berlaku berapa hari (kosongkan = tanpa batas): ').strip()
+                    days = int(days_s) if days_s else None
+                except ValueError:
+                    print('Persen/hari harus angka')
+                    continue
+                if not 0 < percent <= 100:
+                    print('Persen harus 1-100')
+                    continue
+                count = issue_campaign(store, percent, role, days)
+                print(f'{count} voucher {percent}% diterbitkan')
+            elif c == '9':
+                show_metrics()
+            elif c == '10':
                 break
             else:
                 print('Pilihan tidak valid')
@@ -554,45 +3577,91 @@ def admin_menu(users, products, transactions):
 #Kode Utama
 def main():
     ensure_data_dir()
-    users = load_json(USERS_FILE)
-    products = load_json(PRODUCTS_FILE)
-    transactions = load_json(TRANSACTIONS_FILE)
-
-    # pastikan default fields
-    for u in users:
-        u.setdefault('failed_attempts',0)
-        u.setdefault('locked_until',None)
-        u.setdefault('vouchers',[])
-        u.setdefault('balance',0)
-        u.setdefault('vip_expiry',None)
-        u.setdefault('pending_subscription_days',0)
-
-    save_json(USERS_FILE, users)
+    if METRICS_ENABLED:
+        enable_metrics()
+    if PROFILE_FILE:
+        start_profile()
+    # data lama dimigrasi sekali oleh open_store (lihat migrate_schema)
+    store = open_store()
+    sweep_expired_vips(store)
 
     try:
         while True:
+            show_settled_payments(store)
             print('=== Toko Top Up Lunite Wuthering Waves ===')
             print('1. Login')
             print('2. Registrasi')
             print('3. Keluar')
             choice = input('Pilih: ').strip()
             if choice == '1':
-                user = login(users)
+                user = login(store)
                 if user:
                     if user.get('role') == 'admin':
-                        admin_menu(users, products, transactions)
+                        admin_menu(store)
                     else:
-                        user_menu(user, users, products, transactions)
+                        user_menu(user, store)
             elif choice == '2':
-                register(users)
-                users = load_json(USERS_FILE)
+                register(store)
             elif choice == '3':
+                show_settled_payments(store)
+                if store.payments.orders:
+                    print(f"{len(store.payments.orders)} pembayaran gateway belum dikonfirmasi dan dibatalkan.")
+                store.close()
                 print('Sampai jumpa!')
                 break
             else:
                 print('Pilihan tidak valid')
     except KeyboardInterrupt:
         print('Keluar...')
+    finally:
+        if METRICS is not None:
+            METRICS.dump()
+        if PROFILER is not None:
+            stop_profile()
 
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'compact':
+        # python Lunite.py compact -> gabungkan journal transaksi & voucher ke snapshot
+        ensure_data_dir()
+        backend = JsonBackend()
+        backend.lock()
+        try:
+            compacted = compact_journal(TRANSACTIONS_FILE, force=True)
+            archived = compact_vouchers(force=True)
+        finally:
+            backend.unlock()
+        if compacted:
+            print('Journal transaksi digabung ke', TRANSACTIONS_FILE)
+        else:
+            print('Tidak ada journal untuk digabung.')
+        if archived:
+            print(f'{archived} voucher terpakai/kadaluarsa dipindah ke {VOUCHER_ARCHIVE_FILE}')
+    elif len(sys.argv) > 1 and sys.argv[1] == 'migrate-sqlite':
+        # python Lunite.py migrate-sqlite -> salin data/*.json ke data/lunite.db
+        ensure_data_dir()
+        n_users, n_products, n_trx = migrate_json_to_sqlite()
+        print(f"Migrasi selesai: {n_users} user, {n_products} produk, {n_trx} transaksi -> {SQLITE_FILE}")
+        print("Jalankan dengan LUNITE_STORAGE=sqlite untuk memakai backend SQLite.")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'rebuild-laporan':
+        # python Lunite.py rebuild-laporan -> hitung ulang data/laporan.json dari semua transaksi
+        ensure_data_dir()
+        rollup = rebuild_rollup()
+        print(f"Laporan dibangun ulang dari {rollup['count']} transaksi.")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'arsip':
+        # python Lunite.py arsip [YYYY-MM-DD] -> pindahkan transaksi sebelum tanggal itu ke data/arsip
+        ensure_data_dir()
+        if len(sys.argv) > 2:
+            cutoff = sys.argv[2]
+        else:
+            cutoff = (datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)).strftime("%Y-%m-%d")
+        store = open_store()
+        moved = archive_transactions(store, cutoff)
+        store.close(compact=False)
+        print(f"{moved} transaksi sebelum {cutoff} dipindah ke {ARCHIVE_DIR}")
+    elif len(sys.argv) > 2 and sys.argv[1] == 'batch':
+        # python Lunite.py batch order.csv [hasil.jsonl]
+        ensure_data_dir()
+        output = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(sys.argv[2])[0] + "_hasil.jsonl"
+        run_batch(sys.argv[2], output)
+    else:
+        main()
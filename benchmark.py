@@ -0,0 +1,2088 @@
+# Benchmark sederhana untuk fitur penyimpanan Lunite.py
+# Jalankan: python benchmark.py journal --rows 1000000
+# Suite skenario: python benchmark.py generate --out /tmp/lunite-1m --users 1000000 --transactions 1000000
+#                 python benchmark.py suite --data /tmp/lunite-1m --save baseline.json
+#                 python benchmark.py suite --data /tmp/lunite-1m --compare baseline.json
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+
+import Lunite
+import shard
+
+
+def make_transaction(i):
+    return Lunite.Transaction(
+        id=f"T-{i:04d}",
+        user_id=f"U-{i % 1000 + 1:04d}",
+        product_id=f"P-{i % 6 + 1:04d}",
+        qty=1,
+        unit_price=68000,
+        subtotal=68000,
+        voucher_applied=None,
+        total=68000,
+        method='Saldo',
+        uid_game='80012345',
+        created_at='2025-11-10 05:45:23'
+    )
+
+
+def make_user_dict(i):
+    return {
+        'id': f"U-{i:04d}",
+        'username': f"user{i}",
+        'password': 'rahasia123',
+        'role': 'member',
+        'balance': 0,
+        'vip_expiry': None,
+        'pending_subscription_days': 0
+    }
+
+
+def make_user(i):
+    return Lunite.User.from_dict(make_user_dict(i))
+
+
+def make_users(count, balance=0):
+    users = [make_user(i) for i in range(1, count + 1)]
+    for u in users:
+        u.balance = balance
+    return users
+
+
+@contextmanager
+def temp_data_dir(prefix="lunite-bench-"):
+    # folder kerja sementara berisi data/ baru; cwd dikembalikan dan folder dihapus di akhir
+    tmp = tempfile.mkdtemp(prefix=prefix)
+    old_cwd = os.getcwd()
+    try:
+        os.chdir(tmp)
+        Lunite.ensure_data_dir()
+        yield tmp
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def seed_store(backend_name, users, products):
+    # user & produk awal ditulis lewat Store (bukan save_json) agar berlaku untuk
+    # kedua backend; hasilnya store yang masih terbuka
+    store = Lunite.open_store(backend_name)
+    with store.locked():
+        for u in users:
+            store.add_user(u)
+        for p in products:
+            store.add_product(p)
+        store.commit(users=users, products=products)
+    return store
+
+
+def bench_index(users_count, lookups):
+    # bandingkan scan linear atas list user dengan index Store
+    users = [make_user(i) for i in range(1, users_count + 1)]
+    transactions = [make_transaction(i) for i in range(1, users_count + 1)]
+    names = [f"user{users_count - n}" for n in range(lookups)]
+
+    start = time.perf_counter()
+    for name in names:
+        next((u for u in users if u.get("username") == name), None)
+    scan_ms = (time.perf_counter() - start) * 1000 / lookups
+
+    start = time.perf_counter()
+    store = Lunite.Store(users, [], transactions)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for name in names:
+        store.user_by_username(name)
+    index_ms = (time.perf_counter() - start) * 1000 / lookups
+
+    start = time.perf_counter()
+    for n in range(lookups):
+        store.transactions_of(f"U-{n % 1000 + 1:04d}")
+    history_ms = (time.perf_counter() - start) * 1000 / lookups
+
+    print(f"User: {users_count}, lookup diukur: {lookups}")
+    print(f"scan linear       : {scan_ms:10.4f} ms / lookup")
+    print(f"bangun index      : {build_ms:10.3f} ms (sekali saat start)")
+    print(f"index username    : {index_ms:10.4f} ms / lookup")
+    print(f"riwayat per user  : {history_ms:10.4f} ms / lookup")
+
+
+def bench_ids(existing, allocations, probe_limit):
+    # next_id (probe ke daftar ID) vs counter monoton Store.alloc_id
+    transactions = [make_transaction(i) for i in range(1, existing + 1)]
+
+    # probe ke list bersifat O(n^2), jadi diukur pada ukuran yang dibatasi
+    limited = transactions[:probe_limit]
+    start = time.perf_counter()
+    existing_tids = [t.get('id') for t in limited]
+    Lunite.next_id('T', existing_tids)
+    probe_list_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(allocations):
+        existing_tids = {t.get('id') for t in transactions}
+        Lunite.next_id('T', existing_tids)
+    probe_set_ms = (time.perf_counter() - start) * 1000 / allocations
+
+    store = Lunite.Store([], [], transactions)
+    start = time.perf_counter()
+    store.alloc_id('T')
+    rebuild_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(allocations):
+        store.alloc_id('T')
+    alloc_ms = (time.perf_counter() - start) * 1000 / allocations
+
+    print(f"ID yang sudah ada: {existing}, alokasi diukur: {allocations}")
+    print(f"next_id list      : {probe_list_ms:10.4f} ms / ID (pada {len(limited)} ID)")
+    print(f"next_id set       : {probe_set_ms:10.4f} ms / ID")
+    print(f"rebuild counter   : {rebuild_ms:10.4f} ms (sekali, jika counter belum ada)")
+    print(f"alloc_id          : {alloc_ms:10.4f} ms / ID")
+
+
+def bench_sqlite(users_count, purchases):
+    # pembelian berurutan lewat backend SQLite: satu transaksi atomik per pembelian.
+    # FULL (bawaan) meng-fsync setiap commit; NORMAL (LUNITE_SQLITE_SYNC=NORMAL)
+    # lebih cepat, tetapi commit terakhir bisa hilang jika OS/listrik mati
+    print(f"User: {users_count}, pembelian: {purchases}")
+    for synchronous in ("FULL", "NORMAL"):
+        rate = _sqlite_purchases(users_count, purchases, synchronous)
+        print(f"SQLite {synchronous:6s}     : {rate:10.1f} pembelian / detik")
+
+
+def _sqlite_purchases(users_count, purchases, synchronous):
+    with temp_data_dir():
+        backend = Lunite.SqliteBackend(Lunite.SQLITE_FILE, synchronous)
+        users = make_users(users_count, 10 ** 9)
+        products = [Lunite.Product(id='P-0001', name='60 Lunite', price=14000,
+                                   stock=purchases, type='topup')]
+        with backend.conn:
+            backend._write(users, products)
+        store = Lunite.Store(users, products, [], {}, backend)
+
+        p = store.product('P-0001')
+        start = time.perf_counter()
+        for n in range(purchases):
+            user = users[n % users_count]
+            trx = make_transaction(0)
+            trx['id'] = store.alloc_id('T')
+            trx['user_id'] = user['id']
+            user['balance'] -= trx['total']
+            p['stock'] -= 1
+            store.add_transaction(trx)
+            store.commit(users=[user], products=[p], transactions=[trx])
+        elapsed = time.perf_counter() - start
+        store.close()
+    return purchases / elapsed
+
+
+def _stress_worker(args):
+    # satu proses pembeli: beli produk yang sama sampai stok habis atau kuota tercapai
+    workdir, backend_name, username, buys = args
+    os.chdir(workdir)
+    store = Lunite.open_store(backend_name)
+    # riwayat dimuat di awal: tulisan proses lain masuk lewat refresh inkremental
+    store.transactions
+    user = store.user_by_username(username)
+    spent = 0
+    ok = 0
+    for _ in range(buys):
+        trx, messages = Lunite.place_order(store, user, 'P-0001', '12345678', 'Saldo')
+        if not trx:
+            if messages[0] == "Stok habis.":
+                break
+            continue
+        ok += 1
+        spent += trx['total']
+    with store.locked():
+        synced = sorted(t.id for t in store.transactions) == \
+            sorted(t.id for t in store.backend.load_transactions())
+    store.close()
+    return username, ok, spent, synced
+
+
+def stress(workers, buys, backend_name):
+    # N proses membeli produk yang sama; stok, saldo dan transaksi harus tetap konsisten
+    balance = 10 ** 9
+    stock = workers * buys // 2
+    with temp_data_dir("lunite-stress-") as tmp:
+        users = make_users(workers, balance)
+        products = [Lunite.Product(id='P-0001', name='60 Lunite', price=14000,
+                                   stock=stock, type='topup')]
+        seed_store(backend_name, users, products).close()
+
+        start = time.perf_counter()
+        jobs = [(tmp, backend_name, u['username'], buys) for u in users]
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            results = pool.map(_stress_worker, jobs)
+        elapsed = time.perf_counter() - start
+
+        store = Lunite.open_store(backend_name)
+        sold = sum(ok for _, ok, _, _ in results)
+        errors = []
+        final_stock = store.product('P-0001')['stock']
+        if final_stock != stock - sold or final_stock < 0:
+            errors.append(f"stok {final_stock}, seharusnya {stock - sold}")
+        if len(store.transactions) != sold:
+            errors.append(f"{len(store.transactions)} transaksi, seharusnya {sold}")
+        if len({t['id'] for t in store.transactions}) != len(store.transactions):
+            errors.append("ID transaksi duplikat")
+        if store.rollup['count'] != sold or store.rollup['units'] != sold:
+            errors.append(f"laporan mencatat {store.rollup['count']} transaksi, seharusnya {sold}")
+        if not all(synced for _, _, _, synced in results):
+            errors.append("riwayat di memori proses pembeli berbeda dari penyimpanan")
+        for username, ok, spent, _ in results:
+            user = store.user_by_username(username)
+            if user['balance'] != balance - spent:
+                errors.append(f"saldo {username} {user['balance']}, seharusnya {balance - spent}")
+            if len(store.transactions_of(user['id'])) != ok:
+                errors.append(f"jumlah transaksi {username} tidak cocok")
+        store.close()
+
+    print(f"Backend {backend_name}: {workers} proses x {buys} pembelian, stok awal {stock}")
+    print(f"Terjual {sold} unit dalam {elapsed:.2f} detik")
+    if errors:
+        for e in errors:
+            print("TIDAK KONSISTEN:", e)
+        return False
+    print("Stok, saldo, transaksi dan laporan konsisten.")
+    return True
+
+
+def bench_batch(orders_count, users_count, batch_size, backend_name):
+    # order massal dari file JSONL lewat process_orders (satu persist per batch)
+    with temp_data_dir("lunite-batch-"):
+        users = make_users(users_count, 10 ** 12)
+        products = [
+            Lunite.Product(id='P-0001', name='60 Lunite', price=14000, stock=orders_count, type='topup'),
+            Lunite.Product(id='P-0003', name='980 Lunite', price=203000, stock=orders_count, type='topup'),
+        ]
+        seed_store(backend_name, users, products).close()
+
+        with open("order.jsonl", "w", encoding="utf-8") as f:
+            for n in range(orders_count):
+                f.write(Lunite.json.dumps({
+                    'username': f"user{n % users_count + 1}",
+                    'product_id': 'P-0001' if n % 4 else 'P-0003',
+                    'uid_game': '80012345',
+                    'method': 'Saldo' if n % 3 else 'Gopay',
+                    'voucher': ''
+                }) + "\n")
+
+        start = time.perf_counter()
+        ok, failed = Lunite.run_batch("order.jsonl", "hasil.jsonl", batch_size, backend_name)
+        elapsed = time.perf_counter() - start
+
+    print(f"Backend {backend_name}: {orders_count} order, {users_count} user, batch {batch_size}")
+    print(f"Waktu             : {elapsed:10.2f} detik ({orders_count / elapsed:.0f} order / detik)")
+
+
+def check_quote_batch(samples, seed):
+    # cek acak: quote_batch harus sama persis dengan quote() skalar
+    rng = random.Random(seed)
+    roles = [rng.choice(['member', 'vip']) for _ in range(samples)]
+    prices = [rng.choice([rng.randint(1, 10 ** 7), rng.randint(1, 10 ** 12)]) for _ in range(samples)]
+    pcts = [rng.choice([0, 0, 2, 4, 6, rng.randint(0, 100)]) for _ in range(samples)]
+    unit, subtotal, discount, total = Lunite.quote_batch(roles, prices, pcts)
+    for i in range(samples):
+        voucher = Lunite.Voucher(id='V-0001', percent=pcts[i]) if pcts[i] else None
+        q = Lunite.quote(Lunite.User(role=roles[i]), Lunite.Product(id='P-0001', price=prices[i]), voucher)
+        got = (int(unit[i]), int(subtotal[i]), int(discount[i]), int(total[i]))
+        want = (q['unit_price'], q['subtotal'], q['discount'], q['total'])
+        if got != want:
+            print(f"BEDA pada role={roles[i]} harga={prices[i]} voucher={pcts[i]}%: {got} != {want}")
+            return False
+    print(f"quote_batch == quote untuk {samples} sampel acak (seed {seed})")
+    return True
+
+
+def bench_quote(rows):
+    roles = ['vip' if i % 3 == 0 else 'member' for i in range(rows)]
+    prices = [14000 + (i % 100) * 1000 for i in range(rows)]
+    pcts = [(i % 5) * 2 for i in range(rows)]
+
+    users = {r: Lunite.User(role=r) for r in ('member', 'vip')}
+    products = {p: Lunite.Product(id='P-0001', price=p) for p in set(prices)}
+    vouchers = {pct: Lunite.Voucher(id='V-0001', percent=pct) for pct in set(pcts)}
+    start = time.perf_counter()
+    for r, p, pct in zip(roles, prices, pcts):
+        Lunite.quote(users[r], products[p], vouchers[pct] if pct else None)
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Lunite.quote_batch(roles, prices, pcts)
+    batch_s = time.perf_counter() - start
+
+    print(f"Baris: {rows}")
+    print(f"quote() skalar    : {rows / scalar_s:12.0f} baris / detik")
+    print(f"quote_batch       : {rows / batch_s:12.0f} baris / detik")
+
+
+async def _http(reader, writer, method, path, body=None, token=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    payload = json.loads(await reader.readexactly(length)) if length else None
+    return status, payload
+
+
+async def _load_client(host, port, username, requests, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, session = await _http(reader, writer, 'POST', '/login',
+                             {'username': username, 'password': 'rahasia123'})
+    token = session['token']
+    for n in range(requests):
+        kind = n % 20
+        if kind < 12:
+            req = ('GET', '/products', None)
+        elif kind < 15:
+            req = ('POST', '/quote', {'product_id': 'P-0001'})
+        elif kind < 17:
+            req = ('POST', '/purchase', {'product_id': 'P-0001', 'uid_game': '80012345', 'method': 'Saldo'})
+        elif kind < 18:
+            req = ('POST', '/topup', {'amount': 14000})
+        else:
+            req = ('GET', '/transactions', None)
+        start = time.perf_counter()
+        status, _ = await _http(reader, writer, *req, token=token)
+        latencies.setdefault(req[1], []).append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def loadtest(clients, requests, port, host, backend_name):
+    # Jika --port tidak diberikan, server.py dijalankan dengan data sintetis di folder sementara
+    async def run():
+        latencies, statuses = {}, {}
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _load_client(host, port, f"user{i}", requests, latencies, statuses)
+            for i in range(1, clients + 1)])
+        return latencies, statuses, time.perf_counter() - start
+
+    proc = None
+    with temp_data_dir("lunite-load-") if port is None else nullcontext() as tmp:
+        try:
+            if port is None:
+                products = [Lunite.Product(id='P-0001', name='60 Lunite', price=14000,
+                                           stock=clients * requests, type='topup')]
+                seed_store(backend_name, make_users(clients, 10 ** 9), products).close()
+                port = 18080
+                proc = subprocess.Popen(
+                    [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+                     "--host", host, "--port", str(port)],
+                    cwd=tmp, stdout=subprocess.PIPE, env=dict(os.environ, LUNITE_STORAGE=backend_name))
+                proc.stdout.readline()  # tunggu server siap
+            latencies, statuses, elapsed = asyncio.run(run())
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait()
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{clients} klien x {requests} request, {elapsed:.2f} detik, {total / elapsed:.0f} request / detik")
+    print(f"Status: {statuses}")
+    every = [x for v in latencies.values() for x in v]
+    print(f"{'semua':14s} p50 {_percentile(every, 50) * 1000:8.2f} ms   p99 {_percentile(every, 99) * 1000:8.2f} ms")
+    for path, values in sorted(latencies.items()):
+        print(f"{path:14s} p50 {_percentile(values, 50) * 1000:8.2f} ms   p99 {_percentile(values, 99) * 1000:8.2f} ms")
+
+
+def _verify_many(args):
+    password, stored, count = args
+    for _ in range(count):
+        Lunite.verify_password(password, stored)
+    return count
+
+
+def bench_hash(costs, logins, workers):
+    # login per detik per core untuk beberapa cost scrypt, plus jalur cache
+    workers = workers or os.cpu_count()
+    print(f"Worker pool: {workers} proses")
+    for cost in costs:
+        stored = Lunite.hash_password('rahasia123', cost)
+        start = time.perf_counter()
+        for _ in range(logins):
+            Lunite.verify_password('rahasia123', stored)
+        per_core = logins / (time.perf_counter() - start)
+
+        jobs = [('rahasia123', stored, logins) for _ in range(workers)]
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            total = sum(pool.map(_verify_many, jobs))
+        pooled = total / (time.perf_counter() - start)
+        print(f"cost {cost:2d} (N=2^{cost}): {per_core:9.1f} login/detik/core, "
+              f"{pooled:9.1f} login/detik dengan pool")
+
+    stored = Lunite.hash_password('rahasia123')
+    Lunite.remember_verified('rahasia123', stored)
+    start = time.perf_counter()
+    for _ in range(logins * 100):
+        Lunite.cached_verify('rahasia123', stored)
+    cached = logins * 100 / (time.perf_counter() - start)
+    print(f"cache verifikasi : {cached:9.1f} login/detik/core")
+
+
+def bench_vip(users_count, expired):
+    # sweep heap vs cek semua user; hanya `expired` user yang sudah lewat masa VIP
+    now = time.time()
+    users = []
+    for i in range(1, users_count + 1):
+        u = make_user(i)
+        u['role'] = 'vip'
+        offset = -3600 if i <= expired else 86400 + i
+        u['vip_expiry'] = Lunite.datetime.fromtimestamp(now + offset).strftime(Lunite.TIME_FORMAT)
+        users.append(u)
+
+    start = time.perf_counter()
+    store = Lunite.Store(users, [], [])
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    changed = store.sweep_vip()
+    sweep_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    store.sweep_vip()
+    idle_ms = (time.perf_counter() - start) * 1000
+
+    for u in users[:expired]:
+        u['role'] = 'vip'
+        u['vip_expiry'] = Lunite.datetime.fromtimestamp(now - 3600).strftime(Lunite.TIME_FORMAT)
+    start = time.perf_counter()
+    scanned = sum(1 for u in users if Lunite.check_and_update_vip_status(u))
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    print(f"User VIP: {users_count}, kadaluarsa: {expired}")
+    print(f"bangun heap       : {build_s * 1000:10.1f} ms (sekali saat load)")
+    print(f"sweep heap        : {sweep_ms:10.3f} ms ({len(changed)} diturunkan)")
+    print(f"sweep tanpa kadaluarsa: {idle_ms:6.3f} ms")
+    print(f"cek semua user    : {scan_ms:10.3f} ms ({scanned} diturunkan)")
+
+
+def bench_laporan(rows):
+    # laporan dari rollup vs agregasi ulang semua transaksi, plus rebuild streaming dari file
+    base = Lunite.datetime(2025, 1, 1)
+    history = []
+    for i in range(1, rows + 1):
+        t = make_transaction(i)
+        t['created_at'] = (base + Lunite.timedelta(seconds=i * 97)).strftime(Lunite.TIME_FORMAT)
+        t['method'] = ('Saldo', 'Gopay', 'Bank')[i % 3]
+        if i % 5 == 0:
+            t['voucher_applied'] = f"V-{i:04d}"
+            t['total'] = 61200
+        history.append(t)
+
+    start = time.perf_counter()
+    rollup = Lunite.new_rollup()
+    for t in history:
+        Lunite.apply_to_rollup(rollup, t)
+    apply_us = (time.perf_counter() - start) * 1e6 / rows
+
+    start = time.perf_counter()
+    report = Lunite.sales_report(rollup)
+    report_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    daily = {}
+    for t in history:
+        day = daily.setdefault(t['created_at'][:10], [0, 0])
+        day[0] += 1
+        day[1] += t['total']
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    with temp_data_dir():
+        Lunite.save_json(Lunite.TRANSACTIONS_FILE, history)
+        start = time.perf_counter()
+        rebuilt = Lunite.build_rollup(Lunite.iter_json_records(Lunite.TRANSACTIONS_FILE))
+        rebuild_s = time.perf_counter() - start
+
+    same = rebuilt == rollup and report['daily'][-1][1]['count'] == daily[report['daily'][-1][0]][0]
+    print(f"Transaksi: {rows}, hari: {len(rollup['daily'])}")
+    print(f"update rollup     : {apply_us:8.2f} us per transaksi")
+    print(f"laporan (rollup)  : {report_ms:8.3f} ms")
+    print(f"agregasi ulang    : {scan_ms:8.1f} ms (hanya per hari)")
+    print(f"rebuild streaming : {rebuild_s:8.2f} s ({rows / rebuild_s:,.0f} transaksi/detik)")
+    print(f"rebuild == inkremental: {same}")
+    return same
+
+
+def bench_pager(rows, page_size):
+    # satu halaman lewat generator vs menyaring/mengurutkan seluruh riwayat ke list
+    import tracemalloc
+    history = [make_transaction(i) for i in range(1, rows + 1)]
+    store = Lunite.Store([], [], history)
+    filters = {'product_id': 'P-0003'}
+
+    def measure(fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, elapsed, peak / 1e6
+
+    page, page_ms, page_mb = measure(lambda: Lunite.fetch_page(
+        Lunite.query_transactions(store, **filters), page_size)[0])
+    deep, deep_ms, deep_mb = measure(lambda: Lunite.fetch_page(
+        Lunite.query_transactions(store, start=rows // 2, **filters), page_size)[0])
+    top, top_ms, top_mb = measure(lambda: Lunite.fetch_sorted_page(
+        Lunite.query_transactions(store, **filters), 'id', True, 0, page_size)[0])
+    full, full_ms, full_mb = measure(lambda: sorted(
+        [t for t in history if t['product_id'] == 'P-0003'], key=lambda t: t['id'], reverse=True))
+
+    newest = [t for t in reversed(history) if t['product_id'] == 'P-0003']
+    same = page == newest[:page_size] and top == full[:page_size]
+    print(f"Transaksi: {rows}, halaman {page_size} baris, filter produk P-0003")
+    print(f"halaman pertama   : {page_ms:9.3f} ms, puncak memori {page_mb:7.2f} MB")
+    print(f"halaman dari cursor: {deep_ms:8.3f} ms, puncak memori {deep_mb:7.2f} MB")
+    print(f"urut (heap)       : {top_ms:9.1f} ms, puncak memori {top_mb:7.2f} MB")
+    print(f"list penuh + sort : {full_ms:9.1f} ms, puncak memori {full_mb:7.2f} MB")
+    print(f"hasil sama: {same}")
+    return same
+
+
+def bench_history(rows, page_size, backend_name):
+    # riwayat satu user lewat backend (keyset SQLite / streaming JSON) tanpa memuat
+    # seluruh transaksi, termasuk sambungan ke arsip kolom
+    import tracemalloc
+    base = Lunite.datetime(2025, 1, 1)
+    errors = []
+    with temp_data_dir():
+        store = seed_store(backend_name, [], [])
+        history = []
+        for i in range(1, rows + 1):
+            t = make_transaction(i)
+            t.created_at = (base + Lunite.timedelta(seconds=i * 60)).strftime(Lunite.TIME_FORMAT)
+            history.append(t)
+        with store.locked():
+            for t in history:
+                store.add_transaction(t)
+            store.commit(transactions=history)
+        # seperempat riwayat tertua pindah ke arsip
+        Lunite.archive_transactions(store, history[rows // 4].created_at[:10])
+        store.close(compact=False)
+        uid = 'U-0002'
+        expected = [t.id for t in reversed(history) if t.user_id == uid]
+        expected_p = [t.id for t in reversed(history) if t.user_id == uid and t.product_id == 'P-0002']
+        del history
+
+        store = Lunite.open_store(backend_name)
+        try:
+            tracemalloc.start()
+            start = time.perf_counter()
+            page, cursor = Lunite.fetch_page(Lunite.query_transactions(store, user_id=uid), page_size)
+            first_ms = (time.perf_counter() - start) * 1000
+            page_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            seen = [t.id for t in page]
+            start = time.perf_counter()
+            while cursor is not None:
+                page, cursor = Lunite.fetch_page(
+                    Lunite.query_transactions(store, user_id=uid, start=cursor), page_size)
+                seen.extend(t.id for t in page)
+            walk_s = time.perf_counter() - start
+            filtered, cursor = [], None
+            while True:
+                page, cursor = Lunite.fetch_page(Lunite.query_transactions(
+                    store, user_id=uid, product_id='P-0002', start=cursor), page_size)
+                filtered.extend(t.id for t in page)
+                if cursor is None:
+                    break
+            if store._transactions is not None:
+                errors.append("riwayat lengkap ikut dimuat")
+            tracemalloc.start()
+            store.transactions
+            full_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+        finally:
+            store.close(compact=False)
+    if seen != expected:
+        errors.append(f"halaman riwayat berbeda ({len(seen)} vs {len(expected)} transaksi)")
+    if filtered != expected_p:
+        errors.append("halaman riwayat dengan filter produk berbeda")
+    print(f"Backend: {backend_name}, {rows} transaksi, {len(expected)} milik {uid}")
+    print(f"halaman pertama   : {first_ms:9.2f} ms, puncak memori {page_mb:7.2f} MB")
+    print(f"semua halaman     : {walk_s:9.2f} s")
+    print(f"muat riwayat penuh: puncak memori {full_mb:7.2f} MB")
+    for e in errors:
+        print("GAGAL:", e)
+    return not errors
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def bench_arsip(rows):
+    # ukuran memori & disk: list dict + data_transaksi.json vs arsip kolom (mmap)
+    import tracemalloc
+    base = Lunite.datetime(2025, 1, 1)
+    with temp_data_dir():
+        tracemalloc.start()
+        history = []
+        for i in range(1, rows + 1):
+            t = make_transaction(i)
+            t['created_at'] = (base + Lunite.timedelta(seconds=i * 7)).strftime(Lunite.TIME_FORMAT)
+            if i % 10 == 0:
+                t['method'] = 'Gopay'
+                t['payment_ref'] = f"GP-{i:08d}"
+            history.append(t)
+        dict_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        sample = history[::100]
+        expected_total = sum(t['total'] for t in history)
+        Lunite.save_json(Lunite.TRANSACTIONS_FILE, history)
+        json_mb = os.path.getsize(Lunite.TRANSACTIONS_FILE) / 1e6
+        del history
+
+        store = Lunite.open_store('json')
+        start = time.perf_counter()
+        moved = Lunite.archive_transactions(store, '9999-12-31')
+        archive_s = time.perf_counter() - start
+        store.close()
+        archive_mb = _dir_size(Lunite.ARCHIVE_DIR) / 1e6
+
+        tracemalloc.start()
+        archive = Lunite.open_archive()
+        open_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        total = sum(archive.columns['total'])
+        scan_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        decoded = [archive.row(i) for i in range(0, rows, 100)]
+        row_us = (time.perf_counter() - start) * 1e6 / len(decoded)
+        same = decoded == sample and total == expected_total
+        # referensi Gopay yang diarsip tetap tidak bisa dipakai ulang
+        store = Lunite.open_store('json')
+        same = same and store.payment_ref_owner('Gopay', f"GP-{rows // 10 * 10:08d}") is not None
+        store.close(compact=False)
+        archive.close()
+
+    print(f"Transaksi: {rows}, diarsip: {moved} dalam {archive_s:.2f} detik")
+    print(f"memori list dict  : {dict_mb:9.1f} MB")
+    print(f"memori arsip (heap): {open_mb:8.3f} MB (kolom di-mmap, dimuat OS sesuai akses)")
+    print(f"disk JSON         : {json_mb:9.1f} MB")
+    print(f"disk arsip        : {archive_mb:9.1f} MB")
+    print(f"jumlah kolom total: {scan_ms:9.1f} ms")
+    print(f"decode satu baris : {row_us:9.2f} us")
+    print(f"isi sama: {same}")
+    return same
+
+
+def bench_model(users_count):
+    # memori & kecepatan: user sebagai dict vs User (__slots__)
+    import tracemalloc
+
+    def measure(build):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, elapsed, size / 1e6
+
+    dicts, dict_s, dict_mb = measure(lambda: [make_user_dict(i) for i in range(1, users_count + 1)])
+    users, load_s, user_mb = measure(lambda: [Lunite.User.from_dict(d) for d in dicts])
+
+    start = time.perf_counter()
+    total = 0
+    for d in dicts:
+        total += d.get('balance', 0) + d.get('pending_subscription_days', 0)
+    dict_get_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    total_attr = 0
+    for u in users:
+        total_attr += u.balance + u.pending_subscription_days
+    attr_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    dumped = [u.to_dict() for u in users]
+    dump_s = time.perf_counter() - start
+    same = dumped == dicts and total == total_attr
+
+    print(f"User: {users_count}")
+    print(f"memori dict       : {dict_mb:9.1f} MB")
+    print(f"memori User       : {user_mb:9.1f} MB (dibuat dari dict dalam {load_s:.2f} s)")
+    print(f"to_dict           : {dump_s:9.2f} s")
+    print(f"dict.get saldo    : {dict_get_ms:9.1f} ms")
+    print(f"atribut .balance  : {attr_ms:9.1f} ms")
+    print(f"round trip sama: {same}")
+    return same
+
+
+def check_catalog(store):
+    # cache katalog harus mengikuti tambah/ubah/hapus produk dan perubahan stok
+    errors = []
+    catalog = store.catalog
+    p = store.products[0]
+    catalog.table()
+    p.stock += 7
+    store.commit(products=[p])
+    if (p.id, p.name, p.price, Lunite.vip_price(p.price), p.type, p.stock) not in catalog.rows():
+        errors.append("stok baru tidak terlihat")
+    p.price += 1000
+    store.commit(products=[p])
+    if catalog.items()[0]['vip_price'] != Lunite.vip_price(p.price):
+        errors.append("harga VIP tidak dihitung ulang setelah ubah harga")
+    new_p = Lunite.Product(id=store.alloc_id('P'), name='Baru', price=5000, stock=1, type='topup')
+    store.add_product(new_p)
+    store.commit(products=[new_p])
+    if new_p.id not in catalog.table('topup'):
+        errors.append("produk baru tidak muncul")
+    store.remove_product(new_p)
+    store.commit(removed_products=[new_p])
+    if any(row[0] == new_p.id for row in catalog.rows()):
+        errors.append("produk terhapus masih muncul")
+    for t in catalog.types():
+        if any(row[4] != t for row in catalog.rows(t)):
+            errors.append(f"filter tipe {t} memuat tipe lain")
+    if sum(len(catalog.rows(t)) for t in catalog.types()) != len(store.products):
+        errors.append("jumlah baris per tipe tidak sama dengan jumlah produk")
+    return errors
+
+
+def bench_catalog(products_count, views):
+    # tabel produk: render ulang setiap tampil vs cache katalog per versi
+    rnd = random.Random(1)
+    types = ['topup'] * 8 + ['subscription', 'pass']
+    products = [Lunite.Product(id=Lunite.format_id('P', i), name=f"{rnd.randint(1, 500) * 60} Lunite",
+                               price=rnd.randint(1, 2000) * 1000, stock=rnd.randint(0, 100),
+                               type=rnd.choice(types))
+                for i in range(1, products_count + 1)]
+    store = Lunite.Store([], products, [], counters={'P': products_count})
+
+    def render_uncached(type=None):
+        table = Lunite.make_table(Lunite.CATALOG_FIELDS)
+        for p in store.products:
+            if type is None or p.type == type:
+                table.add_row([p.id, p.name, p.price, Lunite.vip_price(p.price), p.type or '-', p.stock])
+        return table.get_string()
+
+    start = time.perf_counter()
+    for _ in range(views):
+        render_uncached()
+    uncached_ms = (time.perf_counter() - start) * 1000 / views
+
+    start = time.perf_counter()
+    first = store.catalog.table()
+    first_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(views):
+        store.catalog.table()
+    cached_ms = (time.perf_counter() - start) * 1000 / views
+
+    start = time.perf_counter()
+    for _ in range(views):
+        render_uncached('subscription')
+    filter_uncached_ms = (time.perf_counter() - start) * 1000 / views
+    start = time.perf_counter()
+    for _ in range(views):
+        store.catalog.table('subscription')
+    filter_cached_ms = (time.perf_counter() - start) * 1000 / views
+
+    errors = []
+    if first != render_uncached():
+        errors.append("tabel dari cache berbeda dengan render langsung")
+    errors.extend(check_catalog(store))
+
+    print(f"Produk: {products_count}, tampil {views} kali")
+    print(f"render ulang      : {uncached_ms:9.3f} ms / tampil")
+    print(f"cache (pertama)   : {first_ms:9.3f} ms")
+    print(f"cache             : {cached_ms:9.3f} ms / tampil")
+    print(f"filter tipe ulang : {filter_uncached_ms:9.3f} ms / tampil")
+    print(f"filter tipe cache : {filter_cached_ms:9.3f} ms / tampil")
+    for e in errors:
+        print("GAGAL:", e)
+    if not errors:
+        print("Cache katalog mengikuti tambah/ubah/hapus produk dan perubahan stok.")
+    return not errors
+
+
+def bench_metrics(lookups, writes):
+    # overhead metrik: nonaktif harus sama dengan fungsi asli, aktif diukur per panggilan
+    import re
+    errors = []
+    users = [make_user(i) for i in range(1, 1001)]
+    store = Lunite.Store(users, [], [])
+    names = [u.username for u in users]
+    path = os.path.join(Lunite.DATA_DIR, "data.json")
+    payload = [make_user_dict(i) for i in range(100)]
+
+    def run():
+        lookup = store.user_by_username
+        start = time.perf_counter()
+        for i in range(lookups):
+            lookup(names[i % 1000])
+        lookup_ns = (time.perf_counter() - start) * 1e9 / lookups
+        start = time.perf_counter()
+        for _ in range(writes):
+            Lunite.save_json(path, payload)
+        write_us = (time.perf_counter() - start) * 1e6 / writes
+        return lookup_ns, write_us
+
+    originals = (Lunite.save_json, Lunite.Store.user_by_username)
+    with temp_data_dir():
+        try:
+            off = run()
+            metrics = Lunite.enable_metrics()
+            on = run()
+            text = metrics.prometheus_text()
+            if metrics.calls['Store.user_by_username'][0] != lookups:
+                errors.append("jumlah panggilan lookup tidak sesuai")
+            if metrics.bytes_written.get(path) != os.path.getsize(path) * writes:
+                errors.append("byte yang ditulis tidak sesuai ukuran file")
+            sample = re.compile(r'^[a-z_]+(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? [0-9.e+-]+$')
+            bad = [line for line in text.splitlines() if not line.startswith('#') and not sample.match(line)]
+            if bad:
+                errors.append(f"baris Prometheus tidak valid: {bad[0]}")
+            Lunite.disable_metrics()
+            if (Lunite.save_json, Lunite.Store.user_by_username) != originals:
+                errors.append("fungsi asli tidak dikembalikan setelah metrik dimatikan")
+            after = run()
+        finally:
+            Lunite.disable_metrics()
+
+    print(f"{'':18}{'nonaktif':>12}{'aktif':>12}{'dimatikan':>12}")
+    print(f"{'lookup (ns)':18}{off[0]:12.0f}{on[0]:12.0f}{after[0]:12.0f}")
+    print(f"{'save_json (us)':18}{off[1]:12.1f}{on[1]:12.1f}{after[1]:12.1f}")
+    for e in errors:
+        print("GAGAL:", e)
+    if not errors:
+        print("Metrik nonaktif memakai fungsi asli; dump Prometheus valid.")
+    return not errors
+
+
+def _payment_store(refs_count):
+    users = make_users(10, 10 ** 9)
+    products = [Lunite.Product(id='P-0001', name='60 Lunite', price=14000, stock=10 ** 9)]
+    transactions = []
+    for i in range(1, refs_count + 1):
+        trx = make_transaction(i)
+        trx.method, trx.payment_ref = 'Gopay', f"GO{i:012d}"
+        transactions.append(trx)
+    return Lunite.Store(users, products, transactions, counters={'T': refs_count})
+
+
+def bench_payment(refs_count, lookups, orders):
+    # dedup referensi pembayaran: biaya cek O(1), replay ditolak, konfirmasi gateway ganda aman
+    errors = []
+    timings = {}
+    for n in (1000, refs_count):
+        store = _payment_store(n)
+        store.payment_ref_owner('Gopay', 'x')  # bangun index
+        keys = [f"GO{random.randint(1, n * 2):012d}" for _ in range(1000)]
+        start = time.perf_counter()
+        for i in range(lookups):
+            store.payment_ref_owner('Gopay', keys[i % 1000])
+        timings[n] = (time.perf_counter() - start) * 1e9 / lookups
+
+    user = store.users[0]
+    trx, _ = Lunite.place_order(store, user, 'P-0001', '80012345', 'Bank', payment_ref='REF-A')
+    again, messages = Lunite.place_order(store, user, 'P-0001', '80012345', 'Bank', payment_ref='REF-A')
+    if not trx or again:
+        errors.append("referensi yang sama tidak ditolak saat dikirim ulang")
+    other, _ = Lunite.place_order(store, user, 'P-0001', '80012345', 'Gopay', payment_ref='REF-A')
+    if not other:
+        errors.append("referensi sama di metode lain ikut ditolak")
+    old = f"GO{refs_count:012d}"
+    if Lunite.place_order(store, user, 'P-0001', '80012345', 'Gopay', payment_ref=old)[0]:
+        errors.append("referensi dari riwayat lama tidak ditolak")
+
+    # gateway: setiap konfirmasi terkirim dua kali, 20% pembayaran gagal
+    store = _payment_store(0)
+    store.payments = Lunite.PendingPayments(
+        store, Lunite.PaymentGateway(delay=0.01, fail_rate=0.2, duplicate_rate=1.0, seed=1))
+    start = time.perf_counter()
+    refs = [store.payments.start({'username': store.users[i % 10].username, 'product_id': 'P-0001',
+                                  'uid_game': '80012345', 'method': 'Gopay'}) for i in range(orders)]
+    started_ms = (time.perf_counter() - start) * 1000
+    time.sleep(0.2)
+    settled = store.payments.settle()
+    paid = [ref for ref, _, trx, _ in settled if trx]
+    by_ref = {}
+    for t in store.transactions:
+        by_ref[t.payment_ref] = by_ref.get(t.payment_ref, 0) + 1
+    if len(settled) != orders:
+        errors.append(f"{len(settled)} dari {orders} pesanan diselesaikan")
+    if any(count != 1 for count in by_ref.values()) or len(by_ref) != len(paid):
+        errors.append("konfirmasi ganda membuat transaksi ganda")
+    if any(store.payments.status(ref)[0] == 'pending' for ref in refs):
+        errors.append("masih ada pesanan pending")
+
+    # JSON: transaksi tersimpan tetapi index belum ditulis (crash di antaranya)
+    with temp_data_dir():
+        store = seed_store('json', [make_user(1)],
+                           [Lunite.Product(id='P-0001', name='60 Lunite', price=14000, stock=10)])
+        Lunite.place_order(store, store.users[0], 'P-0001', '80012345', 'Bank', payment_ref='CRASH')
+        store.close(compact=False)
+        os.remove(Lunite.PAYMENT_REFS_FILE)
+        store = Lunite.open_store('json')
+        if not store.payment_ref_owner('Bank', 'CRASH'):
+            errors.append("referensi di journal transaksi tidak terbaca setelah crash")
+        store.close(compact=False)
+
+    print(f"cek referensi     : {timings[1000]:7.0f} ns ({1000} ref), {timings[refs_count]:7.0f} ns ({refs_count} ref)")
+    print(f"gateway           : {orders} pesanan dimulai dalam {started_ms:.1f} ms (tanpa menunggu konfirmasi), "
+          f"{len(paid)} dibayar, {orders - len(paid)} ditolak")
+    ratio = timings[refs_count] / timings[1000]
+    if ratio > 3:
+        errors.append(f"cek referensi {ratio:.1f}x lebih lambat pada {refs_count} ref")
+    for e in errors:
+        print("GAGAL:", e)
+    if not errors:
+        print("Replay ditolak, konfirmasi ganda tidak membuat transaksi ganda.")
+    return not errors
+
+
+def _cart_store(users_count, stock):
+    users = make_users(users_count, 10 ** 12)
+    products = [Lunite.Product(id=Lunite.format_id('P', i), name=f"{i * 60} Lunite", price=14000 * i,
+                               stock=stock, type='topup') for i in range(1, 7)]
+    return users, products
+
+
+def check_cart():
+    # aturan checkout keranjang pada Store di memori
+    errors = []
+    users, products = _cart_store(2, 10)
+    store = Lunite.Store(users, products, [], counters={})
+    commits = []
+    commit = store.commit
+    store.commit = lambda **kw: (commits.append(kw), commit(**kw))
+    user = store.users[0]
+
+    # 3 baris: tiap produk < Rp100.000, total keranjang >= Rp100.000
+    items = [('P-0001', 2), ('P-0002', 1), ('P-0003', 1), ('P-0001', 1)]
+    trxs, messages = Lunite.place_cart(store, user, items, '80012345', 'Saldo')
+    if not trxs or len(trxs) != 3:
+        errors.append(f"keranjang gagal: {messages}")
+        return errors
+    total = sum(t.total for t in trxs)
+    if total != 14000 * 3 + 28000 + 42000 or user.balance != 10 ** 12 - total:
+        errors.append("total/saldo keranjang salah")
+    if [p.stock for p in store.products[:3]] != [7, 9, 9]:
+        errors.append("stok tidak dipotong sesuai jumlah per baris")
+    if len(commits) != 1 or len(commits[0]['transactions']) != 3:
+        errors.append(f"{len(commits)} commit untuk satu keranjang")
+    earned = store.vouchers_of(user.username)
+    if len(earned) != 1 or earned[0].percent != Lunite.compute_voucher_percent(total):
+        errors.append("voucher tidak dihitung dari total keranjang")
+
+    # voucher dipakai sekali, potongan tersebar ke semua baris
+    voucher = earned[0]
+    lines = [(store.product('P-0004'), 1), (store.product('P-0005'), 3)]
+    q = Lunite.quote_cart(user, lines, voucher)
+    trxs, _ = Lunite.place_cart(store, user, [('P-0004', 1), ('P-0005', 3)], '80012345', 'Saldo',
+                                voucher.id, q['total'])
+    if not trxs or sum(t.total for t in trxs) != q['total'] \
+            or q['discount'] != Lunite.voucher_discount(q['subtotal'], voucher.percent):
+        errors.append("potongan voucher keranjang salah")
+    if store.usable_voucher(voucher.id, user.username):
+        errors.append("voucher masih bisa dipakai setelah checkout")
+    rollup = Lunite.build_rollup(store.transactions)
+    if rollup['vouchers'] != {'used': 1, 'discount': q['discount']}:
+        errors.append(f"rollup voucher salah: {rollup['vouchers']}")
+
+    # satu baris = quote() biasa
+    single = Lunite.quote_cart(user, [(store.product('P-0006'), 2)])['lines'][0]
+    if single != Lunite.quote(user, store.product('P-0006'), None, 2):
+        errors.append("keranjang satu baris berbeda dari quote()")
+
+    # stok baris kedua kurang: tidak ada yang dipotong
+    before = (user.balance, [p.stock for p in store.products], len(store.transactions), len(commits))
+    trxs, messages = Lunite.place_cart(store, user, [('P-0006', 1), ('P-0001', 50)], '80012345', 'Saldo')
+    if trxs or messages != ["Stok 60 Lunite hanya 7."]:
+        errors.append(f"stok kurang tidak ditolak: {messages}")
+    if before != (user.balance, [p.stock for p in store.products], len(store.transactions), len(commits)):
+        errors.append("keranjang yang ditolak mengubah data")
+    return errors
+
+
+def bench_cart(carts, lines, qty, backend_name):
+    # checkout keranjang (satu commit) vs beli satu per satu dengan place_order
+    errors = check_cart()
+    units = carts * lines * qty
+    timings = {}
+    for mode in ('satuan', 'keranjang'):
+        with temp_data_dir():
+            store = seed_store(backend_name, *_cart_store(100, units))
+            items = [(store.products[i % len(store.products)].id, qty) for i in range(lines)]
+            start = time.perf_counter()
+            for n in range(carts):
+                user = store.users[n % len(store.users)]
+                if mode == 'keranjang':
+                    trxs, messages = Lunite.place_cart(store, user, items, '80012345', 'Saldo')
+                    ok = bool(trxs)
+                else:
+                    ok = all(Lunite.place_order(store, user, pid, '80012345', 'Saldo')[0]
+                             for pid, count in items for _ in range(count))
+                if not ok:
+                    errors.append(f"pembelian {mode} gagal")
+                    break
+            timings[mode] = time.perf_counter() - start
+            if sum(units - p.stock for p in store.products) != units:
+                errors.append(f"stok {mode} tidak berkurang {units} unit")
+            store.close(compact=False)
+
+    print(f"Backend: {backend_name}, {carts} keranjang x {lines} produk x {qty} unit = {units} unit")
+    print(f"{'':18}{'keranjang/dtk':>14}{'unit/dtk':>12}{'commit':>10}")
+    for mode, commits in (('satuan', units), ('keranjang', carts)):
+        elapsed = timings.get(mode)
+        if elapsed:
+            print(f"{mode:18}{carts / elapsed:14.1f}{units / elapsed:12.1f}{commits:10}")
+    if len(timings) == 2:
+        print(f"Percepatan        : {timings['satuan'] / timings['keranjang']:.1f}x")
+    for e in errors:
+        print("GAGAL:", e)
+    if not errors:
+        print("Total, stok, voucher dan satu commit per keranjang sesuai.")
+    return not errors
+
+
+def _voucher_run(vouchers_count, users_count, ops):
+    # satu folder data berisi vouchers_count voucher (1 dari 4 sudah terpakai)
+    users = [make_user(i) for i in range(1, users_count + 1)]
+    for u in users[::10]:
+        u['role'] = 'vip'
+    Lunite.save_json(Lunite.USERS_FILE, users)
+    Lunite.save_json(Lunite.VOUCHERS_FILE, [
+        Lunite.Voucher(id=Lunite.format_id('V', i), owner=f"user{i % users_count + 1}",
+                       percent=2, used=i % 4 == 0)
+        for i in range(1, vouchers_count + 1)])
+    Lunite.save_counters({'U': users_count, 'P': 0, 'T': 0, 'V': vouchers_count})
+    Lunite.save_json_dict(Lunite.SCHEMA_FILE, {'version': Lunite.SCHEMA_VERSION})
+
+    start = time.perf_counter()
+    store = Lunite.open_store('json')
+    load_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for n in range(ops):
+        with store.locked():
+            v = Lunite.Voucher(id=store.alloc_id('V'), owner=f"user{n % users_count + 1}", percent=2)
+            store.add_voucher(v)
+            store.commit(vouchers=[v])
+    issue_us = (time.perf_counter() - start) * 1e6 / ops
+
+    ids = [Lunite.format_id('V', rng.randint(1, vouchers_count)) for _ in range(100000)]
+    start = time.perf_counter()
+    found = sum(1 for vid in ids if store.voucher(vid))
+    lookup_us = (time.perf_counter() - start) * 1e6 / len(ids)
+    owners = [f"user{rng.randint(1, users_count)}" for _ in range(10000)]
+    start = time.perf_counter()
+    for name in owners:
+        store.vouchers_of(name)
+    owner_us = (time.perf_counter() - start) * 1e6 / len(owners)
+
+    start = time.perf_counter()
+    issued = Lunite.issue_campaign(store, 5, role='vip', days=30)
+    campaign_s = time.perf_counter() - start
+    start = time.perf_counter()
+    store.close()
+    close_s = time.perf_counter() - start
+    start = time.perf_counter()
+    archived = Lunite.compact_vouchers(force=True)
+    compact_s = time.perf_counter() - start
+    return {
+        'load_s': load_s, 'hot': len(store.vouchers_by_id), 'issue_us': issue_us,
+        'lookup_us': lookup_us, 'found': found, 'owner_us': owner_us,
+        'campaign': issued, 'campaign_s': campaign_s, 'close_s': close_s,
+        'compact_s': compact_s, 'archived': archived,
+    }
+
+
+def bench_voucher(vouchers_count, users_count, ops):
+    # biaya terbit/cari voucher harus tetap sama walau jumlah voucher naik
+    results = []
+    for size in (1000, vouchers_count):
+        with temp_data_dir():
+            results.append((size, _voucher_run(size, users_count, ops)))
+
+    print(f"User: {users_count} (10% VIP), terbit satu per satu: {ops}")
+    for size, r in results:
+        print(f"--- {size} voucher ({r['hot']} aktif setelah kampanye, dimuat dalam {r['load_s']:.2f} s)")
+        print(f"terbit + commit   : {r['issue_us']:9.1f} us / voucher")
+        print(f"cari per ID       : {r['lookup_us']:9.3f} us ({r['found']} dari 100000 aktif)")
+        print(f"voucher milik user: {r['owner_us']:9.2f} us")
+        print(f"kampanye VIP      : {r['campaign']} voucher dalam {r['campaign_s'] * 1000:.1f} ms (satu commit)")
+        print(f"close             : {r['close_s']:9.2f} s (compact hanya jika journal sudah besar)")
+        print(f"compact + arsip   : {r['compact_s']:9.2f} s ({r['archived']} voucher ke arsip)")
+    small, large = results[0][1], results[-1][1]
+    ratio = large['issue_us'] / small['issue_us']
+    print(f"rasio biaya terbit {results[-1][0]} vs {results[0][0]} voucher: {ratio:.2f}x")
+    return ratio < 3
+
+
+def check_limiter_rules():
+    # aturan kunci: MAX_FAILED_ATTEMPTS gagal -> terkunci LOCK_DURATION_SECS, lalu terbuka lagi
+    now = [1000.0]
+    limiter = Lunite.LoginLimiter(clock=lambda: now[0])
+    errors = []
+    for n in range(Lunite.MAX_FAILED_ATTEMPTS - 1):
+        if limiter.record_failure('aris'):
+            errors.append(f"terkunci setelah {n + 1} gagal")
+    if not limiter.record_failure('aris'):
+        errors.append(f"tidak terkunci setelah {Lunite.MAX_FAILED_ATTEMPTS} gagal")
+    if limiter.locked_seconds('aris') != Lunite.LOCK_DURATION_SECS:
+        errors.append(f"sisa kunci {limiter.locked_seconds('aris')} detik")
+    now[0] += Lunite.LOCK_DURATION_SECS + 1
+    if limiter.locked_seconds('aris'):
+        errors.append("masih terkunci setelah LOCK_DURATION_SECS")
+    # gagal yang berjauhan (di luar window) tidak mengunci
+    for _ in range(Lunite.MAX_FAILED_ATTEMPTS):
+        locked = limiter.record_failure('Ris')
+        now[0] += Lunite.FAILED_WINDOW_SECS
+    if locked:
+        errors.append("terkunci oleh gagal di luar window")
+    limiter.record_failure('Arisu')
+    limiter.record_success('Arisu')
+    if limiter.status('Arisu') != (0, None):
+        errors.append("login berhasil tidak mereset hitungan gagal")
+    for _ in range(Lunite.CLIENT_LOGIN_BURST):
+        limiter.record_failure('x', client='10.0.0.1')
+    if not limiter.client_wait('10.0.0.1'):
+        errors.append("token bucket klien tidak membatasi")
+    now[0] += 1
+    if limiter.client_wait('10.0.0.1'):
+        errors.append("token bucket klien tidak terisi ulang")
+    return errors
+
+
+def bench_limiter(attempts, users_count, rate):
+    # credential stuffing: `attempts` percobaan gagal dengan laju `rate` per detik
+    # (jam disimulasikan); data user tidak boleh ditulis, snapshot kunci hanya sesekali
+    errors = check_limiter_rules()
+    with temp_data_dir():
+        Lunite.save_json(Lunite.USERS_FILE, [make_user(i) for i in range(1, users_count + 1)])
+        store = Lunite.open_store('json')
+        now = [time.time()]
+        store.limiter = Lunite.LoginLimiter(Lunite.LOGIN_LIMIT_FILE, clock=lambda: now[0])
+        before = {name: os.stat(os.path.join(Lunite.DATA_DIR, name)).st_mtime_ns
+                  for name in os.listdir(Lunite.DATA_DIR)}
+
+        users = store.users
+        rejected = 0
+        step = 1 / rate
+        start = time.perf_counter()
+        for i in range(attempts):
+            now[0] += step
+            user = users[i % users_count]
+            if store.limiter.locked_seconds(user.username):
+                rejected += 1
+                continue
+            Lunite.authenticate(store, user, 'salah', checked=(False, None))
+        elapsed = time.perf_counter() - start
+        simulated = attempts * step
+        writes = store.limiter.snapshot_writes
+        locked = len(store.limiter.locks)
+        store.close()
+
+        after = {name: os.stat(os.path.join(Lunite.DATA_DIR, name)).st_mtime_ns
+                 for name in os.listdir(Lunite.DATA_DIR)}
+        touched = sorted(name for name in after if before.get(name) != after[name]
+                         and not name.startswith(os.path.basename(Lunite.LOGIN_LIMIT_FILE)))
+        if touched:
+            errors.append(f"file data ditulis: {touched}")
+        if writes > simulated / Lunite.LIMITER_SNAPSHOT_SECS + 1:
+            errors.append(f"{writes} snapshot untuk {simulated:.1f} detik")
+        restored = Lunite.LoginLimiter(Lunite.LOGIN_LIMIT_FILE, clock=lambda: now[0]).load()
+        if len(restored.locks) != locked:
+            errors.append(f"snapshot memuat {len(restored.locks)} kunci, seharusnya {locked}")
+
+    print(f"Percobaan gagal: {attempts} ke {users_count} user, laju simulasi {rate}/detik")
+    print(f"waktu proses      : {elapsed:9.2f} s ({attempts / elapsed:.0f} percobaan / detik)")
+    print(f"ditolak (terkunci): {rejected}")
+    print(f"snapshot kunci    : {writes} kali dalam {simulated:.1f} detik simulasi")
+    print(f"kunci aktif       : {locked} (dimuat ulang dari snapshot)")
+    for e in errors:
+        print("GAGAL:", e)
+    if not errors:
+        print("Aturan kunci benar, tidak ada tulis ke file data per percobaan.")
+    return not errors
+
+
+# Data sintetis + suite skenario (subcommand generate / suite)
+# generate menulis folder data lengkap (format terbaru) dengan distribusi yang
+# mirip produksi; suite menjalankan alur menu asli (input/password di-skrip)
+# pada salinan folder itu dan bisa menyimpan/membandingkan baseline JSON.
+GEN_META_FILE = "bench.json"
+GEN_PASSWORD_POOL = 64  # hash password berbeda (dipakai bergiliran), scrypt per user terlalu lama
+GEN_METHODS = ['Saldo'] * 12 + ['Gopay'] * 5 + ['Bank'] * 3
+SUITE_SCENARIOS = ['register', 'login', 'purchase', 'topup', 'history', 'admin']
+
+
+def _letters(i):
+    # username hanya boleh huruf: angka -> huruf basis 26
+    s = ''
+    while True:
+        s = chr(97 + i % 26) + s
+        i //= 26
+        if not i:
+            return s
+
+
+def gen_username(i):
+    return "pemain" + _letters(i)
+
+
+def gen_password(i):
+    return f"rahasia{i % GEN_PASSWORD_POOL}"
+
+
+def _write_json_array(path, records):
+    # ditulis bertahap agar 10 juta baris tidak perlu ada di memori sekaligus
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for r in records:
+            f.write((",\n" if count else "\n") + Lunite.JSON_ENCODER.encode(r))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def _pick_skewed(rnd, n):
+    # 80% aktivitas datang dari 20% pertama (user/produk populer)
+    hot = max(1, n // 5)
+    return rnd.randrange(hot) if rnd.random() < 0.8 else rnd.randrange(n)
+
+
+def generate_data(out, users_count, products_count, trx_count, seed=1, hash_cost=None, days=365):
+    rnd = random.Random(seed)
+    hash_cost = hash_cost or Lunite.PASSWORD_HASH_COST
+    now = datetime.now().replace(microsecond=0)
+    data_dir = os.path.join(out, Lunite.DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    path = lambda name: os.path.join(out, name)
+    start = time.perf_counter()
+
+    # produk: sebagian besar topup, sebagian kecil subscription (harga tetap)
+    products = []
+    for i in range(1, products_count + 1):
+        if i % 10 == 5:
+            products.append(Lunite.Product(id=Lunite.format_id('P', i), name="Lunite Subscription",
+                                           price=68000, stock=10 ** 7, type='subscription'))
+        else:
+            # paket kecil lebih banyak variasinya (dan lebih laku) daripada paket besar
+            amount = rnd.choice([60, 60, 60, 300, 300, 300, 980, 980, 1980, 3280, 6480])
+            products.append(Lunite.Product(id=Lunite.format_id('P', i), name=f"{amount} Lunite",
+                                           price=amount * 230 // 1000 * 1000 or 1000,
+                                           stock=10 ** 7, type='topup'))
+    _write_json_array(path(Lunite.PRODUCTS_FILE), products)
+
+    # user: ~12% VIP (sebagian sudah kadaluarsa), saldo log-normal, 20% saldo nol
+    pool = [Lunite.hash_password(f"rahasia{k}", hash_cost) for k in range(GEN_PASSWORD_POOL)]
+    vip = set()
+
+    def users():
+        yield {'username': 'admin', 'password': Lunite.hash_password('admin123', hash_cost),
+               'role': 'admin', 'balance': 0}
+        for i in range(1, users_count + 1):
+            role, vip_expiry, pending = 'member', None, 0
+            r = rnd.random()
+            if r < 0.12:
+                role = 'vip'
+                vip_expiry = (now + timedelta(days=rnd.uniform(-30, 60))).strftime(Lunite.TIME_FORMAT)
+                vip.add(i)
+                if r < 0.03:
+                    pending = Lunite.SUBSCRIPTION_DAYS
+            balance = 0 if rnd.random() < 0.2 else int(rnd.lognormvariate(11.5, 1.2)) // 1000 * 1000
+            yield Lunite.User(id=Lunite.format_id('U', i), username=gen_username(i),
+                              password=pool[i % GEN_PASSWORD_POOL], role=role, balance=balance,
+                              vip_expiry=vip_expiry, pending_subscription_days=pending)
+    _write_json_array(path(Lunite.USERS_FILE), users())
+
+    # transaksi: urut waktu, user & produk condong ke yang populer; pembelian
+    # >= 100rb menghasilkan voucher (sebagian sudah terpakai)
+    rollup = Lunite.new_rollup()
+    vouchers = []
+    unused = {}  # user -> voucher yang belum dipakai
+    first = now - timedelta(days=days)
+    step = days * 86400 / max(trx_count, 1)
+
+    def transactions():
+        for i in range(1, trx_count + 1):
+            u = _pick_skewed(rnd, users_count) + 1
+            p = products[_pick_skewed(rnd, products_count)]
+            unit = Lunite.unit_price_for('vip' if u in vip else 'member', p.price)
+            used = None
+            if u in unused and rnd.random() < 0.3:
+                used = unused[u].pop()
+                if not unused[u]:
+                    del unused[u]
+                used.used = True
+            total = unit - (Lunite.voucher_discount(unit, used.percent) if used else 0)
+            trx = Lunite.Transaction(
+                id=Lunite.format_id('T', i), user_id=Lunite.format_id('U', u), product_id=p.id,
+                qty=1, unit_price=unit, subtotal=unit, voucher_applied=used.id if used else None,
+                total=total, method=rnd.choice(GEN_METHODS), uid_game=str(rnd.randint(10 ** 7, 10 ** 9)),
+                created_at=(first + timedelta(seconds=i * step)).strftime(Lunite.TIME_FORMAT))
+            Lunite.apply_to_rollup(rollup, trx)
+            percent = Lunite.compute_voucher_percent(total)
+            if percent:
+                v = Lunite.Voucher(id=Lunite.format_id('V', len(vouchers) + 1), owner=gen_username(u),
+                                   percent=percent, used=False, expires_at=None)
+                vouchers.append(v)
+                unused.setdefault(u, []).append(v)
+            yield trx
+    _write_json_array(path(Lunite.TRANSACTIONS_FILE), transactions())
+
+    # campaign lama: sebagian voucher punya masa berlaku (ada yang sudah lewat)
+    now_text = now.strftime(Lunite.TIME_FORMAT)
+    for v in vouchers:
+        if not v.used and rnd.random() < 0.3:
+            v.expires_at = (now + timedelta(days=rnd.uniform(-60, 60))).strftime(Lunite.TIME_FORMAT)
+    # seperti setelah compact: voucher aktif di snapshot, sisanya di arsip
+    _write_json_array(path(Lunite.VOUCHERS_FILE), (v for v in vouchers if v.usable(now_text)))
+    with open(path(Lunite.VOUCHER_ARCHIVE_FILE), "w", encoding="utf-8") as f:
+        f.writelines(Lunite.JSON_ENCODER.encode(v) + "\n" for v in vouchers if not v.usable(now_text))
+
+    Lunite.save_json_dict(path(Lunite.ROLLUP_FILE), rollup)
+    Lunite.save_json_dict(path(Lunite.COUNTERS_FILE),
+                          {'U': users_count, 'P': products_count, 'T': trx_count, 'V': len(vouchers)})
+    Lunite.save_json_dict(path(Lunite.SCHEMA_FILE), {'version': Lunite.SCHEMA_VERSION})
+    meta = {'users': users_count, 'products': products_count, 'transactions': trx_count,
+            'vouchers': len(vouchers), 'vip': len(vip), 'seed': seed, 'hash_cost': hash_cost,
+            'generated_at': now_text}
+    Lunite.save_json_dict(os.path.join(data_dir, GEN_META_FILE), meta)
+    meta['seconds'] = round(time.perf_counter() - start, 2)
+    return meta
+
+
+class ScriptedInput:
+    # pengganti input()/ask_password: jawaban dipilih dari awalan prompt
+    def __init__(self):
+        self.answers = []
+
+    def __call__(self, prompt=''):
+        for prefix, answer in self.answers:
+            if prompt.startswith(prefix):
+                return answer() if callable(answer) else answer
+        raise RuntimeError(f"prompt tidak terduga: {prompt!r}")
+
+
+def _pages(first='n', then='q'):
+    # pager: buka satu halaman berikutnya lalu kembali
+    answers = iter([first])
+    return lambda: next(answers, then)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: byte
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _scenario_steps(store, rnd, scripted):
+    members = [u for u in store.users if u.role != 'admin']
+    admin = store.user_by_username('admin')
+    registered = [0]
+    refs = iter(range(1, 10 ** 9))
+
+    def register():
+        registered[0] += 1
+        scripted.answers = [("Username baru", "baru" + _letters(registered[0] + 10 ** 6)),
+                            ("Password", "rahasia123")]
+        return Lunite.register(store) is not None
+
+    def login():
+        i = rnd.randrange(len(members))
+        # login dingin: cache verifikasi dikosongkan agar scrypt ikut terukur
+        Lunite._verify_cache.clear()
+        scripted.answers = [("Username", members[i].username), ("Password", gen_password(int(members[i].id[2:])))]
+        return Lunite.login(store) is not None
+
+    def purchase():
+        user = members[_pick_skewed(rnd, len(members))]
+        product = store.products[_pick_skewed(rnd, len(store.products))]
+        before = store.counters.get('T', 0)
+        method = '1' if user.balance >= product.price else '2'
+        scripted.answers = [("Filter tipe", ""), ("Masukkan ID produk", product.id),
+                            ("Jumlah", ""), ("Tambah produk", "n"), ("Masukkan UID", "80012345"), ("Pakai voucher", "1"),
+                            ("Metode", method), ("Konfirmasi", "y"),
+                            ("Masukkan referensi", lambda: f"REF{next(refs)}")]
+        Lunite.buy_lunite_flow(user, store)
+        return store.counters.get('T', 0) > before
+
+    def topup():
+        user = members[rnd.randrange(len(members))]
+        before = user.balance
+        scripted.answers = [("Masukkan nominal", str(rnd.choice([10000, 50000, 100000])))]
+        Lunite.topup_balance(user, store)
+        return user.balance > before
+
+    def history():
+        user = members[_pick_skewed(rnd, len(members))]
+        scripted.answers = [("[", _pages())]
+        Lunite.view_transactions(user, store)
+        return True
+
+    def admin_listing():
+        menu = iter(['5'])
+        scripted.answers = [("Pilih", lambda: next(menu, '10')), ("Filter role", ""), ("[", _pages())]
+        Lunite.admin_menu(store)
+        return admin is not None
+
+    return {'register': register, 'login': login, 'purchase': purchase, 'topup': topup,
+            'history': history, 'admin': admin_listing}
+
+
+def run_suite(data, ops, scenarios, backend_name, seed):
+    import builtins
+    import contextlib
+    import io
+
+    meta = Lunite.load_json_dict(os.path.join(data, Lunite.DATA_DIR, GEN_META_FILE))
+    old_input, old_ask, old_cost = builtins.input, Lunite.ask_password, Lunite.PASSWORD_HASH_COST
+    scripted = ScriptedInput()
+    result = {'meta': dict(meta, backend=backend_name, ops=ops, seed=seed,
+                           python=sys.version.split()[0], platform=sys.platform,
+                           date=datetime.now().strftime(Lunite.TIME_FORMAT)),
+              'scenarios': {}}
+    with temp_data_dir("lunite-suite-"):
+        try:
+            # salinan: data asli tetap sama untuk run berikutnya (hasil bisa dibandingkan)
+            shutil.copytree(os.path.join(data, Lunite.DATA_DIR), Lunite.DATA_DIR, dirs_exist_ok=True)
+            # hash yang dibuat generator tidak di-upgrade saat login
+            Lunite.PASSWORD_HASH_COST = meta.get('hash_cost', old_cost)
+            if backend_name == 'sqlite':
+                Lunite.migrate_json_to_sqlite()
+            builtins.input = Lunite.ask_password = scripted
+
+            start = time.perf_counter()
+            store = Lunite.open_store(backend_name)
+            Lunite.sweep_expired_vips(store)
+            result['load_s'] = round(time.perf_counter() - start, 3)
+            result['peak_rss_mb_load'] = _peak_rss_mb()
+
+            rnd = random.Random(seed)
+            steps = _scenario_steps(store, rnd, scripted)
+            sink = io.StringIO()
+            for name in scenarios:
+                step = steps[name]
+                latencies, failed = [], 0
+                begin = time.perf_counter()
+                for _ in range(ops):
+                    t0 = time.perf_counter()
+                    with contextlib.redirect_stdout(sink):
+                        ok = step()
+                    latencies.append(time.perf_counter() - t0)
+                    failed += not ok
+                    sink.seek(0)
+                    sink.truncate()
+                elapsed = time.perf_counter() - begin
+                result['scenarios'][name] = {
+                    'ops': ops, 'failed': failed, 'ops_per_s': round(ops / elapsed, 2),
+                    'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+                    'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+                    'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+                    'max_ms': round(max(latencies) * 1000, 3),
+                    'peak_rss_mb': _peak_rss_mb()}
+            store.close(compact=False)
+        finally:
+            builtins.input, Lunite.ask_password, Lunite.PASSWORD_HASH_COST = old_input, old_ask, old_cost
+    return result
+
+
+def print_suite(result, baseline=None, tolerance=20):
+    # regresi dinilai dari p50 (op pertama yang memuat riwayat dsb. tidak ikut);
+    # tolerance: persen kenaikan p50 yang masih dianggap wajar
+    meta = result['meta']
+    print(f"Data: {meta.get('users')} user, {meta.get('products')} produk, "
+          f"{meta.get('transactions')} transaksi, {meta.get('vouchers')} voucher | "
+          f"backend {meta['backend']}, {meta['ops']} op per skenario")
+    print(f"load              : {result['load_s']:9.3f} s (puncak RSS {result['peak_rss_mb_load']} MB)")
+    print(f"{'skenario':10}{'op/detik':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"{'RSS MB':>9}{'gagal':>7}" + ("   p50 vs baseline" if baseline else ""))
+    if baseline:
+        keys = ('users', 'products', 'transactions', 'seed', 'backend', 'ops')
+        differ = [k for k in keys if baseline['meta'].get(k) != meta.get(k)]
+        if differ:
+            print(f"PERINGATAN: baseline memakai {', '.join(differ)} yang berbeda")
+    regressions = []
+    for name, s in result['scenarios'].items():
+        line = (f"{name:10}{s['ops_per_s']:11.1f}{s['p50_ms']:10.2f}{s['p95_ms']:10.2f}"
+                f"{s['p99_ms']:10.2f}{s['max_ms']:10.2f}{s['peak_rss_mb'] or 0:9.1f}{s['failed']:7d}")
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        if base:
+            change = (s['p50_ms'] - base['p50_ms']) * 100 / base['p50_ms']
+            line += f"   {change:+7.1f}%"
+            if change > tolerance:
+                line += " REGRESI"
+                regressions.append(name)
+        print(line)
+    failed = [name for name, s in result['scenarios'].items() if s['failed']]
+    for name in failed:
+        print(f"GAGAL: {result['scenarios'][name]['failed']} op {name} tidak berhasil")
+    return not regressions and not failed
+
+
+STARTUP_TARGET_MS = 100
+STARTUP_SCRIPT = (
+    "import time\n"
+    "t0 = time.perf_counter()\n"
+    "import Lunite\n"
+    "t1 = time.perf_counter()\n"
+    "store = Lunite.open_store()\n"
+    "Lunite.sweep_expired_vips(store)\n"
+    "t2 = time.perf_counter()\n"
+    "n = len(store.transactions)\n"
+    "t3 = time.perf_counter()\n"
+    "store.close(compact=False)\n"
+    "print((t1 - t0) * 1000, (t2 - t1) * 1000, (t3 - t2) * 1000, n)\n"
+)
+
+
+def _cluster_snapshot(router):
+    # isi cluster untuk dibandingkan sebelum/sesudah init dan rebalance
+    rollup = shard.merge_rollups(router.fan_out(shard._node_rollup))
+    stats = router.stats()
+    return {
+        'users': sum(s['users'] for s in stats),
+        'vouchers': sum(s['vouchers'] for s in stats),
+        'stock': {p['id']: p['stock'] for p in router.products()},
+        'rollup': {k: rollup[k] for k in ('count', 'revenue', 'units', 'daily', 'products',
+                                          'methods', 'vouchers')},
+    }
+
+
+def _check_placement(router, errors):
+    # setiap user ada di shard hasil hash ID-nya dan terdaftar di direktori
+    for i, users in enumerate(router.fan_out(shard._node_users, None)):
+        for u in users:
+            if shard.shard_of(shard.shard_key(u['id'], u['username']), router.shards) != i:
+                errors.append(f"user {u['username']} ada di shard {i}")
+                return
+            if router.directory.get(u['username'], '?') != u['id']:
+                errors.append(f"user {u['username']} tidak ada di direktori")
+                return
+
+
+def bench_shard(users_count, trx_count, shards, backend_name):
+    # cluster lokal beberapa folder shard: init dari satu folder data, operasi
+    # lewat router, fan-out admin paralel vs berurutan, lalu rebalance
+    errors = []
+    old_cost = Lunite.PASSWORD_HASH_COST
+    router = None
+    with temp_data_dir("lunite-shard-") as tmp:
+        try:
+            source = os.path.join(tmp, "sumber")
+            generate_data(source, users_count, 20, trx_count, hash_cost=10)
+            # hash yang dibuat generator tidak di-upgrade saat login
+            Lunite.PASSWORD_HASH_COST = 10
+            node = shard.ShardNode(source, 'json')
+            rollup = node.call(shard._node_rollup)
+            before = {
+                'users': node.call(shard._node_stats)['users'],
+                'vouchers': node.call(shard._node_stats)['vouchers'],
+                'stock': {p['id']: p['stock'] for p in node.call(shard._node_products)},
+                'rollup': {k: rollup[k] for k in ('count', 'revenue', 'units', 'daily', 'products',
+                                                  'methods', 'vouchers')},
+            }
+            node.close(compact=False)
+
+            root = os.path.join(tmp, "cluster")
+            start = time.perf_counter()
+            shard.init_cluster(source, root, shards, backend_name, 'json')
+            init_s = time.perf_counter() - start
+            router = shard.ShardRouter(root)
+            if _cluster_snapshot(router) != before:
+                errors.append("isi cluster setelah init berbeda dari data sumber")
+            _check_placement(router, errors)
+
+            # login, beli, riwayat lewat router
+            k = users_count // 2
+            user, messages = router.login(gen_username(k), gen_password(k))
+            if not user:
+                errors.append(f"login lewat router gagal: {messages}")
+            if router.login(gen_username(k), "salah123")[0]:
+                errors.append("password salah diterima")
+            router.topup(gen_username(k), 10 ** 6)
+            trxs, error = router.purchase(gen_username(k), {'items': [{'product_id': 'P-0001', 'qty': 2}],
+                                                            'uid_game': '80012345', 'method': 'saldo'})
+            home = shard.shard_of(Lunite.format_id('U', k), shards)
+            if not trxs:
+                errors.append(f"pembelian lewat router gagal: {error}")
+            elif Lunite.parse_id_number(trxs[0]['id']) % shards != home:
+                errors.append("ID transaksi tidak mengikuti selang shard")
+            history, _ = router.history(gen_username(k), limit=1)
+            if not trxs or not history or history[0]['id'] != trxs[0]['id']:
+                errors.append("riwayat tidak menampilkan pembelian terbaru")
+            new, error = router.register("pendatangbaru", "baru12345")
+            if not new or router.login("pendatangbaru", "baru12345")[0] is None:
+                errors.append(f"registrasi lewat router gagal: {error}")
+            if router.register("pendatangbaru", "baru12345")[0]:
+                errors.append("username ganda diterima")
+            # referensi pembayaran yang sama dari shard lain tetap ditolak
+            other = next((i for i in range(1, users_count + 1)
+                          if shard.shard_of(Lunite.format_id('U', i), shards) != home), k + 1)
+            order = {'product_id': 'P-0001', 'uid_game': '80012345', 'method': 'bank', 'payment_ref': 'BANK-1'}
+            first, _ = router.purchase(gen_username(k), order)
+            again, _ = router.purchase(gen_username(other), order)
+            if not first or again:
+                errors.append("referensi pembayaran dipakai ulang di shard lain")
+            # referensi yang sama dari dua shard sekaligus: hanya satu yang berhasil
+            race = dict(order, payment_ref='BANK-2')
+            with ThreadPoolExecutor(2) as pool:
+                won = [trxs for trxs, _ in pool.map(lambda name: router.purchase(name, race),
+                                                    [gen_username(k), gen_username(other)]) if trxs]
+            if len(won) != 1:
+                errors.append(f"referensi yang sama diterima {len(won)} kali secara bersamaan")
+            # ubah nama produk tidak membagi ulang jatah stok tiap shard
+            shares = [p['stock'] for s in router.fan_out(shard._node_products) for p in s if p['id'] == 'P-0001']
+            renamed = router.update_product('P-0001', name='60 Lunite Baru')
+            after = [p['stock'] for s in router.fan_out(shard._node_products) for p in s if p['id'] == 'P-0001']
+            if not renamed or renamed['name'] != '60 Lunite Baru' or after != shares \
+                    or renamed['stock'] != sum(shares):
+                errors.append("ubah nama produk mengubah jatah stok shard")
+            # stok yang tampil bisa dibeli dari shard mana pun: jatah [1, 0, ...] dipinjam
+            router.update_product('P-0002', stock=1)
+            remote = next(i for i in range(1, users_count + 1)
+                          if shard.shard_of(Lunite.format_id('U', i), shards) != 0)
+            router.topup(gen_username(remote), 10 ** 6)
+            small = {'product_id': 'P-0002', 'uid_game': '80012345', 'method': 'saldo'}
+            bought, error = router.purchase(gen_username(remote), small)
+            left = next(p['stock'] for p in router.products() if p['id'] == 'P-0002')
+            if not bought or left != 0 or router.purchase(gen_username(k), small)[0]:
+                errors.append(f"stok cluster tidak bisa dibeli dari shard lain: {error}")
+            # server HTTP di atas router (shard.py serve)
+            errors.extend(asyncio.run(_check_cluster_server(router, gen_username(k), gen_password(k))))
+
+            # fan-out admin: pencarian yang memindai semua riwayat (riwayat sudah dimuat)
+            recent = router.search_transactions(limit=50)
+            if [t['created_at'] for t in recent] != sorted((t['created_at'] for t in recent), reverse=True):
+                errors.append("gabungan transaksi terbaru tidak urut waktu")
+            filters = {'product_id': 'P-9999'}
+            start = time.perf_counter()
+            router.search_transactions(**filters)
+            parallel_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            for n in router.nodes:
+                n.call(shard._node_search, filters, Lunite.PAGE_SIZE)
+            sequential_ms = (time.perf_counter() - start) * 1000
+
+            # rebalance ke jumlah shard lain
+            expected = _cluster_snapshot(router)
+            router.close()
+            router = None
+            start = time.perf_counter()
+            shard.rebalance(root, shards + 1)
+            rebalance_s = time.perf_counter() - start
+            router = shard.ShardRouter(root)
+            if _cluster_snapshot(router) != expected:
+                errors.append("isi cluster setelah rebalance berbeda")
+            _check_placement(router, errors)
+            if not router.login(gen_username(k), gen_password(k))[0]:
+                errors.append("login gagal setelah rebalance")
+            trxs, _ = router.purchase(gen_username(k), {'product_id': 'P-0001', 'uid_game': '80012345',
+                                                        'method': 'saldo'})
+            ids = [t['id'] for s in router.fan_out(shard._node_search, {}, trx_count * 2) for t in s]
+            if not trxs or len(ids) != len(set(ids)):
+                errors.append("ID transaksi bentrok setelah rebalance")
+            stats = router.stats()
+        finally:
+            if router is not None:
+                router.close(compact=False)
+            Lunite.PASSWORD_HASH_COST = old_cost
+
+    print(f"Backend: {backend_name}, {users_count} user, {trx_count} transaksi, {shards} -> {shards + 1} shard")
+    print(f"init              : {init_s:8.2f} s")
+    print(f"rebalance         : {rebalance_s:8.2f} s")
+    print(f"cari (fan-out)    : {parallel_ms:8.1f} ms paralel, {sequential_ms:8.1f} ms berurutan "
+          f"({os.cpu_count()} CPU)")
+    print("user per shard    : " + ", ".join(str(s['users']) for s in stats))
+    for e in errors:
+        print("GAGAL:", e)
+    if not errors:
+        print("Isi cluster sama dengan sumber; login, beli, riwayat dan rebalance sesuai.")
+    return not errors
+
+
+async def _check_cluster_server(router, username, password):
+    api = shard.ClusterServer(router)
+    errors = []
+
+    async def call(method, target, body=None, token=None):
+        headers = {'authorization': f"Bearer {token}"} if token else {}
+        raw = json.dumps(body).encode() if body is not None else b''
+        return await api.dispatch(method, target, headers, raw)
+
+    try:
+        status, login = await call('POST', '/login', {'username': username, 'password': password})
+        token = login.get('token')
+        status, trx = await call('POST', '/purchase', {'product_id': 'P-0001', 'uid_game': '80012345',
+                                                       'method': 'saldo'}, token)
+        _, page = await call('GET', '/transactions?limit=1', token=token)
+        if status != 200 or [t['id'] for t in page.get('transactions', [])] != [trx.get('id')]:
+            errors.append(f"pembelian lewat server cluster gagal: {trx}")
+        _, products = await call('GET', '/products')
+        if {p['id'] for p in products} != {p['id'] for p in router.products()}:
+            errors.append("katalog server cluster berbeda dari router")
+    finally:
+        api.pool.shutdown()
+    return errors
+
+
+def _median_ms(cmd, cwd, env, runs, stdin=None):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, input=stdin, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def bench_startup(users_count, rows, runs):
+    # waktu start proses baru (sampai menu utama) dengan folder data besar
+    source_dir = os.path.dirname(os.path.abspath(Lunite.__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [source_dir, os.environ.get("PYTHONPATH")])))
+    # bytecode Lunite boleh di-cache seperti pemakaian biasa
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    with temp_data_dir() as tmp:
+        Lunite.save_json(Lunite.USERS_FILE, [make_user(i) for i in range(1, users_count + 1)])
+        Lunite.save_json(Lunite.TRANSACTIONS_FILE, [make_transaction(i) for i in range(1, rows + 1)])
+        data_mb = _dir_size(Lunite.DATA_DIR) / 1e6
+
+        # start pertama: migrasi skema sekali jalan (memuat seluruh riwayat)
+        start = time.perf_counter()
+        store = Lunite.open_store('json')
+        migrate_s = time.perf_counter() - start
+        store.close(compact=False)
+        schema = Lunite.load_json_dict(Lunite.SCHEMA_FILE).get('version')
+
+        python_ms = _median_ms([sys.executable, "-c", "pass"], tmp, env, runs)
+        # `python Lunite.py` selalu meng-compile ulang file script; `-m` memakai cache .pyc
+        script_ms = _median_ms([sys.executable, os.path.join(source_dir, "Lunite.py")],
+                               tmp, env, runs, stdin=b"3\n")
+        menu_ms = _median_ms([sys.executable, "-m", "Lunite"], tmp, env, runs, stdin=b"3\n")
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=tmp, env=env,
+                             capture_output=True, check=True, text=True).stdout
+        import_ms, open_ms, history_ms, loaded = out.split()
+        loaded_ui = subprocess.run(
+            [sys.executable, "-c", "import sys, Lunite; print(sorted({'prettytable', 'pwinput'} & set(sys.modules)))"],
+            cwd=tmp, env=env, capture_output=True, check=True, text=True).stdout.strip()
+
+    print(f"User: {users_count}, transaksi: {rows}, folder data {data_mb:.1f} MB")
+    print(f"migrasi skema     : {migrate_s:9.2f} s (sekali, sampai versi {schema})")
+    print(f"python -c pass    : {python_ms:9.1f} ms")
+    print(f"python Lunite.py  : {script_ms:9.1f} ms (termasuk compile script)")
+    print(f"python -m Lunite  : {menu_ms:9.1f} ms (median {runs} kali, sampai menu lalu keluar)")
+    print(f"  import Lunite   : {float(import_ms):9.1f} ms")
+    print(f"  open_store      : {float(open_ms):9.1f} ms")
+    print(f"riwayat pertama   : {float(history_ms):9.1f} ms ({loaded} transaksi, dimuat saat dibutuhkan)")
+    print(f"library UI ter-import saat start: {loaded_ui}")
+    ok = menu_ms < STARTUP_TARGET_MS and schema == Lunite.SCHEMA_VERSION and int(loaded) == rows
+    print(f"start < {STARTUP_TARGET_MS} ms: {menu_ms < STARTUP_TARGET_MS}")
+    return ok
+
+
+def bench_journal(rows, purchases):
+    # bandingkan biaya simpan per pembelian: tulis ulang snapshot vs append journal
+    with temp_data_dir():
+        path = Lunite.TRANSACTIONS_FILE
+        history = [make_transaction(i) for i in range(1, rows + 1)]
+        Lunite.save_json(path, history)
+
+        start = time.perf_counter()
+        for n in range(purchases):
+            history.append(make_transaction(rows + n + 1))
+            Lunite.save_json(path, history)
+        full_ms = (time.perf_counter() - start) * 1000 / purchases
+
+        start = time.perf_counter()
+        for n in range(purchases):
+            Lunite.append_journal(path, make_transaction(rows + purchases + n + 1))
+        journal_ms = (time.perf_counter() - start) * 1000 / purchases
+
+        start = time.perf_counter()
+        loaded = Lunite.load_json(path)
+        replay_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        Lunite.compact_journal(path, force=True)
+        compact_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Riwayat: {rows} transaksi, {purchases} pembelian diukur")
+    print(f"save_json penuh   : {full_ms:10.3f} ms / pembelian")
+    print(f"append_journal    : {journal_ms:10.3f} ms / pembelian")
+    print(f"load + replay     : {replay_ms:10.3f} ms ({len(loaded)} transaksi)")
+    print(f"compact journal   : {compact_ms:10.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Lunite.py")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("journal", help="save_json penuh vs append journal")
+    p.add_argument("--rows", type=int, default=1000000)
+    p.add_argument("--purchases", type=int, default=5)
+
+    p = sub.add_parser("index", help="scan linear vs index Store")
+    p.add_argument("--users", type=int, default=500000)
+    p.add_argument("--lookups", type=int, default=20)
+
+    p = sub.add_parser("ids", help="next_id probe vs alloc_id")
+    p.add_argument("--existing", type=int, default=100000)
+    p.add_argument("--allocations", type=int, default=5)
+    p.add_argument("--probe-limit", type=int, default=5000)
+
+    p = sub.add_parser("sqlite", help="throughput pembelian backend SQLite")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--purchases", type=int, default=5000)
+
+    p = sub.add_parser("stress", help="uji konsistensi beberapa proses pembeli")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--buys", type=int, default=50)
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+
+    p = sub.add_parser("batch", help="throughput order massal (run_batch)")
+    p.add_argument("--orders", type=int, default=100000)
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--batch-size", type=int, default=Lunite.BATCH_SIZE)
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+
+    p = sub.add_parser("quote", help="quote() skalar vs quote_batch + cek kesamaan")
+    p.add_argument("--rows", type=int, default=1000000)
+    p.add_argument("--samples", type=int, default=100000)
+    p.add_argument("--seed", type=int, default=1)
+
+    p = sub.add_parser("loadtest", help="uji beban server.py (p50/p99, request/detik)")
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=None,
+                   help="server yang sudah berjalan (akun user1..userN, password rahasia123)")
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+
+    p = sub.add_parser("hash", help="login per detik untuk beberapa cost scrypt")
+    p.add_argument("--costs", type=int, nargs="+", default=[10, 12, 14, 15])
+    p.add_argument("--logins", type=int, default=20)
+    p.add_argument("--workers", type=int, default=None)
+
+    p = sub.add_parser("vip", help="sweep VIP kadaluarsa (heap) vs cek semua user")
+    p.add_argument("--users", type=int, default=1000000)
+    p.add_argument("--expired", type=int, default=1000)
+
+    p = sub.add_parser("laporan", help="laporan dari rollup vs agregasi ulang + rebuild")
+    p.add_argument("--rows", type=int, default=1000000)
+
+    p = sub.add_parser("pager", help="halaman lewat generator vs list penuh")
+    p.add_argument("--rows", type=int, default=1000000)
+    p.add_argument("--page-size", type=int, default=Lunite.PAGE_SIZE)
+
+    p = sub.add_parser("riwayat", help="halaman riwayat user dari backend tanpa memuat semua transaksi")
+    p.add_argument("--rows", type=int, default=200000)
+    p.add_argument("--page-size", type=int, default=Lunite.PAGE_SIZE)
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+
+    p = sub.add_parser("arsip", help="ukuran memori/disk arsip kolom vs JSON")
+    p.add_argument("--rows", type=int, default=1000000)
+
+    p = sub.add_parser("model", help="memori user dict vs User (__slots__)")
+    p.add_argument("--users", type=int, default=1000000)
+
+    p = sub.add_parser("catalog", help="tabel produk: render ulang vs cache katalog")
+    p.add_argument("--products", type=int, default=10000)
+    p.add_argument("--views", type=int, default=20)
+
+    p = sub.add_parser("metrics", help="overhead metrik nonaktif vs aktif + cek dump Prometheus")
+    p.add_argument("--lookups", type=int, default=1000000)
+    p.add_argument("--writes", type=int, default=200)
+
+    p = sub.add_parser("payment", help="dedup referensi pembayaran + gateway simulasi")
+    p.add_argument("--refs", type=int, default=1000000)
+    p.add_argument("--lookups", type=int, default=1000000)
+    p.add_argument("--orders", type=int, default=500)
+
+    p = sub.add_parser("cart", help="checkout keranjang (satu commit) vs beli satu per satu")
+    p.add_argument("--carts", type=int, default=2000)
+    p.add_argument("--lines", type=int, default=3)
+    p.add_argument("--qty", type=int, default=2)
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+
+    p = sub.add_parser("voucher", help="terbit/cari voucher pada penyimpanan voucher besar")
+    p.add_argument("--vouchers", type=int, default=1000000)
+    p.add_argument("--users", type=int, default=100000)
+    p.add_argument("--ops", type=int, default=1000)
+
+    p = sub.add_parser("limiter", help="banjir login gagal: pembatas di memori tanpa tulis disk")
+    p.add_argument("--attempts", type=int, default=1000000)
+    p.add_argument("--users", type=int, default=10000)
+    p.add_argument("--rate", type=int, default=100000)
+
+    p = sub.add_parser("generate", help="tulis folder data sintetis (1rb - 10jt baris)")
+    p.add_argument("--out", required=True, help="folder tujuan (data/ dibuat di dalamnya)")
+    p.add_argument("--users", type=int, default=10000)
+    p.add_argument("--products", type=int, default=50)
+    p.add_argument("--transactions", type=int, default=100000)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--hash-cost", type=int, default=None,
+                   help="cost scrypt password sintetis (bawaan: PASSWORD_HASH_COST)")
+
+    p = sub.add_parser("suite", help="skenario menu (registrasi, login, beli, top up, riwayat, admin)")
+    p.add_argument("--data", help="folder hasil generate (tanpa ini: dibuat sementara)")
+    p.add_argument("--users", type=int, default=10000)
+    p.add_argument("--products", type=int, default=50)
+    p.add_argument("--transactions", type=int, default=100000)
+    p.add_argument("--hash-cost", type=int, default=None)
+    p.add_argument("--ops", type=int, default=50, help="op per skenario")
+    p.add_argument("--scenarios", default=",".join(SUITE_SCENARIOS))
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--save", help="simpan hasil sebagai baseline JSON")
+    p.add_argument("--compare", help="bandingkan dengan baseline JSON")
+    p.add_argument("--tolerance", type=float, default=20,
+                   help="kenaikan p50 (persen) yang dianggap regresi")
+
+    p = sub.add_parser("shard", help="cluster shard lokal: init, router, fan-out admin, rebalance")
+    p.add_argument("--users", type=int, default=20000)
+    p.add_argument("--transactions", type=int, default=200000)
+    p.add_argument("--shards", type=int, default=4)
+    p.add_argument("--backend", choices=["json", "sqlite"], default="json")
+
+    p = sub.add_parser("startup", help="waktu start dengan folder data besar")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--rows", type=int, default=500000)
+    p.add_argument("--runs", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.cmd == "journal":
+        bench_journal(args.rows, args.purchases)
+    elif args.cmd == "index":
+        bench_index(args.users, args.lookups)
+    elif args.cmd == "ids":
+        bench_ids(args.existing, args.allocations, args.probe_limit)
+    elif args.cmd == "sqlite":
+        bench_sqlite(args.users, args.purchases)
+    elif args.cmd == "batch":
+        bench_batch(args.orders, args.users, args.batch_size, args.backend)
+    elif args.cmd == "quote":
+        if not check_quote_batch(args.samples, args.seed):
+            raise SystemExit(1)
+        bench_quote(args.rows)
+    elif args.cmd == "loadtest":
+        loadtest(args.clients, args.requests, args.port, args.host, args.backend)
+    elif args.cmd == "hash":
+        bench_hash(args.costs, args.logins, args.workers)
+    elif args.cmd == "vip":
+        bench_vip(args.users, args.expired)
+    elif args.cmd == "laporan":
+        if not bench_laporan(args.rows):
+            raise SystemExit(1)
+    elif args.cmd == "pager":
+        if not bench_pager(args.rows, args.page_size):
+            raise SystemExit(1)
+    elif args.cmd == "riwayat":
+        if not bench_history(args.rows, args.page_size, args.backend):
+            raise SystemExit(1)
+    elif args.cmd == "arsip":
+        if not bench_arsip(args.rows):
+            raise SystemExit(1)
+    elif args.cmd == "model":
+        if not bench_model(args.users):
+            raise SystemExit(1)
+    elif args.cmd == "catalog":
+        if not bench_catalog(args.products, args.views):
+            raise SystemExit(1)
+    elif args.cmd == "metrics":
+        if not bench_metrics(args.lookups, args.writes):
+            raise SystemExit(1)
+    elif args.cmd == "payment":
+        if not bench_payment(args.refs, args.lookups, args.orders):
+            raise SystemExit(1)
+    elif args.cmd == "cart":
+        if not bench_cart(args.carts, args.lines, args.qty, args.backend):
+            raise SystemExit(1)
+    elif args.cmd == "voucher":
+        if not bench_voucher(args.vouchers, args.users, args.ops):
+            raise SystemExit(1)
+    elif args.cmd == "limiter":
+        if not bench_limiter(args.attempts, args.users, args.rate):
+            raise SystemExit(1)
+    elif args.cmd == "generate":
+        meta = generate_data(args.out, args.users, args.products, args.transactions, args.seed,
+                             args.hash_cost)
+        print(f"{meta['users']} user ({meta['vip']} VIP), {meta['products']} produk, "
+              f"{meta['transactions']} transaksi, {meta['vouchers']} voucher -> "
+              f"{os.path.join(args.out, Lunite.DATA_DIR)} dalam {meta['seconds']} s")
+    elif args.cmd == "suite":
+        scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+        unknown = set(scenarios) - set(SUITE_SCENARIOS)
+        if unknown:
+            parser.error(f"skenario tidak dikenal: {', '.join(sorted(unknown))}")
+        data = args.data
+        if not data:
+            data = tempfile.mkdtemp(prefix="lunite-data-")
+            generate_data(data, args.users, args.products, args.transactions, args.seed, args.hash_cost)
+        try:
+            result = run_suite(data, args.ops, scenarios, args.backend, args.seed)
+        finally:
+            if not args.data:
+                shutil.rmtree(data, ignore_errors=True)
+        baseline = None
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        ok = print_suite(result, baseline, args.tolerance)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print("Baseline disimpan ke", args.save)
+        if not ok:
+            raise SystemExit(1)
+    elif args.cmd == "shard":
+        if not bench_shard(args.users, args.transactions, args.shards, args.backend):
+            raise SystemExit(1)
+    elif args.cmd == "startup":
+        if not bench_startup(args.users, args.rows, args.runs):
+            raise SystemExit(1)
+    elif args.cmd == "stress":
+        if not stress(args.workers, args.buys, args.backend):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
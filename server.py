@@ -0,0 +1,403 @@
+# Server HTTP/JSON berbasis asyncio (tanpa library tambahan) di atas Store Lunite.py
+# Jalankan: python server.py --port 8080
+#
+# Endpoint:
+#   POST /login         {"username", "password"} -> {"token", ...}
+#   GET  /products?type=topup
+#   POST /quote         {"product_id", "qty", "voucher"}     (butuh token)
+#   POST /purchase      {"product_id", "qty", "uid_game", "method", "voucher", "payment_ref"}
+#                       Gopay/Bank tanpa payment_ref -> {"status": "pending", "payment_ref"}
+#                       lewat gateway simulasi; hasilnya dicek di GET /payment
+#                       Keranjang: "items": [{"product_id", "qty"}] menggantikan product_id/qty
+#                       -> {"invoice", "total", "transactions"}
+#   GET  /payment?ref=...  -> {"status": "pending"|"ok"|"gagal", "transactions", "error"}
+#   POST /topup         {"amount"}
+#   GET  /transactions?limit=20&cursor=...  -> {"transactions", "next_cursor"}
+# Token dikirim lewat header "Authorization: Bearer <token>".
+#
+# Semua perubahan data dijalankan berurutan oleh satu writer task (di satu
+# thread terpisah), sehingga request baca tetap dilayani dari memori tanpa
+# menunggu tulis ke disk. Store juga dibuka di thread writer itu, sehingga
+# backend SQLite (koneksi terikat thread) dapat dipakai. Verifikasi hash password (scrypt) berjalan di
+# process pool agar login tidak menahan sesi lain.
+
+import argparse
+import asyncio
+import json
+import secrets
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import Lunite
+
+WRITE_BATCH = 256
+MAX_PAGE_SIZE = 500
+# key header internal berisi alamat klien (nama header HTTP tidak bisa diawali ':')
+CLIENT_KEY = ':client'
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized",
+               404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+               423: "Locked", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ApiServer:
+    def __init__(self, hash_workers=None):
+        self.sessions = {}
+        self.queue = None
+        self.loop = None
+        self.settle_tasks = set()
+        self.writer_pool = ThreadPoolExecutor(max_workers=1)
+        self.hash_pool = ProcessPoolExecutor(max_workers=hash_workers)
+        # koneksi SQLite terikat ke thread pembuatnya: store dibuka (dan ditutup,
+        # lihat close) di thread writer, tempat semua akses backend berjalan
+        self.store = self.writer_pool.submit(Lunite.open_store).result()
+
+    def close(self):
+        self.writer_pool.submit(self.store.close).result()
+        self.writer_pool.shutdown()
+
+    # writer tunggal: request tulis yang mengantre dijalankan bersama dalam
+    # satu Store.batch(), sehingga satu persist melayani banyak request.
+    # ApiError dari handler dilempar sebelum data diubah, jadi job lain dalam
+    # batch tetap disimpan; error lain membatalkan batch dan tiap job diulang
+    # dalam batch sendiri (lihat _run_jobs)
+    async def run_writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self.queue.get()]
+            while not self.queue.empty() and len(jobs) < WRITE_BATCH:
+                jobs.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self.writer_pool, self._run_jobs, jobs)
+            except Exception as e:
+                results = [(False, e)] * len(jobs)
+            for (_, _, fut, _), (ok, value) in zip(jobs, results):
+                if fut.cancelled():
+                    continue
+                if ok:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(value)
+
+    def _run_jobs(self, jobs):
+        results = {}
+        grouped = [job for job in jobs if job[3]]
+        if len(grouped) > 1:
+            try:
+                with self.store.batch():
+                    for job in grouped:
+                        try:
+                            results[id(job)] = (True, job[0](*job[1]))
+                        except ApiError as e:
+                            results[id(job)] = (False, e)
+            except Exception:
+                # perubahan job yang gagal di tengah jalan tidak bisa dipisahkan
+                # dari job lain: Store.batch sudah me-refresh (membuang semuanya),
+                # jadi tiap job diulang dengan batch masing-masing di bawah
+                results = {}
+        for job in jobs:
+            if id(job) not in results:
+                results[id(job)] = self._run_alone(job)
+        return [results[id(job)] for job in jobs]
+
+    def _run_alone(self, job):
+        fn, args = job[0], job[1]
+        try:
+            with self.store.batch():
+                return True, fn(*args)
+        except Exception as e:
+            return False, e
+
+    async def run_vip_sweeper(self):
+        # sweep periodik VIP kadaluarsa lewat writer (hanya user yang sudah lewat)
+        while True:
+            await self.write(Lunite.sweep_expired_vips, self.store)
+            await asyncio.sleep(Lunite.VIP_SWEEP_SECS)
+
+    async def write(self, fn, *args, group=True):
+        # group=False untuk job yang tidak boleh diulang (efek di luar Store,
+        # mis. gateway pembayaran): selalu dijalankan dalam batch sendiri
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((fn, args, fut, group))
+        return await fut
+
+    # endpoint
+    def current_user(self, headers):
+        auth = headers.get('authorization', '')
+        token = auth[7:] if auth.startswith('Bearer ') else ''
+        username = self.sessions.get(token)
+        user = self.store.user_by_username(username) if username else None
+        if not user:
+            raise ApiError(401, "Token tidak valid. Silakan login.")
+        return user
+
+    def _login(self, user, password, checked, client=None):
+        ok, messages = Lunite.authenticate(self.store, user, password, checked, client)
+        if not ok:
+            raise ApiError(401, ' '.join(messages))
+        token = secrets.token_hex(16)
+        self.sessions[token] = user['username']
+        return {'token': token, 'username': user['username'], 'role': user.get('role')}
+
+    async def login(self, headers, body):
+        limiter = self.store.limiter
+        client = headers.get(CLIENT_KEY)
+        wait = limiter.client_wait(client)
+        if wait:
+            raise ApiError(429, f"Terlalu banyak percobaan login. Coba lagi dalam {wait} detik.")
+        username = str(body.get('username') or '').strip()
+        password = str(body.get('password') or '').strip()
+        user = self.store.user_by_username(username)
+        if not user:
+            raise ApiError(404, "User tidak ditemukan.")
+        rem = limiter.locked_seconds(username)
+        if rem:
+            raise ApiError(423, f"Akun terkunci sementara. Coba lagi dalam {rem} detik.")
+        stored = user.get('password')
+        if Lunite.cached_verify(password, stored) and not Lunite.password_needs_upgrade(stored):
+            checked = (True, None)
+        else:
+            loop = asyncio.get_running_loop()
+            checked = await loop.run_in_executor(self.hash_pool, Lunite.check_password, password, stored)
+        if not checked[0]:
+            # password salah tidak mengubah data: cukup dicatat di limiter, tanpa writer
+            self._login(user, password, checked, client)
+        return await self.write(self._login, user, password, checked)
+
+    async def products(self, headers, body):
+        # harga VIP dan baris dict diambil dari cache katalog (lihat Lunite.Catalog)
+        return self.store.catalog.items(body.get('type') or None)
+
+    async def quote(self, headers, body):
+        user = self.current_user(headers)
+        try:
+            items = Lunite.order_items(body)
+        except (AttributeError, TypeError, ValueError):
+            raise ApiError(400, "Jumlah tidak valid.")
+        lines = []
+        for pid, qty in items:
+            product = self.store.product(pid)
+            if not product:
+                raise ApiError(404, "Produk tidak ditemukan.")
+            if qty <= 0:
+                raise ApiError(400, "Jumlah tidak valid.")
+            lines.append((product, qty))
+        voucher = None
+        voucher_id = str(body.get('voucher') or '').strip()
+        if voucher_id:
+            voucher = self.store.usable_voucher(voucher_id, user['username'])
+            if not voucher:
+                raise ApiError(400, "Voucher sudah tidak berlaku.")
+        if 'items' in body:
+            return Lunite.quote_cart(user, lines, voucher)
+        product, qty = lines[0]
+        return Lunite.quote(user, product, voucher, qty)
+
+    def _purchase(self, user, body):
+        order = dict(body, username=user['username'])
+        trxs, error = Lunite.process_order(self.store, order)
+        if not trxs:
+            raise ApiError(409, error)
+        return self.order_result(body, trxs)
+
+    @staticmethod
+    def order_result(body, trxs):
+        if 'items' not in body:
+            return trxs[0]
+        # keranjang: satu invoice untuk semua baris
+        return {'invoice': trxs[0]['id'], 'total': sum(trx['total'] for trx in trxs),
+                'transactions': trxs}
+
+    async def purchase(self, headers, body):
+        user = self.current_user(headers)
+        method = Lunite.PAYMENT_METHODS.get(str(body.get('method') or '').strip().lower())
+        if method and method != 'Saldo' and not str(body.get('payment_ref') or '').strip():
+            # konfirmasi gateway diselesaikan oleh writer (lihat notify_payment)
+            order = dict(body, username=user['username'])
+            ref = await self.write(self.store.payments.start, order, group=False)
+            return {'status': 'pending', 'payment_ref': ref}
+        return await self.write(self._purchase, user, body)
+
+    async def payment(self, headers, body):
+        user = self.current_user(headers)
+        ref = str(body.get('ref') or '').strip()
+        status, username, trxs, error = self.store.payments.status(ref)
+        if status is None or username != user['username']:
+            raise ApiError(404, "Referensi pembayaran tidak ditemukan.")
+        return {'status': status, 'transactions': trxs, 'error': error}
+
+    def notify_payment(self):
+        # dipanggil dari thread gateway: penyelesaian pesanan diantrekan ke writer
+        self.loop.call_soon_threadsafe(self._settle_payments)
+
+    def _settle_payments(self):
+        task = asyncio.create_task(self.write(self.store.payments.settle, group=False))
+        self.settle_tasks.add(task)
+        task.add_done_callback(self.settle_tasks.discard)
+
+    def _topup(self, user, amount):
+        return {'balance': Lunite.add_balance(self.store, user, amount)}
+
+    async def topup(self, headers, body):
+        user = self.current_user(headers)
+        try:
+            amount = int(body.get('amount'))
+        except (TypeError, ValueError):
+            raise ApiError(400, "Masukkan angka yang valid")
+        if amount <= 0:
+            raise ApiError(400, "Nominal harus > 0")
+        return await self.write(self._topup, user, amount)
+
+    async def transactions(self, headers, body):
+        # satu halaman terbaru dulu; next_cursor dikirim lagi untuk halaman berikutnya
+        user = self.current_user(headers)
+        limit, cursor = self.page_args(body)
+        # halaman dibaca dari backend (tanpa memuat seluruh riwayat) di thread
+        # writer, di antara batch tulis, tempat koneksi SQLite dibuat
+        records, next_cursor = await asyncio.get_running_loop().run_in_executor(
+            self.writer_pool, self._history_page, user.get('id'), limit, cursor)
+        return {'transactions': records, 'next_cursor': next_cursor}
+
+    def _history_page(self, user_id, limit, cursor):
+        return Lunite.fetch_page(Lunite.query_transactions(self.store, user_id=user_id, start=cursor), limit)
+
+    @staticmethod
+    def page_args(body):
+        try:
+            limit = min(int(body.get('limit') or Lunite.PAGE_SIZE), MAX_PAGE_SIZE)
+            cursor = body.get('cursor')
+            cursor = int(cursor) if cursor not in (None, '') else None
+        except (TypeError, ValueError):
+            raise ApiError(400, "limit/cursor harus angka")
+        if limit <= 0:
+            raise ApiError(400, "limit harus > 0")
+        return limit, cursor
+
+    # HTTP
+    ROUTES = {
+        ('POST', '/login'): 'login',
+        ('GET', '/products'): 'products',
+        ('POST', '/quote'): 'quote',
+        ('POST', '/purchase'): 'purchase',
+        ('POST', '/topup'): 'topup',
+        ('GET', '/transactions'): 'transactions',
+        ('GET', '/payment'): 'payment',
+    }
+
+    async def dispatch(self, method, target, headers, raw_body):
+        url = urlsplit(target)
+        path = url.path
+        name = self.ROUTES.get((method, path))
+        if not name:
+            if any(p == path for _, p in self.ROUTES):
+                return 405, {'error': "Method tidak didukung."}
+            return 404, {'error': "Endpoint tidak ditemukan."}
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+            if not isinstance(body, dict):
+                raise ValueError("body harus object JSON")
+            # parameter query string (mis. GET /transactions?limit=50)
+            for key, value in parse_qsl(url.query):
+                body.setdefault(key, value)
+        except ValueError as e:
+            return 400, {'error': f"JSON tidak valid: {e}"}
+        try:
+            return 200, await getattr(self, name)(headers, body)
+        except ApiError as e:
+            return e.status, {'error': e.message}
+        except Exception as e:
+            # error tak terduga tetap dijawab agar klien tidak menunggu sampai timeout
+            print(f"Error {method} {path}: {e!r}", file=sys.stderr, flush=True)
+            return 500, {'error': "Terjadi kesalahan pada server."}
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = h.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                headers[CLIENT_KEY] = peer[0] if peer else None
+                length = int(headers.get('content-length', 0))
+                raw_body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.dispatch(method, target, headers, raw_body)
+                data = Lunite.JSON_ENCODER.encode(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # koneksi yang masih terbuka saat server berhenti
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.queue = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        self.store.payments.on_notify = self.notify_payment
+        writer_task = asyncio.create_task(self.run_writer())
+        sweeper_task = asyncio.create_task(self.run_vip_sweeper())
+        try:
+            # SIGTERM menghentikan server dengan rapi agar process pool ikut dimatikan
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Server Lunite berjalan di http://{host}:{port}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.store.payments.on_notify = None
+            sweeper_task.cancel()
+            writer_task.cancel()
+            self.hash_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server HTTP/JSON Lunite")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--hash-workers", type=int, default=None,
+                        help="jumlah proses untuk verifikasi password (bawaan: jumlah CPU)")
+    args = parser.parse_args()
+
+    Lunite.ensure_data_dir()
+    if Lunite.METRICS_ENABLED:
+        Lunite.enable_metrics()
+    server = ApiServer(args.hash_workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("Server berhenti.")
+    finally:
+        server.close()
+        if Lunite.METRICS is not None:
+            print("Metrik disimpan ke", Lunite.METRICS.dump())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,837 @@
+# Sharding data Lunite: user beserta transaksi dan vouchernya dibagi ke N folder
+# shard berdasarkan hash ID user; katalog produk direplikasi ke semua shard.
+# Jalankan:
+#   python shard.py init ROOT --shards 4 [--dari .]   -> bagi folder data/ yang ada ke 4 shard
+#   python shard.py rebalance ROOT --shards 8         -> pindahkan user ke jumlah shard baru
+#   python shard.py status ROOT                       -> user/transaksi/pendapatan per shard
+#   python shard.py laporan ROOT [--days 7]           -> laporan penjualan gabungan
+#   python shard.py serve ROOT --port 8080            -> server HTTP (server.py) lewat router
+#
+# Isi ROOT:
+#   cluster.json      {"shards": N, "backend": "json"}
+#   direktori.jsonl   username -> ID user (append-only), dipakai router untuk login
+#   counter.json      counter ID global untuk user (U) dan produk (P)
+#   shard-00/data/... folder data biasa (format Lunite.py), satu per shard
+#
+# Tiap shard dilayani satu proses (node) dengan cwd di folder shard, sehingga path
+# relatif Lunite.py (data/...) tetap berlaku dan folder shard bisa dipindah ke
+# mesin lain. Operasi per user berjalan berurutan di node pemiliknya; tampilan
+# admin dikirim ke semua node sekaligus lalu hasilnya digabung.
+#
+# Stok produk dibagi rata ke semua shard: pembeli memakai jatah stok shardnya
+# sendiri dan, jika jatah itu kurang, meminjam sisa stok shard lain (lihat
+# ShardRouter._borrow_stock), sehingga stok yang tampil selalu bisa dibeli.
+# Rebalance membagi ulang sisa stok. ID transaksi dan voucher berselang
+# per shard (Store.id_stride) sehingga tetap unik di seluruh cluster. Referensi
+# Gopay/Bank dicek di semua shard di bawah satu lock (.lock-referensi).
+# Folder shard jangan dibuka langsung dengan Lunite.py: perubahan katalog dan
+# registrasi harus lewat router agar replika dan direktori tetap sama.
+
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import secrets
+import shutil
+import signal
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+import Lunite
+import server
+
+CLUSTER_FILE = "cluster.json"
+DIRECTORY_FILE = "direktori.jsonl"
+COUNTER_FILE = "counter.json"
+LOCK_FILE = ".lock"
+REF_LOCK_FILE = ".lock-referensi"
+STAGING_DIR = ".baru"
+REBALANCE_BATCH = 10000
+STOCK_RETRIES = 3
+
+
+def shard_of(user_id, shards):
+    # crc32, bukan hash(): hasilnya harus sama di semua proses dan setelah restart
+    return zlib.crc32(user_id.encode()) % shards
+
+
+def shard_key(user_id, username):
+    # akun lama tanpa ID (mis. admin bawaan) dibagi berdasarkan username
+    return user_id or username
+
+
+def shard_dir(root, index):
+    return os.path.join(root, f"shard-{index:02d}")
+
+
+def split_stock(stock, shards):
+    # jatah stok per shard; sisa pembagian diberikan ke shard awal
+    base, extra = divmod(stock, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def merge_rollups(rollups):
+    # rollup laporan beberapa shard -> satu rollup (semua isinya penjumlahan)
+    merged = Lunite.new_rollup()
+    for rollup in rollups:
+        _add_counts(merged, rollup)
+    return merged
+
+
+def _add_counts(into, other):
+    for key, value in other.items():
+        if isinstance(value, dict):
+            _add_counts(into.setdefault(key, {}), value)
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+@contextmanager
+def root_locked(root, name=LOCK_FILE):
+    # lock antar-proses untuk direktori user, counter global dan katalog
+    # (REF_LOCK_FILE: cek referensi pembayaran, lihat ShardRouter.purchase)
+    with open(os.path.join(root, name), "a+") as f:
+        Lunite._lock_file(f)
+        try:
+            yield
+        finally:
+            Lunite._unlock_file(f)
+
+
+def _public(user):
+    data = user.to_dict()
+    data.pop('password', None)
+    return data
+
+
+# Sisi node: fungsi-fungsi di bawah dijalankan di proses shard (cwd = folder shard)
+_store = None
+
+
+def _node_open(path, backend_name, index, count):
+    global _store
+    os.chdir(path)
+    Lunite.ensure_data_dir()
+    _store = Lunite.open_store(backend_name)
+    _store.id_stride, _store.id_offset = count, index
+
+
+def _node_close(compact):
+    _store.close(compact)
+
+
+def _node_user(username):
+    # (hash password, sisa detik terkunci); hash None jika user tidak ada
+    user = _store.user_by_username(username)
+    if not user:
+        return None, 0
+    return user.password, _store.limiter.locked_seconds(username)
+
+
+def _node_authenticate(username, password, checked, client):
+    user = _store.user_by_username(username)
+    if not user:
+        return None, ["User tidak ditemukan."]
+    ok, messages = Lunite.authenticate(_store, user, password, checked, client)
+    return (_public(user) if ok else None), messages
+
+
+def _node_register(user_id, username, password_hash):
+    with _store.locked():
+        if _store.user_by_username(username):
+            return None, "Username sudah digunakan."
+        user = Lunite.User(id=user_id, username=username, password=password_hash, role='member')
+        _store.add_user(user)
+        _store.commit(users=[user])
+    return _public(user), None
+
+
+def _node_purchase(order):
+    trxs, error = Lunite.process_order(_store, order)
+    return ([t.to_dict() for t in trxs] if trxs else None), error
+
+
+def _node_topup(username, amount):
+    user = _store.user_by_username(username)
+    if not user:
+        return None
+    return Lunite.add_balance(_store, user, amount)
+
+
+def _node_history(user_id, limit, cursor):
+    records, next_cursor = Lunite.fetch_page(
+        Lunite.query_transactions(_store, user_id=user_id, start=cursor), limit)
+    return [t.to_dict() for t in records], next_cursor
+
+
+def _node_search(filters, limit):
+    # transaksi terbaru yang cocok dengan filter (lihat Lunite.query_transactions)
+    records, _ = Lunite.fetch_page(Lunite.query_transactions(_store, **filters), limit)
+    return [t.to_dict() for t in records]
+
+
+def _node_payment_ref(method, ref):
+    return _store.payment_ref_owner(method, ref)
+
+
+def _node_products():
+    return [p.to_dict() for p in _store.products]
+
+
+def _node_put_products(products):
+    # tambah/ubah produk replika; stok yang dikirim adalah jatah shard ini
+    with _store.locked():
+        changed = []
+        for data in products:
+            p = _store.product(data['id'])
+            if p is None:
+                p = Lunite.Product.from_dict(data)
+                _store.add_product(p)
+            else:
+                for key, value in data.items():
+                    p[key] = value
+            changed.append(p)
+        _store.commit(products=changed)
+
+
+def _node_update_product(pid, fields):
+    # ubah field katalog selain stok; jatah stok shard ini tidak disentuh
+    with _store.locked():
+        p = _store.product(pid)
+        if p is None:
+            return None
+        for key, value in fields.items():
+            p[key] = value
+        _store.commit(products=[p])
+    return p.to_dict()
+
+
+def _node_stock_shortfall(items):
+    # {product_id: kekurangan} untuk item yang jatah stok shard ini tidak cukup
+    wanted = {}
+    for pid, qty in items:
+        wanted[pid] = wanted.get(pid, 0) + qty
+    shortfall = {}
+    for pid, qty in wanted.items():
+        p = _store.product(pid)
+        if p is not None and qty > p.stock:
+            shortfall[pid] = qty - p.stock
+    return shortfall
+
+
+def _node_take_stock(pid, qty):
+    # ambil paling banyak qty dari jatah shard ini; hasil: jumlah yang diambil
+    with _store.locked():
+        p = _store.product(pid)
+        taken = min(max(p.stock, 0), qty) if p else 0
+        if taken:
+            p.stock -= taken
+            _store.commit(products=[p])
+    return taken
+
+
+def _node_add_stock(pid, qty):
+    with _store.locked():
+        p = _store.product(pid)
+        if p:
+            p.stock += qty
+            _store.commit(products=[p])
+
+
+def _node_remove_product(pid):
+    with _store.locked():
+        p = _store.product(pid)
+        if p:
+            _store.remove_product(p)
+            _store.commit(removed_products=[p])
+    return p is not None
+
+
+def _node_users(role):
+    return [_public(u) for _, u in Lunite.query_users(_store, role)]
+
+
+def _node_rollup():
+    return _store.rollup
+
+
+def _node_stats():
+    return {'users': len(_store.users), 'transactions': _store.rollup['count'],
+            'revenue': _store.rollup['revenue'], 'vouchers': len(_store.vouchers_by_id),
+            'stock': sum(p.stock or 0 for p in _store.products)}
+
+
+def _node_export_accounts(shards):
+    # user dan voucher aktif, dikelompokkan per shard tujuan
+    groups = {}
+    for u in _store.users:
+        dest = shard_of(shard_key(u.id, u.username), shards)
+        groups.setdefault(dest, {'users': [], 'vouchers': []})['users'].append(u.to_dict())
+    for v in _store.vouchers_by_id.values():
+        owner = _store.user_by_username(v.owner)
+        dest = shard_of(shard_key(owner.id, v.owner) if owner else v.owner, shards)
+        groups.setdefault(dest, {'users': [], 'vouchers': []})['vouchers'].append(v.to_dict())
+    return {'groups': groups, 'counters': dict(_store.counters),
+            'products': [p.to_dict() for p in _store.products]}
+
+
+def _node_export_transactions(start, count):
+    # potongan riwayat (termasuk arsip) urut waktu; cursor None jika habis
+    rows = _store.transaction_rows()
+    end = min(start + count, len(rows))
+    return [rows[i].to_dict() for i in range(start, end)], (end if end < len(rows) else None)
+
+
+def _node_import(users, transactions, vouchers):
+    with _store.locked():
+        users = [Lunite.User.from_dict(u) for u in users]
+        transactions = [Lunite.Transaction.from_dict(t) for t in transactions]
+        vouchers = [Lunite.Voucher.from_dict(v) for v in vouchers]
+        for u in users:
+            _store.add_user(u)
+        for t in transactions:
+            _store.add_transaction(t)
+        for v in vouchers:
+            _store.add_voucher(v)
+        _store.commit(users=users, transactions=transactions, vouchers=vouchers)
+
+
+def _node_set_counters(counters):
+    with _store.locked():
+        _store.counters.update(counters)
+        _store._counters_dirty = True
+        _store.commit()
+
+
+# Sisi router
+class ShardNode:
+    # satu proses per shard; semua operasi untuk shard ini berjalan berurutan di sana
+    def __init__(self, path, backend_name, index=0, count=1):
+        if not os.path.isdir(path):
+            raise ValueError(f"Folder shard tidak ditemukan: {path}")
+        self.path = path
+        self.pool = ProcessPoolExecutor(max_workers=1, initializer=_node_open,
+                                        initargs=(path, backend_name, index, count))
+
+    def submit(self, fn, *args):
+        return self.pool.submit(fn, *args)
+
+    def call(self, fn, *args):
+        return self.pool.submit(fn, *args).result()
+
+    def close(self, compact=True):
+        close_nodes([self], compact)
+
+
+def close_nodes(nodes, compact=True):
+    # tutup (dan compact) semua node sekaligus
+    futures = [node.submit(_node_close, compact) for node in nodes]
+    try:
+        for f in futures:
+            f.result()
+    finally:
+        for node in nodes:
+            node.pool.shutdown()
+
+
+def load_cluster(root):
+    cluster = Lunite.load_json_dict(os.path.join(root, CLUSTER_FILE))
+    if not cluster.get('shards'):
+        raise ValueError(f"{root} bukan folder cluster (jalankan 'python shard.py init' dulu)")
+    return cluster
+
+
+class ShardRouter:
+    def __init__(self, root):
+        self.root = root
+        cluster = load_cluster(root)
+        self.shards = cluster['shards']
+        self.backend = cluster.get('backend', 'json')
+        self.nodes = [ShardNode(shard_dir(root, i), self.backend, i, self.shards)
+                      for i in range(self.shards)]
+        # username -> ID user (None untuk akun lama tanpa ID), dibaca bertahap
+        # dari direktori.jsonl
+        self.directory = {}
+        self._directory_pos = 0
+        self._directory_lock = threading.Lock()
+        self._load_directory()
+
+    def close(self, compact=True):
+        close_nodes(self.nodes, compact)
+
+    def _load_directory(self):
+        path = os.path.join(self.root, DIRECTORY_FILE)
+        with self._directory_lock:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self._directory_pos)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            # baris terakhir yang belum lengkap dibaca lagi lain kali
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                entry = json.loads(line)
+                self.directory[entry['username']] = entry['id']
+            self._directory_pos += len(complete)
+
+    def known(self, username):
+        if username not in self.directory:
+            # mungkin baru didaftarkan lewat router lain
+            self._load_directory()
+        return username in self.directory
+
+    def node_of(self, username):
+        # (node, ID user); node None jika username tidak dikenal
+        if not self.known(username):
+            return None, None
+        uid = self.directory[username]
+        return self.nodes[shard_of(shard_key(uid, username), self.shards)], uid
+
+    def fan_out(self, fn, *args):
+        # jalankan fn di semua shard sekaligus; hasil urut sesuai nomor shard
+        futures = [node.submit(fn, *args) for node in self.nodes]
+        return [f.result() for f in futures]
+
+    # akun
+    def register(self, username, password):
+        # Hasil: (user, error)
+        ok, msg = Lunite.validate_username(username)
+        if not ok:
+            return None, msg
+        ok, msg = Lunite.validate_password(password)
+        if not ok:
+            return None, msg
+        if self.known(username):
+            return None, "Username sudah digunakan."
+        # hash dihitung di luar lock karena sengaja lambat
+        password_hash = Lunite.hash_password(password)
+        with root_locked(self.root):
+            self._load_directory()
+            if username in self.directory:
+                return None, "Username sudah digunakan."
+            counter_path = os.path.join(self.root, COUNTER_FILE)
+            counters = Lunite.load_json_dict(counter_path)
+            counters['U'] = counters.get('U', 0) + 1
+            uid = Lunite.format_id('U', counters['U'])
+            Lunite.save_json_dict(counter_path, counters)
+            Lunite.append_jsonl(os.path.join(self.root, DIRECTORY_FILE),
+                                [{'username': username, 'id': uid}])
+        return self.nodes[shard_of(uid, self.shards)].call(_node_register, uid, username, password_hash)
+
+    def login(self, username, password, client=None):
+        # Hasil: (user, pesan); user None jika gagal
+        node, _ = self.node_of(username)
+        if node is None:
+            return None, ["User tidak ditemukan."]
+        stored, rem = node.call(_node_user, username)
+        if stored is None:
+            return None, ["User tidak ditemukan."]
+        if rem:
+            return None, [f"Akun terkunci sementara. Coba lagi dalam {rem} detik."]
+        # scrypt dihitung di proses pemanggil agar node shard tidak tertahan
+        checked = Lunite.check_password(password, stored)
+        return node.call(_node_authenticate, username, password, checked, client)
+
+    def topup(self, username, amount):
+        node, _ = self.node_of(username)
+        return node.call(_node_topup, username, amount) if node else None
+
+    # pembelian & riwayat
+    def purchase(self, username, order):
+        # order seperti Lunite.process_order (tanpa username). Hasil: (trxs, error)
+        node, _ = self.node_of(username)
+        if node is None:
+            return None, "User tidak ditemukan."
+        try:
+            items = Lunite.order_items(order)
+        except (AttributeError, TypeError, ValueError):
+            # jumlah tidak valid: dilaporkan oleh process_order
+            items = []
+        for _ in range(STOCK_RETRIES):
+            shortfall = node.call(_node_stock_shortfall, items)
+            moved = self._borrow_stock(node, shortfall) if shortfall else 0
+            trxs, error = self._purchase_on(node, username, order)
+            # pembeli lain di shard ini bisa menghabiskan stok pinjaman lebih dulu
+            if trxs or not moved:
+                break
+        return trxs, error
+
+    def _purchase_on(self, node, username, order):
+        method = Lunite.PAYMENT_METHODS.get(str(order.get('method') or '').strip().lower())
+        ref = str(order.get('payment_ref') or '').strip()
+        if ref and method and method != 'Saldo':
+            # referensi harus unik di seluruh cluster, padahal tiap shard hanya tahu
+            # referensinya sendiri: cek di semua shard dan pembelian dijalankan di
+            # bawah satu lock antar-proses, agar referensi yang sama tidak lolos di
+            # dua shard sekaligus
+            with root_locked(self.root, REF_LOCK_FILE):
+                for used_by in self.fan_out(_node_payment_ref, method, ref):
+                    if used_by:
+                        return None, f"Referensi {method} {ref} sudah dipakai untuk transaksi {used_by}."
+                return node.call(_node_purchase, dict(order, username=username))
+        return node.call(_node_purchase, dict(order, username=username))
+
+    def _borrow_stock(self, node, shortfall):
+        # pindahkan sisa stok shard lain ke shard pembeli di bawah lock katalog.
+        # Stok diambil dulu baru ditambahkan: jika proses mati di tengah jalan,
+        # stok berkurang (tidak pernah terjual dua kali). Hasil: jumlah yang dipindah
+        moved = 0
+        with root_locked(self.root):
+            for pid, need in shortfall.items():
+                got = 0
+                for donor in self.nodes:
+                    if donor is node or got >= need:
+                        continue
+                    got += donor.call(_node_take_stock, pid, need - got)
+                if got:
+                    node.call(_node_add_stock, pid, got)
+                    moved += got
+        return moved
+
+    def history(self, username, limit=Lunite.PAGE_SIZE, cursor=None):
+        # Hasil: (transaksi terbaru dulu, cursor halaman berikutnya)
+        node, uid = self.node_of(username)
+        if node is None or uid is None:
+            return [], None
+        return node.call(_node_history, uid, limit, cursor)
+
+    # katalog (direplikasi ke semua shard)
+    def products(self):
+        # katalog dari shard pertama, stok = jumlah jatah semua shard
+        replicas = self.fan_out(_node_products)
+        stock = {}
+        for products in replicas:
+            for p in products:
+                stock[p['id']] = stock.get(p['id'], 0) + (p.get('stock') or 0)
+        return [dict(p, stock=stock[p['id']]) for p in replicas[0]]
+
+    def add_product(self, name, price, stock, type='topup'):
+        with root_locked(self.root):
+            counter_path = os.path.join(self.root, COUNTER_FILE)
+            counters = Lunite.load_json_dict(counter_path)
+            counters['P'] = counters.get('P', 0) + 1
+            Lunite.save_json_dict(counter_path, counters)
+            product = {'id': Lunite.format_id('P', counters['P']), 'name': name, 'price': price,
+                       'stock': stock, 'type': type}
+            self._put_product(product)
+        return product
+
+    def update_product(self, pid, **fields):
+        # nama/harga/tipe disalin ke semua shard. Stok hanya dibagi ulang jika ikut
+        # diubah; jika tidak, jatah tiap shard (yang terus dikurangi pembelian) dibiarkan
+        with root_locked(self.root):
+            if 'stock' in fields:
+                current = next((p for p in self.products() if p['id'] == pid), None)
+                if current is None:
+                    return None
+                product = dict(current, **fields)
+                self._put_product(product)
+                return product
+            replicas = self.fan_out(_node_update_product, pid, fields)
+        if replicas[0] is None:
+            return None
+        return dict(replicas[0], stock=sum(p.get('stock') or 0 for p in replicas if p))
+
+    def _put_product(self, product):
+        futures = [node.submit(_node_put_products, [dict(product, stock=stock)])
+                   for node, stock in zip(self.nodes, split_stock(product['stock'], self.shards))]
+        for f in futures:
+            f.result()
+
+    def remove_product(self, pid):
+        with root_locked(self.root):
+            return any(self.fan_out(_node_remove_product, pid))
+
+    # tampilan admin (fan-out ke semua shard lalu digabung)
+    def users(self, role=None):
+        users = [u for shard in self.fan_out(_node_users, role) for u in shard]
+        users.sort(key=lambda u: Lunite.parse_id_number(u['id']))
+        return users
+
+    def sales_report(self, days=7, top=10):
+        return Lunite.sales_report(merge_rollups(self.fan_out(_node_rollup)), days, top)
+
+    def search_transactions(self, limit=Lunite.PAGE_SIZE, **filters):
+        # filter seperti Lunite.query_transactions; hasil terbaru dulu dari semua shard
+        pages = self.fan_out(_node_search, filters, limit)
+        merged = heapq.merge(*pages, key=lambda t: t.get('created_at') or '', reverse=True)
+        return list(islice(merged, limit))
+
+    def stats(self):
+        return self.fan_out(_node_stats)
+
+
+class ClusterServer(server.ApiServer):
+    # endpoint server.py di atas cluster: tidak ada Store lokal, tiap request
+    # diteruskan ke router. Pembayaran lewat gateway (tanpa payment_ref) belum
+    # didukung karena konfirmasinya harus diselesaikan di node pemilik user.
+    ROUTES = {
+        ('POST', '/login'): 'login',
+        ('GET', '/products'): 'products',
+        ('POST', '/purchase'): 'purchase',
+        ('POST', '/topup'): 'topup',
+        ('GET', '/transactions'): 'transactions',
+    }
+
+    def __init__(self, router):
+        self.sessions = {}
+        self.router = router
+        # panggilan router memblok (menunggu node atau scrypt): dijalankan di thread
+        self.pool = ThreadPoolExecutor()
+
+    def close(self):
+        self.pool.shutdown()
+        self.router.close()
+
+    async def write(self, fn, *args):
+        # urutan tulis per user sudah dijaga node pemiliknya
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def current_user(self, headers):
+        auth = headers.get('authorization', '')
+        token = auth[7:] if auth.startswith('Bearer ') else ''
+        username = self.sessions.get(token)
+        if not username:
+            raise server.ApiError(401, "Token tidak valid. Silakan login.")
+        return {'username': username, 'id': self.router.directory.get(username)}
+
+    async def login(self, headers, body):
+        username = str(body.get('username') or '').strip()
+        password = str(body.get('password') or '').strip()
+        user, messages = await self.write(self.router.login, username, password,
+                                          headers.get(server.CLIENT_KEY))
+        if not user:
+            status = 404 if messages == ["User tidak ditemukan."] else 401
+            raise server.ApiError(status, ' '.join(messages))
+        token = secrets.token_hex(16)
+        self.sessions[token] = user['username']
+        return {'token': token, 'username': user['username'], 'role': user.get('role')}
+
+    async def products(self, headers, body):
+        products = await self.write(self.router.products)
+        type = body.get('type')
+        return [p for p in products if not type or p.get('type') == type]
+
+    def _purchase(self, user, body):
+        trxs, error = self.router.purchase(user['username'], body)
+        if not trxs:
+            raise server.ApiError(409, error)
+        return self.order_result(body, trxs)
+
+    async def purchase(self, headers, body):
+        user = self.current_user(headers)
+        method = Lunite.PAYMENT_METHODS.get(str(body.get('method') or '').strip().lower())
+        if method and method != 'Saldo' and not str(body.get('payment_ref') or '').strip():
+            raise server.ApiError(400, f"payment_ref wajib untuk {method}.")
+        return await self.write(self._purchase, user, body)
+
+    def _topup(self, user, amount):
+        balance = self.router.topup(user['username'], amount)
+        if balance is None:
+            raise server.ApiError(404, "User tidak ditemukan.")
+        return {'balance': balance}
+
+    async def transactions(self, headers, body):
+        user = self.current_user(headers)
+        limit, cursor = self.page_args(body)
+        records, next_cursor = await self.write(self.router.history, user['username'], limit, cursor)
+        return {'transactions': records, 'next_cursor': next_cursor}
+
+    async def serve(self, host, port):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+        srv = await asyncio.start_server(self.handle, host, port)
+        print(f"Cluster Lunite ({self.router.shards} shard) berjalan di http://{host}:{port}", flush=True)
+        async with srv:
+            await srv.serve_forever()
+
+
+# Rebalancing
+def redistribute(sources, out, shards, backend_name='json', source_backend=None):
+    # Salin isi folder sumber (berisi data/) ke `shards` folder shard baru di out.
+    # User dan voucher dipindah per akun, transaksi di-stream urut waktu dari
+    # semua sumber sekaligus. Sumber tidak diubah.
+    # Hasil: (direktori [(username, id)], counter global)
+    src_nodes = [ShardNode(path, source_backend or backend_name) for path in sources]
+    dst_nodes = []
+    try:
+        for i in range(shards):
+            os.makedirs(shard_dir(out, i))
+            dst_nodes.append(ShardNode(shard_dir(out, i), backend_name, i, shards))
+
+        exports = [f.result() for f in [n.submit(_node_export_accounts, shards) for n in src_nodes]]
+        directory = []
+        counters = {}
+        for export in exports:
+            for prefix, value in export['counters'].items():
+                counters[prefix] = max(counters.get(prefix, 0), value)
+            futures = []
+            for dest, group in export['groups'].items():
+                directory.extend((u['username'], u['id']) for u in group['users'])
+                futures.append(dst_nodes[dest].submit(_node_import, group['users'], [], group['vouchers']))
+            for f in futures:
+                f.result()
+        for _, uid in directory:
+            counters['U'] = max(counters.get('U', 0), Lunite.parse_id_number(uid))
+
+        # transaksi: satu potongan per shard tujuan sedang dikirim, sisanya menunggu
+        buffers = [[] for _ in range(shards)]
+        inflight = [None] * shards
+        max_trx = 0
+
+        def flush(dest):
+            if inflight[dest] is not None:
+                inflight[dest].result()
+            inflight[dest] = dst_nodes[dest].submit(_node_import, [], buffers[dest], [])
+            buffers[dest] = []
+
+        streams = [_exported_transactions(node) for node in src_nodes]
+        for t in heapq.merge(*streams, key=lambda t: t.get('created_at') or ''):
+            max_trx = max(max_trx, Lunite.parse_id_number(t['id']))
+            dest = shard_of(t['user_id'] or '', shards)
+            buffers[dest].append(t)
+            if len(buffers[dest]) >= REBALANCE_BATCH:
+                flush(dest)
+        for dest in range(shards):
+            if buffers[dest]:
+                flush(dest)
+            if inflight[dest] is not None:
+                inflight[dest].result()
+        counters['T'] = max(counters.get('T', 0), max_trx)
+
+        # katalog: sisa stok semua sumber dijumlah lalu dibagi ulang
+        catalog = exports[0]['products'] if exports else []
+        stock = {}
+        for export in exports:
+            for p in export['products']:
+                stock[p['id']] = stock.get(p['id'], 0) + (p.get('stock') or 0)
+        for p in catalog:
+            counters['P'] = max(counters.get('P', 0), Lunite.parse_id_number(p['id']))
+        node_counters = {k: v for k, v in counters.items() if k in ('T', 'V')}
+        futures = []
+        for i, node in enumerate(dst_nodes):
+            products = [dict(p, stock=split_stock(stock[p['id']], shards)[i]) for p in catalog]
+            futures.append(node.submit(_node_put_products, products))
+            futures.append(node.submit(_node_set_counters, node_counters))
+        for f in futures:
+            f.result()
+    finally:
+        close_nodes(src_nodes, compact=False)
+        close_nodes(dst_nodes)
+    return directory, {k: v for k, v in counters.items() if k in ('U', 'P')}
+
+
+def _exported_transactions(node):
+    start = 0
+    while start is not None:
+        rows, start = node.call(_node_export_transactions, start, REBALANCE_BATCH)
+        yield from rows
+
+
+def _write_cluster(root, shards, backend_name, directory, counters):
+    with open(os.path.join(root, DIRECTORY_FILE) + ".tmp", "w", encoding="utf-8") as f:
+        for username, uid in directory:
+            f.write(json.dumps({'username': username, 'id': uid}) + "\n")
+    os.replace(os.path.join(root, DIRECTORY_FILE) + ".tmp", os.path.join(root, DIRECTORY_FILE))
+    Lunite.save_json_dict(os.path.join(root, COUNTER_FILE), counters)
+    # ditulis terakhir: cluster dianggap siap setelah semua file lain ada
+    Lunite.save_json_dict(os.path.join(root, CLUSTER_FILE), {'shards': shards, 'backend': backend_name})
+
+
+def init_cluster(source, root, shards, backend_name='json', source_backend=None):
+    # bagi folder data tunggal (source/data) ke folder shard di root
+    if os.path.exists(os.path.join(root, CLUSTER_FILE)):
+        raise ValueError(f"{root} sudah berisi cluster; pakai 'rebalance'")
+    os.makedirs(root, exist_ok=True)
+    directory, counters = redistribute([source], root, shards, backend_name, source_backend)
+    _write_cluster(root, shards, backend_name, directory, counters)
+    return len(directory)
+
+
+def rebalance(root, shards):
+    # Pindahkan semua user ke `shards` shard. Dijalankan saat cluster tidak
+    # melayani (router lain berhenti dulu). Shard lama disimpan di lama-<waktu>.
+    # Hasil: folder cadangan shard lama
+    with root_locked(root):
+        cluster = load_cluster(root)
+        backend_name = cluster.get('backend', 'json')
+        old = [shard_dir(root, i) for i in range(cluster['shards'])]
+        staging = os.path.join(root, STAGING_DIR)
+        shutil.rmtree(staging, ignore_errors=True)
+        directory, counters = redistribute(old, staging, shards, backend_name)
+        backup = os.path.join(root, "lama-" + datetime.now().strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(backup)
+        for path in old:
+            shutil.move(path, backup)
+        for i in range(shards):
+            os.replace(shard_dir(staging, i), shard_dir(root, i))
+        os.rmdir(staging)
+        _write_cluster(root, shards, backend_name, directory, counters)
+    return backup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharding data Lunite")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("init", help="bagi folder data/ yang ada ke beberapa shard")
+    p.add_argument("root")
+    p.add_argument("--shards", type=int, required=True)
+    p.add_argument("--dari", default=".", help="folder yang berisi data/ (bawaan: folder ini)")
+    p.add_argument("--backend", choices=["json", "sqlite"], default=Lunite.STORAGE_BACKEND,
+                   help="backend shard baru (data sumber dibaca dengan LUNITE_STORAGE)")
+    p = sub.add_parser("rebalance", help="pindahkan user ke jumlah shard baru")
+    p.add_argument("root")
+    p.add_argument("--shards", type=int, required=True)
+    p = sub.add_parser("status", help="jumlah user/transaksi/pendapatan per shard")
+    p.add_argument("root")
+    p = sub.add_parser("laporan", help="laporan penjualan gabungan semua shard")
+    p.add_argument("root")
+    p.add_argument("--days", type=int, default=7)
+    p = sub.add_parser("serve", help="server HTTP (endpoint server.py) di atas cluster")
+    p.add_argument("root")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    if args.cmd in ("init", "rebalance") and args.shards <= 0:
+        parser.error("--shards harus > 0")
+    if args.cmd == "init":
+        users = init_cluster(os.path.abspath(args.dari), os.path.abspath(args.root), args.shards,
+                             args.backend, Lunite.STORAGE_BACKEND)
+        print(f"{users} user dibagi ke {args.shards} shard di {args.root}")
+    elif args.cmd == "rebalance":
+        backup = rebalance(os.path.abspath(args.root), args.shards)
+        print(f"Data dibagi ulang ke {args.shards} shard. Shard lama disimpan di {backup}")
+    elif args.cmd == "serve":
+        cluster = ClusterServer(ShardRouter(os.path.abspath(args.root)))
+        try:
+            asyncio.run(cluster.serve(args.host, args.port))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("Server berhenti.")
+        finally:
+            cluster.close()
+    else:
+        router = ShardRouter(os.path.abspath(args.root))
+        try:
+            if args.cmd == "status":
+                table = Lunite.make_table(['Shard', 'User', 'Transaksi', 'Pendapatan', 'Voucher', 'Stok'])
+                for i, s in enumerate(router.stats()):
+                    table.add_row([i, s['users'], s['transactions'], s['revenue'], s['vouchers'], s['stock']])
+                print(table)
+            else:
+                names = {p['id']: p['name'] for p in router.products()}
+                Lunite.print_sales_report(router.sales_report(args.days), names, args.days)
+        finally:
+            router.close(compact=False)
+
+
+if __name__ == '__main__':
+    main()